@@ -0,0 +1,169 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import dataset
+from config import ANNOTATED_DATA_FILE, AGGREGATES_DIR, TREND_FREQUENCIES
+
+# Counts kept per period and Category. They add up across days and
+# categories, so weeks, months and totals are sums of days. Net sentiment and
+# agreement are ratios of them, derived when the counts are read.
+COUNT_COLUMNS = ['articles', 'labels', 'positive', 'neutral', 'negative', 'paired', 'agreed']
+
+# Periods are labeled by their first day, weeks start on Monday
+FREQUENCIES = TREND_FREQUENCIES
+
+
+def _table_path(name, directory):
+    return os.path.join(directory, f'{name}.parquet')
+
+
+def _labels(df):
+    """The columns of the annotated data the counts depend on, with the same types however they were read"""
+    return pd.DataFrame({
+        'Date': pd.to_datetime(df['Date']).dt.normalize(),
+        'Category': df['Category'].astype(object).fillna('Unknown'),
+        'Annotation_1': df['Annotation_1'].astype('Int8'),
+        'Annotation_2': df['Annotation_2'].astype('Int8')
+    }).dropna(subset=['Date'])
+
+
+def _missing_from(hashes, other):
+    """Mark the hashes that are not in other, by binary search in the sorted other hashes"""
+    other = np.sort(other)
+    positions = np.searchsorted(other, hashes)
+    found = positions < len(other)
+    found[found] = other[positions[found]] == hashes[found]
+    return ~found
+
+
+def daily_counts(df):
+    """Count the annotated articles and labels of each day and Category
+
+    Every annotation counts as one label, so an article annotated positive by
+    one annotator and neutral by the other adds one positive and one neutral.
+
+    Args:
+        df (pd.DataFrame): Annotated articles with Date, Category and int labels in
+            Annotation_1 and Annotation_2
+
+    Returns:
+        pd.DataFrame: COUNT_COLUMNS indexed by (Date, Category)
+    """
+    df = _labels(df)
+    first, second = df['Annotation_1'], df['Annotation_2']
+    paired = first.notna() & second.notna()
+    counts = pd.DataFrame({
+        'Date': df['Date'],
+        'Category': df['Category'],
+        'articles': 1,
+        'labels': first.notna().astype(int) + second.notna().astype(int),
+        'paired': paired.astype(int),
+        'agreed': (paired & first.eq(second).fillna(False)).astype(int)
+    })
+    for name, label in (('positive', 1), ('neutral', 0), ('negative', -1)):
+        counts[name] = first.eq(label).fillna(False).astype(int) + second.eq(label).fillna(False).astype(int)
+    return counts.groupby(['Date', 'Category'])[COUNT_COLUMNS].sum()
+
+
+def roll_up(daily, frequency):
+    """Sum daily counts into weekly or monthly counts per Category"""
+    daily = daily.reset_index()
+    periods = daily['Date'].dt.to_period(FREQUENCIES[frequency]).dt.start_time
+    return daily.assign(Date=periods).groupby(['Date', 'Category'])[COUNT_COLUMNS].sum()
+
+
+def _write_tables(directory, daily, snapshot, annotated_path):
+    """Write the counts and the snapshot next to the old ones and swap them in together"""
+    tmp_directory = f"{directory}.tmp"
+    if os.path.exists(tmp_directory):
+        shutil.rmtree(tmp_directory)
+    os.makedirs(tmp_directory)
+    for frequency in FREQUENCIES:
+        counts = daily if frequency == 'daily' else roll_up(daily, frequency)
+        counts.reset_index().to_parquet(_table_path(frequency, tmp_directory), index=False)
+    snapshot.to_parquet(_table_path('annotations', tmp_directory), index=False)
+    dataset.mark_fresh(tmp_directory, [annotated_path])
+    dataset.swap_directory(tmp_directory, directory)
+
+
+def update_aggregates(annotated_path=ANNOTATED_DATA_FILE, directory=AGGREGATES_DIR):
+    """Bring the aggregate counts up to date with the annotated data
+
+    The annotations the counts were last built from are kept as a snapshot,
+    with a hash of each article's URL and labels. On an update only the
+    articles whose hash is new or gone, i.e. that were added, removed or
+    edited since then, change the counts: their old rows are subtracted from
+    their days and their new rows added. Weekly and monthly counts are then summed from the
+    daily counts, which grow with the number of days, not of articles.
+
+    Args:
+        annotated_path (str): Annotated data file
+        directory (str): Directory of the aggregate tables
+
+    Returns:
+        bool: Whether the counts changed, False when they were up to date
+    """
+    if not os.path.exists(annotated_path) or dataset.is_fresh(directory, [annotated_path]):
+        return False
+
+    annotated = dataset.load_annotated(annotated_path, columns=['URL', 'Date', 'Category', 'Annotation_1',
+                                                                'Annotation_2'])
+    new = _labels(annotated)
+    new['_hash'] = pd.util.hash_pandas_object(new.assign(URL=annotated['URL'].astype(object)),
+                                              index=False).to_numpy()
+    if os.path.exists(_table_path('annotations', directory)):
+        old = pd.read_parquet(_table_path('annotations', directory))
+        daily = pd.read_parquet(_table_path('daily', directory)).set_index(['Date', 'Category'])
+    else:
+        old = new.iloc[:0]
+        daily = daily_counts(old)
+
+    # An edited article has a different hash in each version, so it is both removed and added
+    added = new[_missing_from(new['_hash'].to_numpy(), old['_hash'].to_numpy())]
+    removed = old[_missing_from(old['_hash'].to_numpy(), new['_hash'].to_numpy())]
+    daily = daily.add(daily_counts(added), fill_value=0).sub(daily_counts(removed), fill_value=0).astype('int64')
+    daily = daily[daily['articles'] > 0].sort_index()
+
+    _write_tables(directory, daily, new, annotated_path)
+    return len(added) + len(removed) > 0
+
+
+def load_trend(frequency='monthly', categories=None, start_date=None, end_date=None, by_category=True,
+               directory=AGGREGATES_DIR):
+    """Read sentiment over time from the aggregate counts
+
+    Only the counts are read, never the annotated articles, so the cost
+    depends on the number of periods and categories alone.
+
+    Args:
+        frequency (str): 'daily', 'weekly' or 'monthly'
+        categories (list, optional): Categories to include, all when None
+        start_date (str, optional): First period to include (YYYY-MM-DD)
+        end_date (str, optional): Last period to include (YYYY-MM-DD)
+        by_category (bool): One row per period and Category, or per period over all categories
+        directory (str): Directory of the aggregate tables
+
+    Returns:
+        pd.DataFrame: Date, Category (when by_category), COUNT_COLUMNS, net_sentiment
+            ((positive - negative) / labels, from -1 to 1) and agreement (agreed / paired)
+    """
+    path = _table_path(frequency, directory)
+    if not os.path.exists(path):
+        trend = pd.DataFrame({'Date': pd.Series(dtype='datetime64[ns]'), 'Category': pd.Series(dtype=object),
+                              **{column: pd.Series(dtype='int64') for column in COUNT_COLUMNS}})
+    else:
+        trend = pd.read_parquet(path)
+    if categories is not None:
+        trend = trend[trend['Category'].isin(categories)]
+    if start_date:
+        trend = trend[trend['Date'] >= pd.Timestamp(start_date)]
+    if end_date:
+        trend = trend[trend['Date'] <= pd.Timestamp(end_date)]
+    if not by_category:
+        trend = trend.groupby('Date', as_index=False)[COUNT_COLUMNS].sum()
+
+    labels = trend['labels'].where(trend['labels'] > 0)
+    trend = trend.assign(net_sentiment=(trend['positive'] - trend['negative']) / labels,
+                         agreement=trend['agreed'] / trend['paired'].where(trend['paired'] > 0))
+    return trend.reset_index(drop=True)
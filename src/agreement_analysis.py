@@ -1,9 +1,13 @@
+import heapq
 import pandas as pd
 import json
+from collections import Counter
 from config import *
 import os
-import numpy as np
-import re
+import dataset
+import instrumentation
+from agreement_metrics import load_annotator_ids
+from agreement_stats import AgreementStats, input_signatures, stats_path, disagreements_path
 
 def load_annotated_data():
     """Load annotated data"""
@@ -81,79 +85,60 @@ def generate_analysis_report(data, frequencies, agreement_rate, avg_difference,
     }
 
 def preprocess_annotations(df):
-    """Preprocess annotations by extracting numeric values"""
-    # Extract first number from annotation string
-    def extract_number(text):
-        if pd.isna(text):
-            return np.nan
-        try:
-            # Extract first number (can be negative)
-            match = re.search(r'-?\d+', str(text))
-            return float(match.group()) if match else np.nan
-        except:
-            return np.nan
-    
-    # Extract numeric values
-    df['Annotation_1_value'] = df['Annotation_1'].apply(extract_number)
-    df['Annotation_2_value'] = df['Annotation_2'].apply(extract_number)
+    """Preprocess annotations by extracting numeric values
+    
+    Accepts free-text annotations as well as the int8 labels of the annotated
+    dataset, whose annotations are reported as they were written.
+    """
+    for column in ['Annotation_1', 'Annotation_2']:
+        if f'{column}_note' in df.columns:
+            df[f'{column}_value'] = df[column].astype('float64')
+            if f'{column}_text' in df.columns:
+                df[column] = df[f'{column}_text']
+            else:
+                df[column] = dataset.annotation_text(df[column], df[f'{column}_note'])
+            continue
+        # Extract first number (can be negative) from each annotation string, e.g. "-1: negative" -> -1.0
+        values = df[column].astype(str).str.extract(r'(-?\d+)', expand=False).astype(float)
+        df[f'{column}_value'] = values.where(df[column].notna())
     
     return df
 
-def calculate_agreement(annotated_data, output_file=None):
-    """Calculate agreement metrics between annotators"""
-    print("Starting agreement analysis...")
+def compute_agreement(df):
+    """Compute agreement metrics from preprocessed annotations
+    
+    Args:
+        df (pd.DataFrame): Annotations with Annotation_1_value and Annotation_2_value columns
+        
+    Returns:
+        dict: Report with agreement rate, counts, average difference, annotation
+            frequencies and the disagreement cases in row order
+    """
+    value_1 = df['Annotation_1_value']
+    value_2 = df['Annotation_2_value']
     
-    # Load annotated data
-    df = pd.read_csv(annotated_data)
+    # Calculate frequencies for each annotator
+    freq_1 = value_1.value_counts().to_dict()
+    freq_2 = value_2.value_counts().to_dict()
     
-    # Preprocess annotations
-    df = preprocess_annotations(df)
+    # Only rows where both annotators gave a value are compared
+    valid = value_1.notna() & value_2.notna()
+    disagree = valid & (value_1 != value_2)
+    difference = (value_1 - value_2).abs()
     
-    # Calculate agreement metrics
-    agreement_count = 0
-    total_count = 0
-    disagreement_count = 0
-    total_difference = 0
-    difference_count = 0
-    disagreements = []
+    total_count = int(valid.sum())
+    disagreement_count = int(disagree.sum())
+    agreement_count = total_count - disagreement_count
+    total_difference = float(difference[disagree].sum())
     
-    # Calculate frequencies for each annotator
-    freq_1 = df['Annotation_1_value'].value_counts().to_dict()
-    freq_2 = df['Annotation_2_value'].value_counts().to_dict()
-    
-    # Calculate agreement for each row
-    for _, row in df.iterrows():
-        if pd.notna(row['Annotation_1_value']) and pd.notna(row['Annotation_2_value']):
-            total_count += 1
-            if row['Annotation_1_value'] == row['Annotation_2_value']:
-                agreement_count += 1
-            else:
-                disagreement_count += 1
-                # Calculate difference for all disagreements
-                total_difference += abs(row['Annotation_1_value'] - row['Annotation_2_value'])
-                difference_count += 1
-                # Store disagreement case
-                disagreements.append({
-                    'Title': row['Title'],
-                    'Category': row['Category'],
-                    'URL': row['URL'],
-                    'Annotation_1': row['Annotation_1'],
-                    'Annotation_2': row['Annotation_2'],
-                    'Difference': abs(row['Annotation_1_value'] - row['Annotation_2_value'])
-                })
+    disagreements = df.loc[disagree, ['Title', 'Category', 'URL', 'Annotation_1', 'Annotation_2']]
+    disagreements = disagreements.assign(Difference=difference[disagree]).to_dict('records')
     
     # Calculate metrics
     agreement_rate = (agreement_count / total_count * 100) if total_count > 0 else 0
-    avg_difference = (total_difference / difference_count) if difference_count > 0 else 0
-    
-    # Create results DataFrame
-    results = pd.DataFrame({
-        'Metric': ['Agreement Rate', 'Total Rows', 'Agreement Count', 'Disagreement Count', 'Average Difference'],
-        'Value': [f"{agreement_rate:.2f}%", total_count, agreement_count, disagreement_count, f"{avg_difference:.4f}"]
-    })
+    avg_difference = (total_difference / disagreement_count) if disagreement_count > 0 else 0
     
-    # Create detailed report
-    report = {
+    return {
         'agreement_rate': agreement_rate,
         'total_rows': total_count,
         'agreement_count': agreement_count,
@@ -165,30 +150,150 @@ def calculate_agreement(annotated_data, output_file=None):
         },
         'disagreements': disagreements
     }
+
+def format_metric(metric):
+    """Format a metric value with its confidence interval, e.g. 0.7420 [0.6625, 0.8162]"""
+    if metric['value'] is None:
+        return "n/a"
+    if metric['ci_low'] is None:
+        return f"{metric['value']:.4f}"
+    return f"{metric['value']:.4f} [{metric['ci_low']:.4f}, {metric['ci_high']:.4f}]"
+
+def agreement_inputs(annotated_data):
+    """Files the agreement statistics depend on: the annotated data and the annotator assignments"""
+    return [annotated_data, ASSIGNMENT_LOG_FILE, READY_FOR_ANNOTATION_FILE]
+
+def update_agreement_stats(annotated_data, output_file):
+    """Bring the statistics saved next to the report up to date with the annotated data
     
-    # Save results
+    When neither the annotated file nor the assignments changed since the
+    last analysis, the saved statistics are used as they are, without
+    reading any rows. Otherwise all rows are read, preprocessed and hashed,
+    O(rows), and the ones added, changed or removed since are folded in.
+    
+    Args:
+        annotated_data (str): Annotated data file
+        output_file (str): Report file, the statistics and disagreements are saved next to it
+            (see agreement_stats.stats_path and agreement_stats.disagreements_path)
+        
+    Returns:
+        AgreementStats: Statistics of all annotated rows
+    """
+    path = stats_path(output_file)
+    disagreements_file = disagreements_path(output_file)
+    stats = AgreementStats.load(path, annotated_data, disagreements_file)
+    inputs = agreement_inputs(annotated_data)
+    if stats.inputs_unchanged(inputs):
+        print("Agreement statistics: annotated data and assignments unchanged since the last analysis")
+        return stats
+    
+    # Signed before reading, so a file changed while it is read is read again next time
+    signatures = input_signatures(inputs)
+    df = preprocess_annotations(dataset.load_annotated(annotated_data))
+    instrumentation.count(rows=len(df))
+    with instrumentation.stage('update_agreement_stats') as stage:
+        added, changed, removed = stats.update(df, load_annotator_ids(df))
+        stage.count(rows=added + changed + removed)
+    print(f"Agreement statistics: {added} new, {changed} changed and {removed} removed rows folded in")
+    with instrumentation.stage('write_disagreements', output=disagreements_file):
+        stats.save(path, disagreements_file, signatures)
+    return stats
+
+def _disagreement_records(disagreements_file):
+    """Yield the disagreement records of a disagreements file, see agreement_stats.AgreementStats.save"""
+    with open(disagreements_file, encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+def print_disagreements(disagreements_file, top_k=DISAGREEMENT_TOP_K):
+    """Print the disagreements per category and difference, and the top_k cases with the largest difference
+    
+    Cases are ranked by difference, then category, then row key. The
+    disagreements file is streamed, keeping only the counts and the top_k
+    cases, so the output and the memory stay small at any label volume.
+    
+    Args:
+        disagreements_file (str): File with all disagreement cases, pointed to in the output
+        top_k (int): Number of cases to print
+    """
+    counts = Counter()
+    
+    def ranked():
+        for position, record in enumerate(_disagreement_records(disagreements_file)):
+            counts[record['Category'], record['Difference']] += 1
+            yield (-record['Difference'], record['Category'] is None, record['Category'] or '', position), record
+    
+    top = [record for _, record in heapq.nsmallest(top_k, ranked(), key=lambda item: item[0])]
+    if not counts:
+        return
+    
+    table = pd.Series(counts).unstack(fill_value=0)
+    table.index.name, table.columns.name = 'Category', 'Difference'
+    table['Total'] = table.sum(axis=1)
+    print("\nDisagreements by category and difference:")
+    print(table.sort_values('Total', ascending=False, kind='stable').to_string())
+    
+    print(f"\nTop {len(top)} of {sum(counts.values())} disagreement cases, all of them are in {disagreements_file}:")
+    print("-" * 80)
+    for i, case in enumerate(top, 1):
+        print(f"\nCase {i}:")
+        print(f"Title: {case['Title']}")
+        print(f"Category: {case['Category']}")
+        print(f"Annotation 1: {case['Annotation_1']}")
+        print(f"Annotation 2: {case['Annotation_2']}")
+        print(f"Difference: {case['Difference']}")
+        print(f"URL: {case['URL']}")
+        print("-" * 80)
+
+@instrumentation.stage('calculate_agreement')
+def calculate_agreement(annotated_data, output_file=None):
+    """Calculate agreement metrics between annotators
+    
+    The saved statistics are brought up to date (see update_agreement_stats)
+    and the report is built from them, see agreement_stats.AgreementStats.
+    It is the same report a full
+    recompute with compute_agreement and agreement_metrics.compute_agreement_metrics gives,
+    except the disagreement cases: they are written to a JSON lines file
+    next to the report, which the report points to in disagreements_file.
+    """
+    print("Starting agreement analysis...")
     if output_file is None:
         output_file = os.path.join(ANALYSIS_DIR, 'analysis_report.json')
     
+    # Calculate agreement metrics, from the rows changed since the last analysis
+    report = update_agreement_stats(annotated_data, output_file).report()
+    disagreements_file = disagreements_path(output_file)
+    report['disagreements_file'] = os.path.relpath(disagreements_file, os.path.dirname(os.path.abspath(output_file)))
+    agreement_rate = report['agreement_rate']
+    avg_difference = report['average_difference']
+    
+    # Create results DataFrame
+    chance_corrected = report['chance_corrected']
+    results = pd.DataFrame({
+        'Metric': ['Agreement Rate', 'Total Rows', 'Agreement Count', 'Disagreement Count', 'Average Difference',
+                   "Fleiss' Kappa", "Krippendorff's Alpha (nominal)", "Krippendorff's Alpha (ordinal)"],
+        'Value': [f"{agreement_rate:.2f}%", report['total_rows'], report['agreement_count'],
+                  report['disagreement_count'], f"{avg_difference:.4f}",
+                  format_metric(chance_corrected['fleiss_kappa']),
+                  format_metric(chance_corrected['krippendorff_alpha_nominal']),
+                  format_metric(chance_corrected['krippendorff_alpha_ordinal'])]
+    })
+    
+    # Save results
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
-    with open(output_file, 'w', encoding='utf-8') as f:
+    with instrumentation.stage('write_json', output=output_file), open(output_file, 'w', encoding='utf-8') as f:
         json.dump(report, f, indent=4, ensure_ascii=False)
     
     print(f"\nAnalysis report saved to: {output_file}")
     
-    # Print disagreement cases
-    if disagreements:
-        print("\nDisagreement Cases:")
-        print("-" * 80)
-        for i, case in enumerate(disagreements, 1):
-            print(f"\nCase {i}:")
-            print(f"Title: {case['Title']}")
-            print(f"Category: {case['Category']}")
-            print(f"Annotation 1: {case['Annotation_1']}")
-            print(f"Annotation 2: {case['Annotation_2']}")
-            print(f"Difference: {case['Difference']}")
-            print(f"URL: {case['URL']}")
-            print("-" * 80)
+    # Print pairwise Cohen's kappa
+    confidence = chance_corrected['bootstrap']['confidence']
+    print(f"\nPairwise Cohen's Kappa ({confidence:.0%} bootstrap CI):")
+    for pair, metric in chance_corrected['cohen_kappa'].items():
+        print(f"{pair}: {format_metric(metric)} over {metric['items']} items")
+    
+    # Print a summary of the disagreement cases
+    print_disagreements(disagreements_file)
     
     return results
 
@@ -0,0 +1,347 @@
+from collections import namedtuple
+from itertools import combinations
+import numpy as np
+import pandas as pd
+import dataset
+from config import ASSIGNMENT_LOG_FILE, BOOTSTRAP_RESAMPLES, BOOTSTRAP_CONFIDENCE, RANDOM_SEED
+
+# Sparse item x annotator label matrix in coordinate form: rating k was given
+# by annotators[raters[k]] to item items[k], with label categories[codes[k]]
+LabelMatrix = namedtuple('LabelMatrix', ['items', 'raters', 'codes', 'n_items', 'annotators', 'categories'])
+
+# Columns of a rating pattern: the annotator and label of each of the two annotations of an item
+PATTERN_COLUMNS = ['annotator_1', 'value_1', 'annotator_2', 'value_2']
+
+# Upper bound on resample x item weights held in memory at once
+_BOOTSTRAP_CHUNK_ELEMENTS = 2 ** 24
+
+
+def load_annotator_ids(df, assignment_log=ASSIGNMENT_LOG_FILE):
+    """Recover which annotator gave each annotation
+
+    The annotated file only holds the labels, while the assignment log
+    written by preprocessing holds the annotator names in the same columns
+    (see dataset.load_assignments). Rows are matched by URL. The annotators
+    of rows without an assignment are unknown (NaN): their annotations count
+    for Fleiss' kappa and Krippendorff's alpha, which do not need to know
+    who rated, but not for the pairwise Cohen's kappa.
+
+    Args:
+        df (pd.DataFrame): Annotated data with a URL column
+        assignment_log (str): Assignment log CSV written by data preprocessing
+
+    Returns:
+        pd.DataFrame: Annotator ids in columns Annotation_1 and Annotation_2, aligned with df
+    """
+    assigned = dataset.load_assignments(assignment_log)
+    return pd.DataFrame({column: df['URL'].map(assigned[column]).astype(object) if column in assigned.columns
+                         else pd.Series(np.nan, index=df.index, dtype=object)
+                         for column in ['Annotation_1', 'Annotation_2']}, index=df.index)
+
+
+def build_label_matrix(df, annotator_ids=None):
+    """Build the sparse item x annotator label matrix from preprocessed annotations
+
+    Args:
+        df (pd.DataFrame): Annotations with Annotation_1_value and Annotation_2_value columns
+        annotator_ids (pd.DataFrame, optional): Annotator id per annotation, see load_annotator_ids
+
+    Returns:
+        LabelMatrix: Ratings in coordinate form, missing annotations are left out.
+            Ratings of an unknown annotator have rater -1.
+    """
+    if annotator_ids is None:
+        annotator_ids = load_annotator_ids(df)
+    columns = ['Annotation_1', 'Annotation_2']
+    values = np.concatenate([df[f'{column}_value'].to_numpy(dtype=float) for column in columns])
+    raters = np.concatenate([annotator_ids[column].to_numpy(dtype=object) for column in columns])
+    items = np.tile(np.arange(len(df)), len(columns))
+
+    rated = ~np.isnan(values)
+    categories, codes = np.unique(values[rated], return_inverse=True)
+    rater_codes, annotators = pd.factorize(raters[rated], sort=True)
+    return LabelMatrix(items[rated], rater_codes, codes, len(df), list(annotators), categories)
+
+
+def pattern_keys(df, annotator_ids):
+    """Rating pattern of each item, the annotator of a missing annotation is left out
+
+    Args:
+        df (pd.DataFrame): Annotations with Annotation_1_value and Annotation_2_value columns
+        annotator_ids (pd.DataFrame): Annotator id per annotation, see load_annotator_ids
+
+    Returns:
+        pd.DataFrame: PATTERN_COLUMNS, aligned with df
+    """
+    value_1, value_2 = df['Annotation_1_value'], df['Annotation_2_value']
+    return pd.DataFrame({'annotator_1': annotator_ids['Annotation_1'].where(value_1.notna()), 'value_1': value_1,
+                         'annotator_2': annotator_ids['Annotation_2'].where(value_2.notna()), 'value_2': value_2},
+                        index=df.index)
+
+
+def sort_patterns(patterns):
+    """Put rating patterns in their canonical order, so equal counts always give equal metrics"""
+    return patterns.sort_values(PATTERN_COLUMNS, na_position='last', kind='stable', ignore_index=True)
+
+
+def rating_patterns(df, annotator_ids=None):
+    """Count the items of each rating pattern
+
+    Items enter every agreement metric only through their rating pattern,
+    so the pattern counts are all the metrics need, see pattern_metrics.
+
+    Args:
+        df (pd.DataFrame): Annotations with Annotation_1_value and Annotation_2_value columns
+        annotator_ids (pd.DataFrame, optional): Annotator id per annotation, see load_annotator_ids
+
+    Returns:
+        pd.DataFrame: One row per pattern with PATTERN_COLUMNS and the number of items in count
+    """
+    if annotator_ids is None:
+        annotator_ids = load_annotator_ids(df)
+    counts = pattern_keys(df, annotator_ids).groupby(PATTERN_COLUMNS, dropna=False).size()
+    return sort_patterns(counts.rename('count').reset_index())
+
+
+def pattern_matrix(patterns):
+    """Build a label matrix with one item per rating pattern, see build_label_matrix"""
+    values = pd.DataFrame({'Annotation_1_value': patterns['value_1'].astype(float),
+                           'Annotation_2_value': patterns['value_2'].astype(float)})
+    annotator_ids = pd.DataFrame({'Annotation_1': patterns['annotator_1'], 'Annotation_2': patterns['annotator_2']})
+    return build_label_matrix(values, annotator_ids)
+
+
+def _item_features(matrix):
+    """Per-item contributions whose (weighted) sums determine every metric
+
+    Returns:
+        tuple: (features, layout) where features is an items x columns array and
+            layout maps each block name to its column slice
+    """
+    n_categories = len(matrix.categories)
+    n_cells = n_categories ** 2
+    counts = np.bincount(matrix.items * n_categories + matrix.codes,
+                         minlength=matrix.n_items * n_categories).reshape(matrix.n_items, n_categories)
+    ratings = counts.sum(axis=1)
+    # Only items with at least two ratings carry information about agreement
+    pairable = ratings >= 2
+    pair_counts = np.where(pairable, ratings * (ratings - 1), 1)
+
+    # Fleiss: observed agreement of each item and its category counts
+    item_agreement = np.where(pairable, ((counts ** 2).sum(axis=1) - ratings) / pair_counts, 0.0)
+    fleiss_counts = counts * pairable[:, None]
+
+    # Krippendorff: each item's contribution to the coincidence matrix
+    coincidences = counts[:, :, None] * counts[:, None, :] - counts[:, :, None] * np.eye(n_categories)
+    coincidences = (coincidences / np.where(pairable, ratings - 1, 1)[:, None, None]) * pairable[:, None, None]
+
+    blocks = [('items', pairable[:, None].astype(float)), ('agreement', item_agreement[:, None]),
+              ('counts', fleiss_counts), ('coincidences', coincidences.reshape(matrix.n_items, n_cells))]
+
+    # Cohen: one confusion matrix cell per item for every annotator pair that shares items
+    known = matrix.raters >= 0
+    rating_matrix = np.full((matrix.n_items, len(matrix.annotators)), -1)
+    rating_matrix[matrix.items[known], matrix.raters[known]] = matrix.codes[known]
+    for a, b in combinations(range(len(matrix.annotators)), 2):
+        shared = (rating_matrix[:, a] >= 0) & (rating_matrix[:, b] >= 0)
+        if not shared.any():
+            continue
+        cells = np.zeros((matrix.n_items, n_cells))
+        cells[shared, rating_matrix[shared, a] * n_categories + rating_matrix[shared, b]] = 1
+        blocks.append((f'{matrix.annotators[a]}-{matrix.annotators[b]}', cells))
+
+    layout = {}
+    start = 0
+    for name, block in blocks:
+        layout[name] = slice(start, start + block.shape[1])
+        start += block.shape[1]
+    return np.hstack([block for _, block in blocks]), layout
+
+
+def _cohen_kappa(confusion):
+    """Cohen's kappa of a batch of K x K confusion matrices"""
+    total = confusion.sum(axis=(-2, -1))
+    observed = np.trace(confusion, axis1=-2, axis2=-1) / total
+    expected = (confusion.sum(axis=-1) * confusion.sum(axis=-2)).sum(axis=-1) / total ** 2
+    return (observed - expected) / (1 - expected)
+
+
+def _fleiss_kappa(items, agreement, counts):
+    """Fleiss' kappa from the summed item agreement and category counts of a batch"""
+    proportions = counts / counts.sum(axis=-1, keepdims=True)
+    expected = (proportions ** 2).sum(axis=-1)
+    return (agreement / items - expected) / (1 - expected)
+
+
+def _krippendorff_alpha(coincidences, level):
+    """Krippendorff's alpha of a batch of K x K coincidence matrices"""
+    n_categories = coincidences.shape[-1]
+    marginals = coincidences.sum(axis=-1)
+    total = marginals.sum(axis=-1)
+    if level == 'nominal':
+        distance = np.broadcast_to(1 - np.eye(n_categories), coincidences.shape)
+    elif level == 'ordinal':
+        # Squared count of values lying between two categories, counting the end points by half
+        low = np.minimum.outer(np.arange(n_categories), np.arange(n_categories))
+        high = np.maximum.outer(np.arange(n_categories), np.arange(n_categories))
+        cumulative = np.cumsum(marginals, axis=-1)
+        between = cumulative[..., high] - cumulative[..., low] + marginals[..., low]
+        distance = (between - (marginals[..., :, None] + marginals[..., None, :]) / 2) ** 2
+    else:
+        raise ValueError(f"Unknown measurement level: {level}")
+    observed = (coincidences * distance).sum(axis=(-2, -1)) / total
+    expected = (marginals[..., :, None] * marginals[..., None, :] * distance).sum(axis=(-2, -1))
+    expected = expected / (total * (total - 1))
+    return 1 - observed / expected
+
+
+def _metrics_from_sums(sums, layout, n_categories):
+    """Compute every metric from a batch of weighted feature sums
+
+    Args:
+        sums (np.ndarray): Resamples x feature columns
+        layout (dict): Column slices returned by _item_features
+        n_categories (int): Number of label categories
+
+    Returns:
+        dict: Metric name to an array with one value per resample
+    """
+    shape = (len(sums), n_categories, n_categories)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        coincidences = sums[:, layout['coincidences']].reshape(shape)
+        metrics = {
+            'fleiss_kappa': _fleiss_kappa(sums[:, layout['items']][:, 0], sums[:, layout['agreement']][:, 0],
+                                          sums[:, layout['counts']]),
+            'krippendorff_alpha_nominal': _krippendorff_alpha(coincidences, 'nominal'),
+            'krippendorff_alpha_ordinal': _krippendorff_alpha(coincidences, 'ordinal')
+        }
+        for name, columns in layout.items():
+            if name not in ('items', 'agreement', 'counts', 'coincidences'):
+                metrics[f'cohen_kappa:{name}'] = _cohen_kappa(sums[:, columns].reshape(shape))
+    return metrics
+
+
+def _item_counts(matrix, counts):
+    return np.ones(matrix.n_items, dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+
+
+def agreement_metrics(matrix, counts=None):
+    """Compute pairwise Cohen's kappa, Fleiss' kappa and Krippendorff's alpha
+
+    Args:
+        matrix (LabelMatrix): Label matrix from build_label_matrix
+        counts (np.ndarray, optional): Number of items each item of the matrix stands for,
+            e.g. the pattern counts of a pattern_matrix (default: 1 each)
+
+    Returns:
+        dict: Metric name to value, Cohen's kappa is keyed 'cohen_kappa:<a>-<b>'
+    """
+    features, layout = _item_features(matrix)
+    sums = _item_counts(matrix, counts) @ features
+    metrics = _metrics_from_sums(sums[None, :], layout, len(matrix.categories))
+    return {name: float(values[0]) for name, values in metrics.items()}
+
+
+def bootstrap_intervals(matrix, n_resamples=BOOTSTRAP_RESAMPLES, confidence=BOOTSTRAP_CONFIDENCE,
+                        seed=RANDOM_SEED, counts=None):
+    """Percentile bootstrap confidence intervals of every agreement metric
+
+    Items are resampled with replacement. Each resample is a row of item
+    weights, so all metrics of a whole batch of resamples come from a single
+    weights x item-features matrix product instead of a loop over resamples.
+    How often the items of each pattern are drawn follows a multinomial
+    distribution over the pattern counts, so a resample only needs one weight
+    per pattern however many items there are.
+
+    Args:
+        matrix (LabelMatrix): Label matrix from build_label_matrix
+        n_resamples (int): Number of bootstrap resamples
+        confidence (float): Confidence level of the intervals
+        seed (int): Random seed
+        counts (np.ndarray, optional): Number of items each item of the matrix stands for (default: 1 each)
+
+    Returns:
+        dict: Metric name to a (low, high) tuple
+    """
+    features, layout = _item_features(matrix)
+    counts = _item_counts(matrix, counts)
+    n_items = int(counts.sum())
+    rng = np.random.default_rng(seed)
+    chunk = max(1, min(n_resamples, _BOOTSTRAP_CHUNK_ELEMENTS // max(len(counts), 1)))
+
+    batches = []
+    for start in range(0, n_resamples, chunk):
+        size = min(chunk, n_resamples - start)
+        # Count how often the items of each pattern are drawn in each resample of n_items items
+        weights = rng.multinomial(n_items, counts / n_items, size=size)
+        batches.append(_metrics_from_sums(weights @ features, layout, len(matrix.categories)))
+
+    tail = (1 - confidence) / 2 * 100
+    intervals = {}
+    for name in batches[0]:
+        values = np.concatenate([batch[name] for batch in batches])
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            intervals[name] = (np.nan, np.nan)
+        else:
+            low, high = np.percentile(values, [tail, 100 - tail])
+            intervals[name] = (float(low), float(high))
+    return intervals
+
+
+def _finite(value):
+    return value if np.isfinite(value) else None
+
+
+def compute_agreement_metrics(df, annotator_ids=None, n_resamples=BOOTSTRAP_RESAMPLES,
+                              confidence=BOOTSTRAP_CONFIDENCE, seed=RANDOM_SEED):
+    """Compute chance-corrected agreement metrics with bootstrap confidence intervals
+
+    Args:
+        df (pd.DataFrame): Annotations with Annotation_1_value and Annotation_2_value columns
+        annotator_ids (pd.DataFrame, optional): Annotator id per annotation, see load_annotator_ids
+        n_resamples (int): Number of bootstrap resamples, 0 skips the intervals
+        confidence (float): Confidence level of the intervals
+        seed (int): Random seed
+
+    Returns:
+        dict: Report section with Fleiss' kappa, Krippendorff's alpha and pairwise
+            Cohen's kappa, each with its value and interval bounds
+    """
+    return pattern_metrics(rating_patterns(df, annotator_ids), n_resamples, confidence, seed)
+
+
+def pattern_metrics(patterns, n_resamples=BOOTSTRAP_RESAMPLES, confidence=BOOTSTRAP_CONFIDENCE, seed=RANDOM_SEED):
+    """Compute chance-corrected agreement metrics from rating pattern counts, see compute_agreement_metrics
+
+    Args:
+        patterns (pd.DataFrame): Pattern counts from rating_patterns, in the order of sort_patterns
+    """
+    matrix = pattern_matrix(patterns)
+    counts = patterns['count'].to_numpy(dtype=np.int64)
+    values = agreement_metrics(matrix, counts)
+    intervals = bootstrap_intervals(matrix, n_resamples, confidence, seed, counts) if n_resamples else {}
+
+    def entry(name):
+        low, high = intervals.get(name, (np.nan, np.nan))
+        return {'value': _finite(values[name]), 'ci_low': _finite(low), 'ci_high': _finite(high)}
+
+    known = matrix.raters >= 0
+    rated = np.zeros((matrix.n_items, len(matrix.annotators)), dtype=bool)
+    rated[matrix.items[known], matrix.raters[known]] = True
+    cohen = {}
+    for a, b in combinations(range(len(matrix.annotators)), 2):
+        pair = f'{matrix.annotators[a]}-{matrix.annotators[b]}'
+        if f'cohen_kappa:{pair}' in values:
+            cohen[pair] = dict(entry(f'cohen_kappa:{pair}'), items=int(counts[rated[:, a] & rated[:, b]].sum()))
+
+    return {
+        'items': int(counts[np.unique(matrix.items)].sum()),
+        'annotators': matrix.annotators,
+        'categories': [float(category) for category in matrix.categories],
+        'fleiss_kappa': entry('fleiss_kappa'),
+        'krippendorff_alpha_nominal': entry('krippendorff_alpha_nominal'),
+        'krippendorff_alpha_ordinal': entry('krippendorff_alpha_ordinal'),
+        'cohen_kappa': cohen,
+        'bootstrap': {'resamples': n_resamples, 'confidence': confidence}
+    }
@@ -0,0 +1,303 @@
+import heapq
+import json
+import os
+import numpy as np
+import pandas as pd
+from agreement_metrics import PATTERN_COLUMNS, pattern_keys, sort_patterns, pattern_metrics
+from config import BOOTSTRAP_RESAMPLES, BOOTSTRAP_CONFIDENCE, RANDOM_SEED
+
+STATS_VERSION = 3
+
+# Row columns listed in the disagreements file for each disagreement
+RECORD_COLUMNS = ['Title', 'Category', 'URL', 'Annotation_1', 'Annotation_2']
+
+# Disagreement records converted to JSON at a time when the disagreements file is written
+_WRITE_CHUNK_ROWS = 10000
+_ID_START = len('{"ID": ')
+
+
+def stats_path(report_file):
+    """Statistics file kept next to an analysis report, e.g. analysis_report_stats.npz"""
+    return f"{os.path.splitext(report_file)[0]}_stats.npz"
+
+
+def disagreements_path(report_file):
+    """Disagreements file kept next to an analysis report, e.g. analysis_report_disagreements.jsonl"""
+    return f"{os.path.splitext(report_file)[0]}_disagreements.jsonl"
+
+
+def row_keys(df):
+    """Key of each row: its ID when the IDs are unique, its position otherwise"""
+    if 'ID' in df.columns and df['ID'].notna().all() and df['ID'].is_unique:
+        return df['ID'].to_numpy(dtype=np.int64)
+    return np.arange(len(df), dtype=np.int64)
+
+
+def _disagreeing(df):
+    """Mask of the rows with two different annotations"""
+    value_1, value_2 = df['Annotation_1_value'], df['Annotation_2_value']
+    return (value_1.notna() & value_2.notna() & (value_1 != value_2)).to_numpy()
+
+
+def row_hashes(df, annotator_ids):
+    """Hash what the report takes from each row, to find the rows changed since the last run
+
+    The annotations and annotators of every row are hashed. Titles, categories
+    and URLs are only reported for disagreements, so they are only hashed for
+    the disagreeing rows, which keeps hashing cheap when most rows agree.
+    """
+    annotations = pd.DataFrame({'annotation_1': df['Annotation_1'], 'annotation_2': df['Annotation_2'],
+                                'annotator_1': annotator_ids['Annotation_1'],
+                                'annotator_2': annotator_ids['Annotation_2']})
+    hashes = pd.util.hash_pandas_object(annotations, index=False).to_numpy()
+    disagree = _disagreeing(df)
+    if disagree.any():
+        # Mostly unique strings, hashing them directly is faster than through their categories
+        records = df.loc[disagree, ['Title', 'Category', 'URL']]
+        hashes[disagree] ^= pd.util.hash_pandas_object(records, index=False, categorize=False).to_numpy()
+    return hashes
+
+
+def _disagreement_frame(keys, df):
+    """Records of the rows whose two annotations differ, with the row key in ID, sorted by it"""
+    disagree = _disagreeing(df)
+    difference = (df['Annotation_1_value'] - df['Annotation_2_value']).abs()
+    frame = df.loc[disagree, RECORD_COLUMNS].assign(Difference=difference[disagree])
+    frame.insert(0, 'ID', keys[disagree])
+    return frame.sort_values('ID', kind='stable')
+
+
+def _json_lines(frame):
+    """Yield the ID and JSON line of each record of a disagreement frame, a chunk of rows at a time"""
+    for start in range(0, len(frame), _WRITE_CHUNK_ROWS):
+        chunk = frame.iloc[start:start + _WRITE_CHUNK_ROWS].astype(object)
+        for record in chunk.where(chunk.notna(), None).to_dict('records'):
+            yield record['ID'], json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def _file_signature(path):
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+
+
+def input_signatures(paths):
+    """Paths, sizes and modification times of input files, None for missing ones"""
+    return [_file_signature(path) for path in paths]
+
+
+class AgreementStats:
+    """Sufficient statistics of the agreement report, updated with the rows that changed
+
+    Every metric of the report follows from the number of items of each
+    rating pattern (the annotator and label of both annotations, see
+    agreement_metrics.rating_patterns): the label frequencies, agreement and
+    difference sums, the confusion counts of each annotator pair and the
+    Fleiss and Krippendorff tallies. Only the disagreement cases need the
+    rows themselves, and they are kept in a JSON lines file ordered by row
+    key (see save). The statistics keep the pattern counts and the key,
+    content hash and pattern of every row. Finding the changed rows still
+    takes a read and a hash of every row, O(rows), but only the rows that
+    were added, changed or removed since the last run are folded in or out,
+    and only their disagreement records are written. When none of the input
+    files changed since the last save (see inputs_unchanged), nothing has to
+    be read at all. Bootstrap intervals are drawn from the pattern counts, so
+    the report is exactly the one a full recompute gives.
+
+    Args:
+        source (str): Annotated data file the statistics are built from
+    """
+
+    def __init__(self, source):
+        self.source = os.path.abspath(source)
+        # Pattern i is [annotator_1, value_1, annotator_2, value_2], None for a missing annotation
+        self.patterns = []
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.row_keys = np.zeros(0, dtype=np.int64)
+        self.row_hashes = np.zeros(0, dtype=np.uint64)
+        self.row_patterns = np.zeros(0, dtype=np.int64)
+        self._pattern_index = {}
+        # Keys of the rows whose saved disagreement record is out of date, and the records to save
+        self._stale_keys = np.zeros(0, dtype=np.int64)
+        self._fresh = []
+        # Whether the disagreements file holds the records of the rows before the last update
+        self._saved = False
+        # Size and modification time of the input files at the last save, see inputs_unchanged
+        self.inputs = None
+
+    def inputs_unchanged(self, paths):
+        """Check whether the saved statistics were built from these input files as they are now"""
+        return self._saved and self.inputs == input_signatures(paths)
+
+    def _pattern_codes(self, df, annotator_ids):
+        """Pattern index of each row, adding patterns not seen before"""
+        keys = pattern_keys(df, annotator_ids)
+        groups = keys.groupby(PATTERN_COLUMNS, dropna=False, sort=False).ngroup().to_numpy()
+        codes = []
+        for pattern in keys.drop_duplicates().itertuples(index=False):
+            pattern = tuple(None if pd.isna(value) else value for value in pattern)
+            if pattern not in self._pattern_index:
+                self._pattern_index[pattern] = len(self.patterns)
+                self.patterns.append(list(pattern))
+            codes.append(self._pattern_index[pattern])
+        self.counts = np.concatenate([self.counts, np.zeros(len(self.patterns) - len(self.counts), dtype=np.int64)])
+        return np.asarray(codes, dtype=np.int64)[groups] if codes else np.zeros(0, dtype=np.int64)
+
+    def update(self, df, annotator_ids):
+        """Fold the rows that were added or changed since the last update in, and the removed rows out
+
+        Args:
+            df (pd.DataFrame): All annotated rows, preprocessed with Annotation_1_value and Annotation_2_value
+            annotator_ids (pd.DataFrame): Annotator id per annotation, see load_annotator_ids
+
+        Returns:
+            tuple: Numbers of added, changed and removed rows
+        """
+        keys = row_keys(df)
+        hashes = row_hashes(df, annotator_ids)
+        known = pd.Index(self.row_keys).get_indexer(keys)
+        added = known < 0
+        changed = ~added
+        changed[changed] = self.row_hashes[known[changed]] != hashes[changed]
+        kept = np.zeros(len(self.row_keys), dtype=bool)
+        kept[known[~added]] = True
+        removed = ~kept
+        kept[known[changed]] = False
+
+        # Old versions of changed rows and removed rows are folded out
+        stale = ~kept
+        np.subtract.at(self.counts, self.row_patterns[stale], 1)
+        stale_keys = self.row_keys[stale]
+        self._stale_keys = np.concatenate([self._stale_keys, stale_keys])
+        self._fresh = [frame[~frame['ID'].isin(stale_keys)] for frame in self._fresh]
+
+        fresh = added | changed
+        patterns = np.empty(len(df), dtype=np.int64)
+        patterns[~fresh] = self.row_patterns[known[~fresh]]
+        if fresh.any():
+            batch = df[fresh]
+            patterns[fresh] = self._pattern_codes(batch, annotator_ids[fresh])
+            np.add.at(self.counts, patterns[fresh], 1)
+            self._fresh.append(_disagreement_frame(keys[fresh], batch))
+
+        self.row_keys, self.row_hashes, self.row_patterns = keys, hashes, patterns
+        return int(added.sum()), int(changed.sum()), int(removed.sum())
+
+    def pattern_counts(self):
+        """Counts of the patterns with items, as agreement_metrics.rating_patterns gives them"""
+        patterns = pd.DataFrame(self.patterns, columns=PATTERN_COLUMNS).assign(count=self.counts)
+        patterns[['value_1', 'value_2']] = patterns[['value_1', 'value_2']].astype(float)
+        return sort_patterns(patterns[patterns['count'] > 0])
+
+    def report(self, n_resamples=BOOTSTRAP_RESAMPLES, confidence=BOOTSTRAP_CONFIDENCE, seed=RANDOM_SEED):
+        """Build the agreement report, equal to compute_agreement and compute_agreement_metrics on all rows
+
+        The disagreement cases are left out, they are in the disagreements file (see save).
+        """
+        patterns = self.pattern_counts()
+        value_1, value_2, counts = patterns['value_1'], patterns['value_2'], patterns['count']
+        valid = value_1.notna() & value_2.notna()
+        disagree = valid & (value_1 != value_2)
+
+        total_count = int(counts[valid].sum())
+        disagreement_count = int(counts[disagree].sum())
+        agreement_count = total_count - disagreement_count
+        total_difference = float(((value_1 - value_2).abs() * counts)[disagree].sum())
+
+        return {
+            'agreement_rate': (agreement_count / total_count * 100) if total_count > 0 else 0,
+            'total_rows': total_count,
+            'agreement_count': agreement_count,
+            'disagreement_count': disagreement_count,
+            'average_difference': (total_difference / disagreement_count) if disagreement_count > 0 else 0,
+            'annotation_frequencies': {
+                'annotator_1': _frequencies(value_1, counts),
+                'annotator_2': _frequencies(value_2, counts)
+            },
+            'chance_corrected': pattern_metrics(patterns, n_resamples, confidence, seed)
+        }
+
+    def _write_disagreements(self, path):
+        """Merge the records of the folded-in rows into the disagreements file, a line at a time"""
+        stale = set(self._stale_keys.tolist())
+
+        def saved_lines():
+            if not self._saved:
+                return
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    # Records start with their integer ID, see _json_lines
+                    key = int(line[_ID_START:line.index(',', _ID_START)])
+                    if key not in stale:
+                        yield key, line
+
+        fresh = [_json_lines(frame) for frame in self._fresh]
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for _, line in heapq.merge(saved_lines(), *fresh, key=lambda item: item[0]):
+                f.write(line)
+        os.replace(tmp_path, path)
+
+    def save(self, path, disagreements_file, inputs=()):
+        """Save the statistics to an .npz file and the disagreements to a JSON lines file
+
+        The disagreements file holds one record per disagreeing row, with the
+        row key in ID, ordered by ID. Only the records of the rows folded in
+        or out since the last save are merged into it, and it is not rewritten
+        when there are none. Both files are replaced whole, the disagreements
+        file first: when saving stops in between, the statistics no longer
+        match it and are built again on the next load.
+
+        Args:
+            path (str): Statistics file, see stats_path
+            disagreements_file (str): Disagreements file, see disagreements_path
+            inputs (list): Signatures of the files the rows and annotators were read from,
+                taken before reading them, see input_signatures
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if len(self._stale_keys) or self._fresh or not self._saved or not os.path.exists(disagreements_file):
+            self._write_disagreements(disagreements_file)
+        self._stale_keys, self._fresh, self._saved = np.zeros(0, dtype=np.int64), [], True
+        self.inputs = list(inputs)
+        meta = {'version': STATS_VERSION, 'source': self.source, 'patterns': self.patterns,
+                'disagreements_file': _file_signature(disagreements_file), 'inputs': self.inputs}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, meta=np.array(json.dumps(meta, ensure_ascii=False)), counts=self.counts,
+                     row_keys=self.row_keys, row_hashes=self.row_hashes, row_patterns=self.row_patterns)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, source, disagreements_file):
+        """Load saved statistics of a source file
+
+        Returns:
+            AgreementStats: The saved statistics, or empty ones when there are none
+                for this source, they were saved by another version or the
+                disagreements file changed since
+        """
+        stats = cls(source)
+        if not os.path.exists(path):
+            return stats
+        with np.load(path) as data:
+            meta = json.loads(data['meta'].item())
+            if meta['version'] != STATS_VERSION or meta['source'] != stats.source or \
+                    meta['disagreements_file'] != _file_signature(disagreements_file):
+                return stats
+            stats.patterns = meta['patterns']
+            stats.inputs = meta['inputs']
+            stats._pattern_index = {tuple(pattern): i for i, pattern in enumerate(stats.patterns)}
+            stats.counts = data['counts']
+            stats.row_keys = data['row_keys']
+            stats.row_hashes = data['row_hashes']
+            stats.row_patterns = data['row_patterns']
+        stats._saved = True
+        return stats
+
+
+def _frequencies(values, counts):
+    """Items per label, most frequent first"""
+    totals = counts.groupby(values).sum().sort_index()
+    totals = totals[totals > 0].sort_values(ascending=False, kind='stable')
+    return {float(value): int(count) for value, count in totals.items()}
@@ -0,0 +1,117 @@
+import threading
+from contextlib import asynccontextmanager
+from datetime import date
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Query
+import aggregates
+from search_index import tokenize
+from search_store import SearchStore
+from config import SEARCH_REFRESH_SECONDS, SEARCH_PAGE_SIZE, SEARCH_MAX_PAGE_SIZE
+
+# Run with: python src/main.py --mode serve (or uvicorn api:app --app-dir src)
+SENTIMENT_NAMES = {1: 'positive', 0: 'neutral', -1: 'negative'}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Open the search index on first use, so importing the app creates no database"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SearchStore()
+        return _store
+
+
+def _refresh():
+    try:
+        store = get_store()
+        added = store.refresh()
+        if added:
+            print(f"Search index: {added} new articles, {store.count()} in total")
+        if aggregates.update_aggregates():
+            print("Sentiment aggregates updated")
+    except Exception as e:
+        print(f"Error refreshing the search index and aggregates: {str(e)}")
+
+
+def _refresh_periodically(stop):
+    while not stop.wait(SEARCH_REFRESH_SECONDS):
+        _refresh()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    stop = threading.Event()
+    get_store()
+    if SEARCH_REFRESH_SECONDS > 0:
+        # The first refresh fills a new index, later ones pick up newly scraped and annotated articles
+        _refresh()
+        threading.Thread(target=_refresh_periodically, args=(stop,), daemon=True).start()
+    yield
+    stop.set()
+
+
+app = FastAPI(title='WSJ Headline Search', lifespan=lifespan)
+
+
+def _page(query, sentiment, category, start_date, end_date, page, page_size):
+    articles, total = get_store().search(query, sentiment, category,
+                                         start_date.isoformat() if start_date else None,
+                                         end_date.isoformat() if end_date else None, page, page_size)
+    for article in articles:
+        labels = {article['annotation_1'], article['annotation_2']} - {None}
+        # Shown only when the annotators agree
+        article['sentiment'] = SENTIMENT_NAMES.get(labels.pop()) if len(labels) == 1 else None
+    return {'total': total, 'page': page, 'page_size': page_size, 'results': articles}
+
+
+@app.get('/search')
+def search(q: str = Query(..., min_length=1, description='Search terms, matched as word prefixes'),
+           sentiment: Optional[List[int]] = Query(None, description='Labels to filter on: 1, 0 or -1'),
+           category: Optional[List[str]] = Query(None),
+           start_date: Optional[date] = None,
+           end_date: Optional[date] = None,
+           page: int = Query(1, ge=1),
+           page_size: int = Query(SEARCH_PAGE_SIZE, ge=1, le=SEARCH_MAX_PAGE_SIZE)):
+    """Search headlines by keywords, newest first"""
+    # Without letters or digits there is nothing to match, and an empty query would list every article
+    if not tokenize(q):
+        raise HTTPException(status_code=422, detail='q has no search terms, it needs letters or digits')
+    return _page(q, sentiment, category, start_date, end_date, page, page_size)
+
+
+@app.get('/filter')
+def filter_articles(sentiment: Optional[List[int]] = Query(None, description='Labels to filter on: 1, 0 or -1'),
+                    category: Optional[List[str]] = Query(None),
+                    start_date: Optional[date] = None,
+                    end_date: Optional[date] = None,
+                    page: int = Query(1, ge=1),
+                    page_size: int = Query(SEARCH_PAGE_SIZE, ge=1, le=SEARCH_MAX_PAGE_SIZE)):
+    """List headlines by sentiment, category and date, newest first"""
+    return _page('', sentiment, category, start_date, end_date, page, page_size)
+
+
+@app.get('/trend')
+def trend(frequency: str = Query('monthly', pattern='^(daily|weekly|monthly)$'),
+          category: Optional[List[str]] = Query(None),
+          start_date: Optional[date] = None,
+          end_date: Optional[date] = None,
+          by_category: bool = True):
+    """Sentiment counts, net sentiment and agreement per period, from the precomputed aggregates"""
+    trend = aggregates.load_trend(frequency, category, start_date.isoformat() if start_date else None,
+                                  end_date.isoformat() if end_date else None, by_category)
+    trend['Date'] = trend['Date'].dt.strftime('%Y-%m-%d')
+    # Ratios are undefined for periods without labels, JSON gets null for them
+    return {'frequency': frequency,
+            'periods': trend.astype(object).where(trend.notna(), None).to_dict(orient='records')}
+
+
+@app.post('/refresh')
+def refresh():
+    """Index the articles and annotations that arrived since the last refresh"""
+    store = get_store()
+    added = store.refresh()
+    aggregates.update_aggregates()
+    return {'added': added, 'total': store.count()}
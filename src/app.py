@@ -1,20 +1,30 @@
+import os
 import streamlit as st  # Import Streamlit
 import pandas as pd
 import plotly.express as px
-import re
-import os
-
-# Set data file path
-ANNOTATED_DATA_FILE = os.path.join('data', 'annotated', 'annotated_data.csv')
+import dataset
+import aggregates
+import sentiment_model
+from config import ANNOTATED_DATA_FILE
+from search_index import HeadlineIndex
 
 # Set page configuration
 st.set_page_config(page_title="WSJ Article Annotation Visualization", layout="wide")
 
-# Load data
-@st.cache_data
-def load_data():
+# Size and modification time of the annotated file, the cache key of everything loaded from it
+def data_version(path=ANNOTATED_DATA_FILE):
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+# Load data, again when the annotated file changed
+@st.cache_data(max_entries=1)
+def load_data(version):
     try:
-        df = pd.read_csv(ANNOTATED_DATA_FILE)
+        # Typed annotated dataset: int8 labels with their notes in Annotation_*_note,
+        # and the baseline classifier's pre-labels in Predicted and Confidence
+        df = sentiment_model.join_predictions(dataset.load_annotated(ANNOTATED_DATA_FILE))
         
         # Display column names to ensure correct parsing
         st.write("📌 Loaded Columns:", df.columns.tolist())
@@ -29,17 +39,11 @@ def load_data():
         }
         df = df.rename(columns=expected_columns)
         
-        # Ensure annotation columns only contain -1, 0, 1
-        def clean_annotation(value):
-            if pd.isna(value):
-                return 0  # Handle missing values
-            match = re.search(r'(-1|0|1)', str(value))  # Extract -1, 0, or 1
-            return int(match.group()) if match else 0  # Default to 0 if no match
-        
         # Process annotation columns
         if "annotation_1" in df.columns and "annotation_2" in df.columns:
-            df["annotation_1"] = df["annotation_1"].apply(clean_annotation)
-            df["annotation_2"] = df["annotation_2"].apply(clean_annotation)
+            # Missing annotations count as neutral
+            df["annotation_1"] = df["annotation_1"].fillna(0).astype("int8")
+            df["annotation_2"] = df["annotation_2"].fillna(0).astype("int8")
         else:
             st.error("❌ `annotation_1` or `annotation_2` column not found. Please check the dataset format!")
             
@@ -48,9 +52,20 @@ def load_data():
         st.error(f"❌ Error loading data: {str(e)}")
         return None
 
+# Trend data comes from the precomputed aggregates, brought up to date when the annotations changed
+def load_trend(frequency, by_category=True):
+    aggregates.update_aggregates(ANNOTATED_DATA_FILE)
+    return aggregates.load_trend(frequency, by_category=by_category)
+
+# Build the search index once per version of the annotated file, not on every rerun
+@st.cache_resource(max_entries=1)
+def get_search_index(_data, version):
+    return HeadlineIndex(_data)
+
 # Main program
 def main():
-    data = load_data()
+    version = data_version()
+    data = load_data(version)
     if data is None:
         return
 
@@ -58,31 +73,28 @@ def main():
     menu = st.sidebar.radio("Select Page", ["Data Browser", "Data Visualization"])
 
     if menu == "Data Browser":
-        display_data_browser(data)
+        display_data_browser(data, version)
     elif menu == "Data Visualization":
         display_data_visualization(data)
 
-def display_data_browser(data):
+def display_data_browser(data, version):
     st.title("🔍 Annotation Data Browser")
     
-    # Search functionality (searches the entire table)
-    search_query = st.text_input("🔎 Search (across all columns)", "")
-    
-    if search_query:
-        search_query = search_query.lower()
-        mask = data.apply(lambda col: col.astype(str).str.lower().str.contains(search_query, na=False))
-        filtered_data = data[mask.any(axis=1)]
-    else:
-        filtered_data = data
+    # Search functionality (token prefixes of title, category and URL)
+    search_query = st.text_input("🔎 Search headlines", "")
+    sentiments = st.multiselect("Sentiment (either annotator)", [1, 0, -1],
+                                format_func={1: "positive", 0: "neutral", -1: "negative"}.get)
+    index = get_search_index(data, version)
     
     # Pagination
     page_size = 10
-    total_pages = (len(filtered_data) // page_size) + 1
+    _, total = index.search(search_query, sentiments, page=1, page_size=page_size)
+    total_pages = max(1, -(-total // page_size))
     page = st.number_input("Page", min_value=1, max_value=total_pages, step=1, value=1)
-    start_idx = (page - 1) * page_size
-    end_idx = start_idx + page_size
+    ids, _ = index.search(search_query, sentiments, page=page, page_size=page_size)
     
-    st.dataframe(filtered_data.iloc[start_idx:end_idx])
+    st.write(f"{total} matching articles")
+    st.dataframe(data.iloc[ids])
 
 def display_data_visualization(data):
     st.title("📊 Data Visualization")
@@ -98,9 +110,9 @@ def display_data_visualization(data):
                     labels={"index": "Annotation Category", "value": "Count"})
         st.plotly_chart(fig)
         
-        # Compute annotation agreement
-        data["agreement"] = (data["annotation_1"] == data["annotation_2"]).astype(int)
-        agreement_rate = data["agreement"].mean()
+        # Annotation agreement over all months, summed from the aggregates
+        totals = load_trend("monthly", by_category=False)
+        agreement_rate = totals["agreed"].sum() / max(totals["paired"].sum(), 1)
         
         st.subheader("🔹 Annotation Agreement")
         st.write(f"**Annotator Agreement Rate:** {agreement_rate:.2%}")
@@ -108,6 +120,28 @@ def display_data_visualization(data):
                         values=[agreement_rate, 1 - agreement_rate], 
                         title="Annotation Agreement Ratio")
         st.plotly_chart(fig_pie)
+        
+        # Pre-labels of the baseline classifier (--mode label) against the annotators
+        prelabeled = data[data["Predicted"].notna()]
+        if not prelabeled.empty:
+            st.subheader("🔹 Classifier Pre-labels")
+            matches = {name: (prelabeled["Predicted"] == prelabeled[column]).mean()
+                       for name, column in [("Annotator 1", "annotation_1"), ("Annotator 2", "annotation_2")]}
+            st.write(f"**{len(prelabeled)} of {len(data)} articles pre-labeled**, mean confidence "
+                     f"{prelabeled['Confidence'].mean():.2f}")
+            st.write(" · ".join(f"Agreement with {name}: {rate:.2%}" for name, rate in matches.items()))
+        
+        # Sentiment over time per category
+        st.subheader("🔹 Sentiment Trend")
+        frequency = st.radio("Period", list(aggregates.FREQUENCIES), index=2, horizontal=True)
+        trend = load_trend(frequency)
+        fig_trend = px.line(trend, x="Date", y="net_sentiment", color="Category", markers=True,
+                            title="Net Sentiment ((positive - negative) / labels)",
+                            labels={"net_sentiment": "Net Sentiment"})
+        st.plotly_chart(fig_trend)
+        fig_agreement = px.line(trend, x="Date", y="agreement", color="Category", markers=True,
+                                title="Annotator Agreement", labels={"agreement": "Agreement Rate"})
+        st.plotly_chart(fig_agreement)
     else:
         st.error("❌ `annotation_1` or `annotation_2` column not found. Please check the dataset format!")
     
@@ -0,0 +1,143 @@
+from collections import namedtuple
+from config import HTML_PARSER_BACKEND
+
+# WSJ archive markup
+HEADLINE_CLASS = "WSJTheme--headline--unZqjb45"
+CATEGORY_CLASS = "WSJTheme--articleType--34Gt-vdG"
+PAGINATION_CLASS = "WSJTheme--pagination--1jWoU_y9"
+
+# One selector list covering headline links, categories and pagination links,
+# so every backend collects all of them in a single document-order pass
+ARCHIVE_SELECTOR = f".{HEADLINE_CLASS} a, .{CATEGORY_CLASS}, .{PAGINATION_CLASS} a"
+
+# Parsed archive page
+#   headlines: list of (title, href) tuples, href is None when the link has none
+#   categories: list of category labels in page order
+#   max_pages: number of archive pages for the day
+ArchivePage = namedtuple('ArchivePage', ['headlines', 'categories', 'max_pages'])
+
+
+def _max_pages(labels):
+    pages = [int(label) for label in labels if label.isdigit()]
+    return max(pages) if pages else 1
+
+
+def _has_class(classes, name):
+    return name in classes.split() if isinstance(classes, str) else name in (classes or [])
+
+
+def parse_with_selectolax(html):
+    """Parse an archive page with selectolax (lexbor engine when available)"""
+    try:
+        from selectolax.lexbor import LexborHTMLParser as Parser
+    except ImportError:
+        from selectolax.parser import HTMLParser as Parser
+
+    headlines, categories, pagination = [], [], []
+    for node in Parser(html).css(ARCHIVE_SELECTOR):
+        text = node.text(deep=True, separator='', strip=True)
+        if _has_class(node.attributes.get('class'), CATEGORY_CLASS):
+            categories.append(text)
+            continue
+        parent = node.parent
+        while parent is not None and not _has_class(parent.attributes.get('class'), PAGINATION_CLASS):
+            parent = parent.parent
+        if parent is not None:
+            pagination.append(text)
+        else:
+            headlines.append((text, node.attributes.get('href')))
+    return ArchivePage(headlines, categories, _max_pages(pagination))
+
+
+def parse_with_lxml(html):
+    """Parse an archive page with lxml"""
+    import lxml.etree
+    import lxml.html
+
+    def has_class(name):
+        return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+    try:
+        root = lxml.html.fromstring(html)
+    except lxml.etree.ParserError:
+        # Empty, whitespace or comment-only bodies have no elements, the other backends find nothing in them
+        return ArchivePage([], [], 1)
+    headlines, categories, pagination = [], [], []
+    # An XPath union returns nodes in document order
+    nodes = root.xpath(f"//*[{has_class(HEADLINE_CLASS)}]//a | //*[{has_class(CATEGORY_CLASS)}]"
+                       f" | //*[{has_class(PAGINATION_CLASS)}]//a")
+    for node in nodes:
+        text = "".join(part.strip() for part in node.itertext())
+        if _has_class(node.get('class'), CATEGORY_CLASS):
+            categories.append(text)
+        elif any(_has_class(parent.get('class'), PAGINATION_CLASS) for parent in node.iterancestors()):
+            pagination.append(text)
+        else:
+            headlines.append((text, node.get('href')))
+    return ArchivePage(headlines, categories, _max_pages(pagination))
+
+
+def parse_soup(soup):
+    """Extract an archive page from an already built BeautifulSoup tree"""
+    headlines, categories, pagination = [], [], []
+    for node in soup.select(ARCHIVE_SELECTOR):
+        text = node.get_text(strip=True)
+        if _has_class(node.get('class'), CATEGORY_CLASS):
+            categories.append(text)
+        elif node.find_parent(class_=PAGINATION_CLASS) is not None:
+            pagination.append(text)
+        else:
+            headlines.append((text, node.get('href')))
+    return ArchivePage(headlines, categories, _max_pages(pagination))
+
+
+def parse_with_bs4(html):
+    """Parse an archive page with BeautifulSoup and the built-in html.parser"""
+    from bs4 import BeautifulSoup
+    return parse_soup(BeautifulSoup(html, "html.parser"))
+
+
+BACKENDS = {
+    'selectolax': parse_with_selectolax,
+    'lxml': parse_with_lxml,
+    'bs4': parse_with_bs4
+}
+
+
+def available_backends():
+    """List the installed parser backends, fastest first"""
+    available = []
+    for name, module in [('selectolax', 'selectolax'), ('lxml', 'lxml.html'), ('bs4', 'bs4')]:
+        try:
+            __import__(module)
+            available.append(name)
+        except ImportError:
+            pass
+    return available
+
+
+def get_parser(backend=HTML_PARSER_BACKEND):
+    """Get the parse function of a backend
+
+    Args:
+        backend (str): 'selectolax', 'lxml', 'bs4', or 'auto' for the fastest installed one
+    """
+    if backend == 'auto':
+        installed = available_backends()
+        if not installed:
+            raise ImportError("No HTML parser backend installed, install selectolax, lxml or beautifulsoup4")
+        backend = installed[0]
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown HTML parser backend: {backend}")
+    return BACKENDS[backend]
+
+
+_parser = None
+
+
+def parse_archive_page(html):
+    """Parse archive page HTML with the configured backend"""
+    global _parser
+    if _parser is None:
+        _parser = get_parser()
+    return _parser(html)
@@ -1,43 +1,100 @@
 import argparse
+from config import (
+    SCRAPER_REQUESTS_PER_SECOND,
+    RAW_OUTPUT_FORMAT,
+    SAMPLING_MODE,
+    LABEL_WORKERS,
+    TREND_FREQUENCIES,
+    API_HOST,
+    API_PORT
+)
+
+MODES = ['scrape', 'incremental', 'reparse', 'dataset', 'preprocess', 'analyze', 'trend', 'label', 'pipeline', 'serve']
+
+# Stages of the pipeline mode, see pipeline.STAGES
+PIPELINE_STAGES = ['scrape', 'raw_dataset', 'annotated_dataset', 'preprocess', 'analyze', 'trend', 'label', 'search']
+
+
+def quota(value):
+    """Parse a STRATUM=COUNT quota into a (stratum, count) pair"""
+    stratum, _, count = value.rpartition('=')
+    if not stratum or not count.isdigit():
+        raise argparse.ArgumentTypeError(f"Expected STRATUM=COUNT, got {value!r}")
+    return stratum.strip(), int(count)
+
+
+def build_parser():
+    """Build the command line parser of main.py
+
+    Only argparse and config are imported here, so parsing the arguments and
+    --help stay fast, the modules of a mode are imported when it runs.
+    """
+    parser = argparse.ArgumentParser(description='WSJ Article Scraping and Annotation Tool')
+    parser.add_argument('--mode', choices=MODES,
+                      required=True,
+                      help='Operation mode: scrape, incremental (scrape days since the last run), '
+                           'reparse (rebuild raw data from cached pages), dataset (refresh the typed '
+                           'Parquet datasets), preprocess, analyze, trend (sentiment over time), '
+                           'label (pre-label raw headlines with the baseline classifier), '
+                           'pipeline (run the stages whose inputs changed), or serve (headline search API)')
+
+    # Arguments for scrape mode
+    parser.add_argument('--start-date', help='Start date for scraping, or of the articles to preprocess (YYYY-MM-DD)')
+    parser.add_argument('--end-date', help='End date for scraping, or of the articles to preprocess (YYYY-MM-DD)')
+    parser.add_argument('--workers', type=int,
+                      help='Number of concurrent requests, 1 scrapes serially (default: 1), '
+                           f'or of labeling processes in label mode (default: {LABEL_WORKERS})')
+    parser.add_argument('--rps', type=float, default=SCRAPER_REQUESTS_PER_SECOND,
+                      help=f'Global requests-per-second budget for concurrent scraping (default: {SCRAPER_REQUESTS_PER_SECOND})')
+    parser.add_argument('--format', choices=['csv', 'parquet'], default=RAW_OUTPUT_FORMAT,
+                      help=f'Output format for scraped articles (default: {RAW_OUTPUT_FORMAT})')
+
+    # Arguments for preprocess mode
+    parser.add_argument('--samples', type=int, default=200,
+                      help='Number of samples to select (default: 200)')
+    parser.add_argument('--category', action='append', dest='categories',
+                      help='Only preprocess, label or show trends of articles of this category, can be repeated')
+    parser.add_argument('--sampling', choices=['random', 'reservoir', 'stratified'], default=SAMPLING_MODE,
+                      help='Sampling mode: random (in memory), reservoir (streamed) or stratified '
+                           f'(streamed, by month and category) (default: {SAMPLING_MODE})')
+    parser.add_argument('--exclude-annotated', action='store_true',
+                      help='Do not sample articles that were already annotated')
+    parser.add_argument('--quota', type=quota, action='append', dest='quotas', metavar='STRATUM=COUNT',
+                      help="Articles to draw from a stratum in stratified sampling instead of proportional "
+                           "quotas, e.g. '2024-03 | U.S. Markets=20', can be repeated")
+
+    # Arguments for analyze mode
+    parser.add_argument('--output', help='Output file path for analysis results (or the predicted labels dataset)')
+
+    # Arguments for label mode
+    parser.add_argument('--retrain', action='store_true',
+                      help='Train the sentiment classifier again even if it is newer than the annotated data')
+
+    # Arguments for trend mode
+    parser.add_argument('--frequency', choices=list(TREND_FREQUENCIES), default='monthly',
+                      help='Period of the sentiment trend (default: monthly)')
+    parser.add_argument('--all-categories', action='store_true',
+                      help='Show the trend over all categories together instead of per category')
+
+    # Arguments for pipeline mode
+    parser.add_argument('--stages', nargs='+', choices=PIPELINE_STAGES,
+                      help='Pipeline stages to run, with the stages they depend on '
+                           '(default: all but scrape, which needs the network, and preprocess, '
+                           'which replaces the annotation batch)')
+    parser.add_argument('--force', action='store_true',
+                      help='Run the selected pipeline stages even if nothing they depend on changed')
+
+    # Arguments for serve mode
+    parser.add_argument('--host', default=API_HOST, help=f'Address to serve the search API on (default: {API_HOST})')
+    parser.add_argument('--port', type=int, default=API_PORT, help=f'Port of the search API (default: {API_PORT})')
+
+    # Instrumentation, for every mode
+    parser.add_argument('--profile', choices=['cprofile', 'pyinstrument'],
+                      help='Profile this run and save the profile next to the metrics '
+                           '(pyinstrument has to be installed separately)')
+    return parser
+
 
 def parse_args():
     """Parse command line arguments"""
-    parser = argparse.ArgumentParser(description='WSJ News Sentiment Annotation Tool')
-    
-    parser.add_argument(
-        '--mode', 
-        type=str, 
-        choices=['scrape', 'preprocess', 'analyze'],
-        required=True,
-        help='Select mode: scrape(collect data), preprocess(data preprocessing), or analyze(agreement analysis)'
-    )
-    
-    # Scraper parameters
-    parser.add_argument(
-        '--start-date',
-        type=str,
-        help='Start date for scraping (YYYY-MM-DD format)'
-    )
-    
-    parser.add_argument(
-        '--end-date',
-        type=str,
-        help='End date for scraping (YYYY-MM-DD format)'
-    )
-    
-    # Preprocessing parameters
-    parser.add_argument(
-        '--samples',
-        type=int,
-        default=200,
-        help='Number of samples for preprocessing (default: 200)'
-    )
-    
-    # Common parameters
-    parser.add_argument(
-        '--output',
-        type=str,
-        help='Output file path (optional)'
-    )
-    
-    return parser.parse_args() 
\ No newline at end of file
+    return build_parser().parse_args()
@@ -0,0 +1,123 @@
+import csv
+import os
+import shutil
+import instrumentation
+from config import RAW_COLUMNS, RAW_WRITE_BATCH_SIZE
+
+
+def _remove(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    else:
+        os.remove(path)
+
+
+class ArticleWriter:
+    """Streaming writer for scraped articles with a fixed column schema
+
+    Articles are buffered and written in row batches while the crawl runs, so
+    memory stays flat and the output can be read before the crawl finishes.
+
+    CSV output is a single file that is flushed after every batch. Parquet
+    output is a directory of part files, each batch becoming one complete part
+    file, which any Parquet reader can load as a dataset at any time. When the
+    output already exists, the new one is written to a temporary file or
+    directory next to it that replaces it on close, so nothing of the old
+    output is left over, and readers see the old output until the new one is
+    complete. An output without rows never replaces an existing one.
+    """
+
+    def __init__(self, path, file_format=None, batch_size=RAW_WRITE_BATCH_SIZE, columns=RAW_COLUMNS):
+        """
+        Args:
+            path (str): Output CSV file or Parquet directory
+            file_format (str, optional): 'csv' or 'parquet', inferred from the path when None
+            batch_size (int): Number of rows written per batch
+            columns (list): Output columns, missing values are written empty
+        """
+        self.path = path
+        self.file_format = file_format or ('parquet' if path.endswith('.parquet') else 'csv')
+        self.batch_size = batch_size
+        self.columns = columns
+        self.rows_written = 0
+        self._buffer = []
+        self._parts = 0
+        self._output_path = f"{path}.tmp" if os.path.exists(path) else path
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(self._output_path):
+            _remove(self._output_path)  # Left over from an interrupted run
+        if self.file_format == 'csv':
+            self._file = open(self._output_path, 'w', encoding='utf-8', newline='')
+            self._writer = csv.DictWriter(self._file, fieldnames=columns, extrasaction='ignore',
+                                          lineterminator='\n')
+            self._writer.writeheader()
+            self._file.flush()
+        elif self.file_format == 'parquet':
+            import pyarrow as pa
+            self._pa = pa
+            self._schema = pa.schema([(name, pa.int32() if name == 'Page' else pa.string()) for name in columns])
+            os.makedirs(self._output_path)
+        else:
+            raise ValueError(f"Unknown output format: {self.file_format}")
+
+    def write(self, articles):
+        """Queue articles for writing, flushing every full batch"""
+        self._buffer.extend(articles)
+        while len(self._buffer) >= self.batch_size:
+            self._write_batch(self._buffer[:self.batch_size])
+            self._buffer = self._buffer[self.batch_size:]
+
+    def flush(self):
+        """Write all queued articles"""
+        if self._buffer:
+            self._write_batch(self._buffer)
+            self._buffer = []
+
+    @instrumentation.stage('write_articles')
+    def _write_batch(self, rows):
+        if self.file_format == 'csv':
+            start = self._file.tell()
+            self._writer.writerows(rows)
+            self._file.flush()
+            instrumentation.count(written=self._file.tell() - start)
+        else:
+            import pyarrow.parquet as pq
+            table = self._pa.Table.from_pydict(
+                {name: [row.get(name) for row in rows] for name in self.columns}, schema=self._schema)
+            part_path = os.path.join(self._output_path, f'part-{self._parts:05d}.parquet')
+            # Write under a hidden name first so readers never see a half-written part
+            tmp_path = os.path.join(self._output_path, f'.part-{self._parts:05d}.parquet.tmp')
+            pq.write_table(table, tmp_path)
+            os.replace(tmp_path, part_path)
+            instrumentation.count(written=os.path.getsize(part_path))
+            self._parts += 1
+        self.rows_written += len(rows)
+        instrumentation.count(rows=len(rows))
+
+    def close(self, complete=True):
+        """Flush queued articles and close the output
+
+        Args:
+            complete (bool): Whether the output is complete, an incomplete output
+                written next to an existing one is dropped, keeping the old one
+        """
+        replacing = self._output_path != self.path
+        if complete or not replacing:
+            self.flush()
+        if self.file_format == 'csv':
+            self._file.close()
+        if not self.rows_written or (replacing and not complete):
+            _remove(self._output_path)
+        elif replacing and self.file_format == 'csv':
+            os.replace(self._output_path, self.path)
+        elif replacing:
+            from dataset import swap_directory
+            swap_directory(self._output_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.close(complete=exc_type is None)
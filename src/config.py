@@ -13,7 +13,24 @@ ANALYSIS_DIR = os.path.join(DATA_DIR, "analysis")
 # File path configuration
 READY_FOR_ANNOTATION_FILE = os.path.join(PROCESSED_DATA_DIR, "ready_for_annotation.csv")
 ANNOTATED_DATA_FILE = os.path.join(ANNOTATED_DATA_DIR, "annotated_data.csv")
+ASSIGNMENT_LOG_FILE = os.path.join(ANNOTATED_DATA_DIR, "assignments.csv")  # Append-only annotators of every sampled article
 ANALYSIS_REPORT_FILE = os.path.join(ANALYSIS_DIR, "analysis_report.json")
+AGGREGATES_DIR = os.path.join(ANALYSIS_DIR, "aggregates")  # Sentiment counts per day, week and month (see aggregates.py)
+TREND_FREQUENCIES = {'daily': 'D', 'weekly': 'W-SUN', 'monthly': 'M'}  # Trend periods and their pandas periods, weeks start on Monday
+
+# Typed Parquet datasets, partitioned by month (see dataset.py)
+RAW_DATASET = os.path.join(RAW_DATA_DIR, "articles.parquet")
+PROCESSED_DATASET = os.path.join(PROCESSED_DATA_DIR, "ready_for_annotation.parquet")
+ANNOTATED_DATASET = os.path.join(ANNOTATED_DATA_DIR, "annotated_data.parquet")
+
+# Persistent headline search index served by api.py (see search_store.py)
+# The index file and refresh interval can be overridden for benchmarking
+SEARCH_INDEX_FILE = os.environ.get("WSJ_SEARCH_INDEX", os.path.join(DATA_DIR, "search", "headlines.sqlite"))
+SEARCH_REFRESH_SECONDS = float(os.environ.get("WSJ_SEARCH_REFRESH_SECONDS", 60))  # 0 turns refreshing off
+SEARCH_PAGE_SIZE = 20  # Default results per page
+SEARCH_MAX_PAGE_SIZE = 100
+API_HOST = "127.0.0.1"
+API_PORT = 8000
 
 # Annotator configuration
 ANNOTATORS = [
@@ -22,6 +39,69 @@ ANNOTATORS = [
     "X3",
     "X4"
 ]
+ANNOTATOR_WEIGHTS = {"X1": 1.7}  # Relative capacity per annotator, annotators not listed have weight 1
+ANNOTATORS_PER_ITEM = 2  # Number of annotators assigned to each headline
 
 # Random seed for reproducibility
 RANDOM_SEED = 523
+
+# Annotation batch sampling (see sampling.py)
+SAMPLING_MODE = "random"  # "random" (in memory), "reservoir" (streamed) or "stratified" (streamed)
+SAMPLING_STRATA = ["Month", "Category"]  # Stratum columns for stratified sampling, Month is derived from Date
+
+# Scraper configuration
+# The archive URL template can be pointed at a local stand-in server for benchmarking
+WSJ_ARCHIVE_URL = os.environ.get(
+    "WSJ_ARCHIVE_URL", "https://www.wsj.com/news/archive/{date}?page={page}"
+)
+SCRAPER_WORKERS = 8  # Maximum number of concurrent requests in concurrent crawl mode
+SCRAPER_REQUESTS_PER_SECOND = 4.0  # Global request budget shared by all workers
+HTTP_POOL_SIZE = SCRAPER_WORKERS  # Keep-alive connections per host in the shared HTTP session
+HTTP_COMPRESSION = True  # Request gzip/deflate encoded archive pages
+SCRAPE_JOURNAL_FILE = os.path.join(RAW_DATA_DIR, "scrape_journal.jsonl")  # Progress journal for resumable scraping
+
+# Raw HTML cache for archive pages
+HTML_CACHE_ENABLED = True
+HTML_CACHE_DIR = os.path.join(RAW_DATA_DIR, "html_cache")
+HTML_CACHE_TTL_DAYS = None  # Archive pages of past days do not change, keep them until evicted by size
+HTML_CACHE_SETTLE_DAYS = 2  # Days after its date an archive page may still gain articles, copies fetched before are fetched again
+HTML_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+# HTML parser backend for archive pages: "auto" picks the fastest installed of selectolax, lxml and bs4
+HTML_PARSER_BACKEND = "auto"
+
+# Raw article output
+RAW_COLUMNS = ["Date", "Page", "Title", "Category", "URL"]
+RAW_DATE_FORMAT = "%Y/%m/%d"  # Article dates as the archive lists them, kept in the files written for annotation
+RAW_OUTPUT_FORMAT = "csv"  # "csv" or "parquet"
+RAW_WRITE_BATCH_SIZE = 500  # Rows per streamed write
+RAW_STORE_DIR = os.path.join(RAW_DATA_DIR, "store")  # Deduplicated raw articles, one file per month
+RAW_READ_CHUNK_SIZE = 100000  # Rows per chunk when scanning raw CSV files
+
+# Crawl pacing and error handling
+SCRAPER_SERIAL_REQUESTS_PER_SECOND = 0.5  # Serial crawl pace, one page every 2 seconds
+CIRCUIT_FAILURE_THRESHOLD = 10  # Consecutive failed requests before the crawler stops sending requests
+CIRCUIT_RESET_SECONDS = 60  # Cool-down before a probe request is let through again
+
+# Baseline sentiment classifier for pre-labeling raw headlines (see sentiment_model.py)
+SENTIMENT_MODEL_FILE = os.path.join(DATA_DIR, "models", "sentiment_model.npz")
+PREDICTED_LABELS_DATASET = os.path.join(PROCESSED_DATA_DIR, "predicted_labels.parquet")  # One partition per month
+SENTIMENT_HASH_BUCKETS = 2 ** 18  # Hashed unigram and bigram features
+SENTIMENT_NGRAMS = 2  # Longest word n-gram used as a feature
+SENTIMENT_SMOOTHING = 1.0  # Additive smoothing of the naive Bayes token counts
+LABEL_WORKERS = os.cpu_count() or 1  # Maximum number of labeling processes, one month of raw articles each
+
+# Per-stage metrics of every CLI run (see instrumentation.py)
+METRICS_DIR = os.environ.get("WSJ_METRICS_DIR", os.path.join(DATA_DIR, "metrics"))  # Also holds metrics_<mode>.prom
+METRICS_FILE = os.path.join(METRICS_DIR, "metrics.jsonl")  # One JSON line per stage and run
+
+# Cached pipeline runs (see pipeline.py)
+PIPELINE_STATE_FILE = os.path.join(DATA_DIR, "pipeline", "state.json")  # Stage fingerprints and file hashes
+PIPELINE_WORKERS = 4  # Maximum number of independent stages running at once
+
+# Chance-corrected agreement metrics
+BOOTSTRAP_RESAMPLES = 10000  # Item resamples for the metric confidence intervals
+BOOTSTRAP_CONFIDENCE = 0.95
+
+# Agreement report output
+DISAGREEMENT_TOP_K = 20  # Disagreement cases printed by the analysis, all of them are in the disagreements file
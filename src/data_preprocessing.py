@@ -1,79 +1,169 @@
-import pandas as pd
 import numpy as np
 import os
-import glob
+import heapq
+import dataset
+import instrumentation
+import raw_store
+import sampling
 from config import (
     RAW_DATA_DIR,
     PROCESSED_DATA_DIR,
     READY_FOR_ANNOTATION_FILE,
+    PROCESSED_DATASET,
     ANNOTATORS,
-    RANDOM_SEED
+    ANNOTATOR_WEIGHTS,
+    ANNOTATORS_PER_ITEM,
+    RANDOM_SEED,
+    SAMPLING_MODE,
+    SAMPLING_STRATA,
+    RAW_DATE_FORMAT
 )
 
-def load_raw_data():
-    """Load raw data from the first CSV file in raw directory"""
-    # Get all CSV files in raw directory
-    csv_files = glob.glob(os.path.join(RAW_DATA_DIR, "wsj_US_econ_articles_*.csv"))
-    if not csv_files:
-        raise FileNotFoundError(f"No CSV files found in {RAW_DATA_DIR}")
-    
-    # Sort by filename and get the first file
-    first_file = sorted(csv_files)[0]
-    print(f"Loading data from: {first_file}")
-    
-    return pd.read_csv(first_file)
+@instrumentation.stage('load_raw_data')
+def load_raw_data(start_date=None, end_date=None, categories=None):
+    """Load raw articles from the raw store and all raw files, deduplicated by URL
+    
+    Args:
+        start_date (str, optional): First article date to include (YYYY-MM-DD)
+        end_date (str, optional): Last article date to include (YYYY-MM-DD)
+        categories (list, optional): Categories to include, all when None
+    """
+    files = raw_store.store_partitions() + raw_store.raw_files()
+    if not files:
+        raise FileNotFoundError(f"No raw data files found in {RAW_DATA_DIR}")
+    
+    df = dataset.load_raw(start_date, end_date, categories)
+    print(f"Loaded {len(df)} articles from {len(files)} raw files in {RAW_DATA_DIR}")
+    instrumentation.count(rows=len(df))
+    return df
 
-def assign_annotators(df):
-    """Assign annotators to data following the notebook logic"""
-    # Initialize assignment count for each person
-    assignments_count = {person: 0 for person in ANNOTATORS}
-    assigned_people_list = []
-    
-    # Iterate through each row for assignment
-    for _ in range(len(df)):
-        # Sort people by their assignment count, with special weight for Yiwen Chen
-        sorted_people = sorted(
-            ANNOTATORS,
-            key=lambda person: assignments_count[person] if person != 'X1' else assignments_count[person] / 1.7
-        )
+@instrumentation.stage('assign_annotators')
+def assign_annotators(df, annotators=ANNOTATORS, weights=ANNOTATOR_WEIGHTS, per_item=ANNOTATORS_PER_ITEM):
+    """Assign annotators to data, balancing the load by annotator capacity
+    
+    Each row goes to the per_item annotators with the lowest weighted load
+    (assigned rows / weight), ties going to the annotator listed first. The
+    annotators are kept in a heap keyed by load, so a row costs O(per_item * log n)
+    instead of a full sort.
+    
+    Args:
+        df (pd.DataFrame): Data to assign
+        annotators (list): Annotator names
+        weights (dict): Relative capacity per annotator, missing annotators have weight 1
+        per_item (int): Number of annotators per row, written to Annotation_1 ... Annotation_<per_item>
         
-        # Assign to the two people with least assignments
-        assigned_people = [sorted_people[0], sorted_people[1]]
-        assigned_people_list.append(assigned_people)
+    Returns:
+        pd.DataFrame: Data with the annotator columns added
+    """
+    if per_item > len(annotators):
+        raise ValueError(f"Cannot assign {per_item} annotators per item with only {len(annotators)} annotators")
+    
+    instrumentation.count(rows=len(df))
+    capacity = [weights.get(person, 1) for person in annotators]
+    assignments_count = [0] * len(annotators)
+    heap = [(0, index) for index in range(len(annotators))]
+    assigned = np.empty((len(df), per_item), dtype=np.int64)
+    
+    for row in range(len(df)):
+        # Take the annotators with the least weighted load
+        for slot in range(per_item):
+            assigned[row, slot] = heapq.heappop(heap)[1]
         
-        # Update counts
-        assignments_count[assigned_people[0]] += 1
-        assignments_count[assigned_people[1]] += 1
+        # Update counts and put them back with their new load
+        for index in assigned[row].tolist():
+            assignments_count[index] += 1
+            heapq.heappush(heap, (assignments_count[index] / capacity[index], index))
     
     # Add annotator columns
-    df['Annotation_1'] = [assigned[0] for assigned in assigned_people_list]
-    df['Annotation_2'] = [assigned[1] for assigned in assigned_people_list]
+    names = np.array(annotators, dtype=object)
+    for slot in range(per_item):
+        df[f'Annotation_{slot + 1}'] = names[assigned[:, slot]]
     
     # Print assignment statistics
-    for person, count in assignments_count.items():
+    for person, count in zip(annotators, assignments_count):
         print(f'{person} is assigned {count} rows.')
     
     return df
 
-def preprocess_data(sample_size=200):
-    """Preprocess raw data and assign to annotators"""
-    print(f"Starting data preprocessing, sample size: {sample_size}...")
+def sample_raw_data(sample_size, start_date=None, end_date=None, categories=None, mode=SAMPLING_MODE,
+                    exclude_annotated=False, quotas=None, random_state=RANDOM_SEED):
+    """Draw an annotation batch from the raw data
     
-    # Load raw data
-    df = load_raw_data()
+    Args:
+        sample_size (int): Number of articles to sample, None or 0 keeps every article
+        start_date (str, optional): Only sample articles from this date on (YYYY-MM-DD)
+        end_date (str, optional): Only sample articles up to this date (YYYY-MM-DD)
+        categories (list, optional): Only sample articles of these categories
+        mode (str): 'random' samples in memory, 'reservoir' and 'stratified' (by
+            SAMPLING_STRATA, with proportional quotas) stream the raw dataset in batches
+        exclude_annotated (bool): Skip articles that were already annotated
+        quotas (dict, optional): Articles to draw per stratum in stratified mode, keyed
+            by stratum label such as '2024-03 | U.S. Markets', instead of proportional quotas
+        random_state (int): Seed, the same seed and raw data always give the same batch
+        
+    Returns:
+        pd.DataFrame: Sampled articles
+    """
+    if quotas and mode != 'stratified':
+        raise ValueError("Stratum quotas need stratified sampling")
+    excluded = sampling.annotated_urls() if exclude_annotated else set()
+    if excluded:
+        print(f"Excluding {len(excluded)} already annotated articles")
+    
+    if mode == 'random' or not (sample_size or quotas):
+        df = load_raw_data(start_date, end_date, categories)
+        if excluded:
+            df = df[~df['URL'].isin(excluded)]
+        if sample_size and len(df) > sample_size:
+            df = df.sample(n=sample_size, random_state=random_state)
+        return df
+    
+    def scan(columns=None):
+        if excluded and columns is not None:
+            columns = columns + ['URL']
+        chunks = dataset.scan_raw(start_date, end_date, categories, columns)
+        return sampling.exclude_urls(chunks, excluded) if excluded else chunks
+
+    if mode == 'reservoir':
+        df = sampling.reservoir_sample(scan(), sample_size, random_state)
+    elif mode == 'stratified':
+        df = sampling.stratified_sample(scan, sample_size, SAMPLING_STRATA, quotas, random_state)
+    else:
+        raise ValueError(f"Unknown sampling mode: {mode}")
+    print(f"Sampled {len(df)} articles ({mode})")
+    return df
+
+def preprocess_data(sample_size=200, start_date=None, end_date=None, categories=None, sampling_mode=SAMPLING_MODE,
+                    exclude_annotated=False, quotas=None):
+    """Preprocess raw data and assign to annotators
     
-    # Sample data if needed
-    if sample_size and len(df) > sample_size:
-        # Set random seed for reproducibility
-        np.random.seed(RANDOM_SEED)
-        df = df.sample(n=sample_size)
+    Args:
+        sample_size (int): Number of articles to sample
+        start_date (str, optional): Only sample articles from this date on (YYYY-MM-DD)
+        end_date (str, optional): Only sample articles up to this date (YYYY-MM-DD)
+        categories (list, optional): Only sample articles of these categories
+        sampling_mode (str): 'random', 'reservoir' or 'stratified', see sample_raw_data
+        exclude_annotated (bool): Skip articles that were already annotated
+        quotas (dict, optional): Articles to draw per stratum in stratified mode, see sample_raw_data
+    """
+    print(f"Starting data preprocessing, sample size: {sample_size}...")
+    
+    # Sample raw data
+    df = sample_raw_data(sample_size, start_date, end_date, categories, sampling_mode, exclude_annotated, quotas)
     
     # Assign annotators
     df = assign_annotators(df)
     
+    # Log the assignments before the batch file is replaced, analyses find annotators there
+    dataset.append_assignments(df)
+    
     # Save processed data
     os.makedirs(PROCESSED_DATA_DIR, exist_ok=True)
-    df.to_csv(READY_FOR_ANNOTATION_FILE, index=False)
+    with instrumentation.stage('write_csv', output=READY_FOR_ANNOTATION_FILE) as stage:
+        df.to_csv(READY_FOR_ANNOTATION_FILE, index=False, date_format=RAW_DATE_FORMAT)
+        stage.count(rows=len(df))
+    dataset.write_dataset(dataset.apply_schema(df, dataset.PROCESSED_SCHEMA), PROCESSED_DATASET,
+                          [READY_FOR_ANNOTATION_FILE])
     print(f"Data saved to {READY_FOR_ANNOTATION_FILE}")
     
     return df
@@ -104,7 +194,9 @@ def main(n_samples=200, output_file=None):
     output_path = output_file if output_file else READY_FOR_ANNOTATION_FILE
     
     # Save results
-    annotated_data.to_csv(output_path, index=False)
+    with instrumentation.stage('write_csv', output=output_path) as stage:
+        annotated_data.to_csv(output_path, index=False, date_format=RAW_DATE_FORMAT)
+        stage.count(rows=len(annotated_data))
     print(f"Data saved to {output_path}")
 
 if __name__ == "__main__":
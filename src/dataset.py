@@ -0,0 +1,547 @@
+import json
+import os
+import shutil
+from datetime import date
+import numpy as np
+import pandas as pd
+import instrumentation
+import raw_store
+from config import (
+    RAW_DATASET,
+    PROCESSED_DATASET,
+    ANNOTATED_DATASET,
+    READY_FOR_ANNOTATION_FILE,
+    ANNOTATED_DATA_FILE,
+    ASSIGNMENT_LOG_FILE,
+    RAW_READ_CHUNK_SIZE
+)
+
+# Typed schemas of the datasets. Dates are real dates, categories are
+# dictionary encoded and annotations are int8 labels with an optional note,
+# e.g. "1: positive" is stored as label 1 with note "positive". The annotation
+# as it was written is kept in Annotation_*_text for reports.
+RAW_SCHEMA = {
+    'Date': 'datetime64[ns]',
+    'Page': 'Int16',
+    'Title': 'string[pyarrow]',
+    'Category': 'category',
+    'URL': 'string[pyarrow]'
+}
+PROCESSED_SCHEMA = dict(RAW_SCHEMA, Annotation_1='category', Annotation_2='category')
+ANNOTATED_SCHEMA = {
+    'ID': 'Int32',
+    'Date': 'datetime64[ns]',
+    'Title': 'string[pyarrow]',
+    'Category': 'category',
+    'URL': 'string[pyarrow]',
+    'Annotation_1': 'Int8',
+    'Annotation_1_note': 'string[pyarrow]',
+    'Annotation_2': 'Int8',
+    'Annotation_2_note': 'string[pyarrow]',
+    'Annotation_1_text': 'string[pyarrow]',
+    'Annotation_2_text': 'string[pyarrow]'
+}
+ANNOTATION_COLUMNS = ['Annotation_1', 'Annotation_2']
+
+# Sidecar file recording the sources a dataset was built from
+_SOURCES_FILE = '_sources.json'
+# Layout of the raw dataset: rows numbered month by month, see write_months
+_RAW_LAYOUT = 'rows_by_month'
+
+
+def apply_schema(df, schema):
+    """Cast a DataFrame to a dataset schema, adding missing columns as empty
+
+    Columns that are not part of the schema, such as the id of the archive
+    export, are kept as they are, and the columns keep their order.
+    """
+    df = df.copy()
+    for column, dtype in schema.items():
+        if column not in df.columns:
+            df[column] = pd.Series(pd.NA, index=df.index)
+        if dtype.startswith('datetime64'):
+            df[column] = pd.to_datetime(df[column], format='mixed', errors='coerce')
+        else:
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+def split_annotations(df, columns=ANNOTATION_COLUMNS):
+    """Split free-text annotations such as "-1: negative" into int8 labels and notes, keeping the text"""
+    df = df.copy()
+    for column in columns:
+        df[f'{column}_text'] = df[column].astype('string[pyarrow]')
+        parts = df[column].astype('string').str.extract(r'(-?\d+)[\s:]*(.*)')
+        df[column] = pd.to_numeric(parts[0]).astype('Int8')
+        df[f'{column}_note'] = parts[1].str.strip().replace('', pd.NA).astype('string[pyarrow]')
+    return df
+
+
+def annotation_text(labels, notes):
+    """Format labels and notes back into annotation text, e.g. "1: positive" or "1"
+
+    The separator written by the annotator is not kept, use the Annotation_*_text
+    columns of the annotated dataset for the text as it was written.
+    """
+    text = labels.astype('string')
+    return text.where(notes.isna(), text + ': ' + notes.astype('string'))
+
+
+def _source_signature(sources, layout=None):
+    signature = {} if layout is None else {'_layout': layout}
+    for path in sources:
+        stat = os.stat(path)
+        signature[os.path.abspath(path)] = [stat.st_mtime_ns, stat.st_size]
+    return signature
+
+
+def _stored_signature(path):
+    sources_file = os.path.join(path, _SOURCES_FILE)
+    if not os.path.exists(sources_file):
+        return None
+    with open(sources_file, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def is_fresh(path, sources, layout=None):
+    """Check whether a dataset exists and was built from the current version of its sources"""
+    return _stored_signature(path) == _source_signature(sources, layout)
+
+
+def changed_sources(path, sources, layout=None):
+    """List the sources added, changed or removed since a dataset was built
+
+    Returns:
+        list: Absolute paths of the changed sources, None when the dataset
+            does not exist or was built with another layout
+    """
+    stored = _stored_signature(path)
+    current = _source_signature(sources, layout)
+    if stored is None or stored.get('_layout') != current.get('_layout'):
+        return None
+    return sorted(source for source in set(stored) | set(current)
+                  if source != '_layout' and stored.get(source) != current.get(source))
+
+
+def mark_fresh(path, sources, layout=None):
+    """Record the current version of the sources a directory was built from, see is_fresh"""
+    with open(os.path.join(path, _SOURCES_FILE), 'w', encoding='utf-8') as f:
+        json.dump(_source_signature(sources, layout), f)
+
+
+@instrumentation.stage('write_dataset')
+def write_dataset(data, path, sources=()):
+    """Write data as a Parquet dataset partitioned by month of its Date column
+
+    The dataset is written next to the old one and swapped in when complete,
+    so readers never see a half-written dataset. Row order is kept.
+
+    Args:
+        data (pd.DataFrame or iterable): Data with a Date column, or chunks of it
+            that are written one at a time
+        path (str): Dataset directory
+        sources (list): Files the data was built from, used by is_fresh
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+    rows = 0
+    for part, df in enumerate([data] if isinstance(data, pd.DataFrame) else data):
+        df = df.assign(Month=df['Date'].dt.strftime('%Y-%m'), _row=range(rows, rows + len(df)))
+        pq.write_to_dataset(pa.Table.from_pandas(df, preserve_index=False), tmp_path, partition_cols=['Month'],
+                            basename_template=f'part-{part:05d}-{{i}}.parquet')
+        rows += len(df)
+    mark_fresh(tmp_path, sources)
+    instrumentation.count(rows=rows, written=sum(os.path.getsize(os.path.join(directory, name))
+                                                 for directory, _, names in os.walk(tmp_path) for name in names))
+    swap_directory(tmp_path, path)
+
+
+def month_first_row(months):
+    """Number of the first row of each month in a dataset whose rows are numbered month by month
+
+    Months are numbered apart by 2**32 rows, so reading a whole dataset gives
+    the months in order, and a month written again alone gets the row
+    numbers a full write gives it.
+
+    Args:
+        months (pd.Series): Months as monthly periods, NaT sorts before every month
+    """
+    ordinals = np.where(months.isna(), -1, months.array.asi8)
+    return ordinals.astype(np.int64) << 32
+
+
+@instrumentation.stage('write_dataset')
+def write_months(data, path, sources=(), months=None, layout=_RAW_LAYOUT):
+    """Write chunks of data as a Parquet dataset partitioned by month, rows numbered month by month
+
+    Like write_dataset, except the rows of each month are numbered from the
+    month's first row (see month_first_row) in the order they come, so that
+    single months can be written again.
+
+    Args:
+        data (iterable): Chunks of data with a Date column
+        path (str): Dataset directory
+        sources (list): Files the data was built from, used by is_fresh
+        months (list, optional): Months (YYYY-MM) to replace, the data only holds
+            rows of these months and the other months of the dataset are kept.
+            The whole dataset is replaced when None.
+        layout (str): Layout recorded with the sources, see changed_sources
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+    written = {}
+    for part, df in enumerate(data):
+        periods = df['Date'].dt.to_period('M')
+        first_rows = month_first_row(periods)
+        # Rows written for the month in earlier chunks come first
+        offsets = pd.Series(first_rows).map(written).fillna(0).to_numpy(np.int64)
+        positions = pd.Series(first_rows).groupby(first_rows).cumcount().to_numpy() + offsets
+        df = df.assign(Month=periods.dt.strftime('%Y-%m'), _row=first_rows + positions)
+        pq.write_to_dataset(pa.Table.from_pandas(df, preserve_index=False), tmp_path, partition_cols=['Month'],
+                            basename_template=f'part-{part:05d}-{{i}}.parquet')
+        for first_row, count in zip(*np.unique(first_rows, return_counts=True)):
+            written[first_row] = written.get(first_row, 0) + int(count)
+    instrumentation.count(rows=sum(written.values()),
+                          written=sum(os.path.getsize(os.path.join(directory, name))
+                                      for directory, _, names in os.walk(tmp_path) for name in names))
+    if months is None:
+        mark_fresh(tmp_path, sources, layout)
+        swap_directory(tmp_path, path)
+    else:
+        replace_months(tmp_path, path, months)
+        mark_fresh(path, sources, layout)
+
+
+def replace_months(tmp_path, path, months):
+    """Move month partitions written at tmp_path into the dataset at path, keeping its other months
+
+    Partitions of the given months are replaced, or removed when tmp_path has
+    none for the month. The dataset no longer counts as fresh (see is_fresh)
+    until the caller marks it again, so a replacement that stops half way
+    is redone whole.
+
+    Args:
+        tmp_path (str): Dataset directory with the new partitions, removed afterwards
+        path (str): Dataset directory
+        months (list): Months (YYYY-MM) to replace
+    """
+    os.makedirs(path, exist_ok=True)
+    sources_file = os.path.join(path, _SOURCES_FILE)
+    if os.path.exists(sources_file):
+        os.remove(sources_file)
+    for month in months:
+        partition = os.path.join(path, f'Month={month}')
+        new_partition = os.path.join(tmp_path, f'Month={month}')
+        if os.path.exists(new_partition):
+            swap_directory(new_partition, partition)
+        elif os.path.exists(partition):
+            shutil.rmtree(partition)
+    shutil.rmtree(tmp_path)
+
+
+def swap_directory(tmp_path, path):
+    """Replace the directory at path with the complete one at tmp_path, removing the old one"""
+    old_path = f"{path}.old"
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    if os.path.exists(old_path):
+        shutil.rmtree(old_path)
+
+
+def dataset_months(path, start_date=None, end_date=None):
+    """Months (YYYY-MM) of the partitions of a dataset written by write_dataset, within a date range"""
+    months = sorted(name.split('=', 1)[1] for name in os.listdir(path) if name.startswith('Month='))
+    return [month for month in months
+            if (not start_date or month >= start_date[:7]) and (not end_date or month <= end_date[:7])]
+
+
+def _filters(start_date, end_date, categories):
+    """Parquet filters for a date range and categories, the month bounds prune whole partitions"""
+    filters = []
+    if start_date:
+        filters += [('Month', '>=', start_date[:7]), ('Date', '>=', pd.Timestamp(start_date))]
+    if end_date:
+        filters += [('Month', '<=', end_date[:7]), ('Date', '<=', pd.Timestamp(end_date))]
+    if categories is not None:
+        filters.append(('Category', 'in', list(categories)))
+    return filters or None
+
+
+def _to_frame(table):
+    """Convert an Arrow table or batch to pandas, keeping strings in Arrow memory"""
+    import pyarrow as pa
+    strings = pd.StringDtype('pyarrow')
+    return table.to_pandas(types_mapper={pa.string(): strings, pa.large_string(): strings}.get)
+
+
+@instrumentation.stage('read_dataset')
+def read_dataset(path, columns=None, start_date=None, end_date=None, categories=None):
+    """Read a Parquet dataset written by write_dataset
+
+    Month partitions outside the date range are skipped without being opened,
+    and the date and category filters are applied by the Parquet reader.
+
+    Args:
+        path (str): Dataset directory
+        columns (list, optional): Columns to read, all when None
+        start_date (str, optional): First date to include (YYYY-MM-DD)
+        end_date (str, optional): Last date to include (YYYY-MM-DD)
+        categories (list, optional): Categories to include, all when None
+
+    Returns:
+        pd.DataFrame: Rows in the order they were written
+    """
+    import pyarrow.parquet as pq
+
+    read_columns = None if columns is None else list(dict.fromkeys(list(columns) + ['_row']))
+    table = pq.read_table(path, columns=read_columns, filters=_filters(start_date, end_date, categories))
+    # Bytes of the decoded columns, the files are compressed
+    instrumentation.count(rows=table.num_rows, read=table.nbytes)
+    df = _to_frame(table)
+    if not df['_row'].is_monotonic_increasing:
+        df = df.sort_values('_row')
+    df = df.drop(columns=[column for column in ('_row', 'Month') if column in df.columns])
+    return df.reset_index(drop=True)
+
+
+def scan_dataset(path, columns=None, start_date=None, end_date=None, categories=None,
+                 batch_size=RAW_READ_CHUNK_SIZE):
+    """Read a Parquet dataset in batches, with the same filters as read_dataset
+
+    Only one batch is held in memory at a time. Batches come month by month
+    in a fixed order, so a pass over an unchanged dataset always sees the
+    rows in the same order.
+
+    Yields:
+        pd.DataFrame: Batches of at most batch_size rows
+    """
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    data = ds.dataset(path, format='parquet', partitioning='hive')
+    filters = _filters(start_date, end_date, categories) or []
+    # Month is a partition key, it selects the files but is not a column inside them
+    partition_filter = pq.filters_to_expression(filters) if filters else None
+    row_filters = [condition for condition in filters if condition[0] != 'Month']
+    row_filter = pq.filters_to_expression(row_filters) if row_filters else None
+    read_columns = None if columns is None else list(columns)
+    # The dataset schema carries the pandas metadata, so batches get the typed columns back
+    metadata = data.schema.metadata
+    fragments = sorted(data.get_fragments(filter=partition_filter), key=lambda fragment: fragment.path)
+    for fragment in fragments:
+        for batch in fragment.to_batches(columns=read_columns, filter=row_filter, batch_size=batch_size):
+            if batch.num_rows:
+                batch = batch.replace_schema_metadata(metadata)
+                df = _to_frame(batch)
+                yield df.drop(columns=[column for column in ('_row', 'Month') if column in df.columns])
+
+
+def _source_months(paths):
+    """Months covered by raw files according to their names, None when a name does not tell"""
+    months = set()
+    for path in paths:
+        first, last = raw_store.file_date_range(path)
+        if first is None:
+            return None
+        months.update(pd.period_range(first, last, freq='M').strftime('%Y-%m'))
+    return sorted(months)
+
+
+def _month_ranges(months):
+    """Split sorted months (YYYY-MM) into runs of consecutive months, as (first day, last day) pairs"""
+    ranges = []
+    for period in pd.PeriodIndex(months, freq='M'):
+        if ranges and ranges[-1][1] == period - 1:
+            ranges[-1][1] = period
+        else:
+            ranges.append([period, period])
+    return [(first.start_time.strftime('%Y-%m-%d'), last.end_time.strftime('%Y-%m-%d')) for first, last in ranges]
+
+
+def _dataset_columns(path):
+    import pyarrow.dataset as ds
+    names = ds.dataset(path, format='parquet', partitioning='hive').schema.names
+    return [name for name in names if name not in ('_row', 'Month')]
+
+
+def refresh_raw():
+    """Bring the raw dataset up to date with the raw files, chunk by chunk
+
+    Only the months covered by the raw files added, changed or removed since
+    the last refresh are rebuilt, from the raw files covering those months,
+    so a daily scrape file rebuilds one month. The dataset is built whole
+    when it does not exist yet, when a changed file's name does not tell
+    which dates it holds, or when the raw files gained columns. Rows of a
+    month keep the order a full build gives them. An article listed in
+    several months keeps the listing of the months that were not rebuilt.
+    """
+    sources = raw_store.store_partitions() + raw_store.raw_files()
+    changed = changed_sources(RAW_DATASET, sources, _RAW_LAYOUT)
+    if changed == []:
+        return
+    columns = raw_store.source_columns(sources)
+    months = _source_months(changed) if changed else None
+    if months is None or _dataset_columns(RAW_DATASET) != columns:
+        print(f"Building the raw dataset from {len(sources)} raw files...")
+        chunks = (apply_schema(chunk, RAW_SCHEMA) for chunk in raw_store.scan_raw_articles(columns=columns))
+        write_months(chunks, RAW_DATASET, sources)
+        return
+
+    print(f"Rebuilding {len(months)} months of the raw dataset for {len(changed)} changed raw files...")
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    # Articles listed in the months that are kept stay there. Each chunk looks its
+    # URLs up in the kept ones, which stay in Arrow memory.
+    kept_urls = pq.read_table(RAW_DATASET, columns=['URL'], filters=[('Month', 'not in', months)]).column('URL')
+    seen_urls = set()
+
+    def chunks():
+        for start_date, end_date in _month_ranges(months):
+            for chunk in raw_store.scan_raw_articles(start_date, end_date, columns=columns):
+                urls = pa.array(chunk['URL'], type=pa.string())
+                seen_urls.update(kept_urls.filter(pc.is_in(kept_urls, value_set=urls)).to_pylist())
+                chunk = chunk[~chunk['URL'].isin(seen_urls)]
+                seen_urls.update(chunk['URL'])
+                yield apply_schema(chunk, RAW_SCHEMA)
+
+    write_months(chunks(), RAW_DATASET, sources, months)
+
+
+def load_raw(start_date=None, end_date=None, categories=None, columns=None):
+    """Load raw articles from the raw dataset, rebuilding it when the raw files changed
+
+    The dataset holds every article of the raw store and raw files,
+    deduplicated by URL, see raw_store.scan_raw_articles.
+    """
+    refresh_raw()
+    return read_dataset(RAW_DATASET, columns, start_date, end_date, categories)
+
+
+def scan_raw(start_date=None, end_date=None, categories=None, columns=None, batch_size=RAW_READ_CHUNK_SIZE):
+    """Stream raw articles from the raw dataset in batches, see load_raw and scan_dataset"""
+    refresh_raw()
+    return scan_dataset(RAW_DATASET, columns, start_date, end_date, categories, batch_size)
+
+
+def raw_months(start_date=None, end_date=None):
+    """Months of the raw dataset within a date range, e.g. to split work on it by month, see dataset_months"""
+    refresh_raw()
+    return dataset_months(RAW_DATASET, start_date, end_date)
+
+
+def _dataset_path(path, default_path, default_dataset):
+    """Dataset of a source file: the configured dataset for the default file, a sibling directory otherwise"""
+    if os.path.abspath(path) == os.path.abspath(default_path):
+        return default_dataset
+    return os.path.splitext(path)[0] + '.parquet'
+
+
+def load_processed(path=READY_FOR_ANNOTATION_FILE):
+    """Load the data prepared for annotation, from its dataset when it is up to date"""
+    dataset_path = _dataset_path(path, READY_FOR_ANNOTATION_FILE, PROCESSED_DATASET)
+    if not is_fresh(dataset_path, [path]):
+        with instrumentation.stage('read_csv', input=path):
+            df = pd.read_csv(path)
+        write_dataset(apply_schema(df, PROCESSED_SCHEMA), dataset_path, [path])
+    return read_dataset(dataset_path)
+
+
+def load_annotated(path=ANNOTATED_DATA_FILE, columns=None):
+    """Load the annotated data with int8 labels and notes, from its dataset when it is up to date
+
+    The annotated CSV file is edited by hand, so it stays the source and the
+    dataset is rebuilt whenever the file changes.
+    """
+    dataset_path = _dataset_path(path, ANNOTATED_DATA_FILE, ANNOTATED_DATASET)
+    if not is_fresh(dataset_path, [path]):
+        with instrumentation.stage('read_csv', input=path):
+            df = pd.read_csv(path)
+        df = apply_schema(split_annotations(df), ANNOTATED_SCHEMA)
+        write_dataset(df, dataset_path, [path])
+    return read_dataset(dataset_path, columns)
+
+
+def load_assignments(path=ASSIGNMENT_LOG_FILE, batch_file=READY_FOR_ANNOTATION_FILE):
+    """Load the annotators each article was assigned to, from the assignment log
+
+    The log only grows, and an article gets the annotators of its latest
+    assignment, the ones whose labels the annotated file holds after it was
+    sampled again. Until a batch is logged, the current batch file stands in
+    for the log.
+
+    Returns:
+        pd.DataFrame: Annotator names in Annotation_1, Annotation_2, ... indexed by URL
+    """
+    source = path if os.path.exists(path) else batch_file
+    if not source or not os.path.exists(source):
+        return pd.DataFrame(columns=ANNOTATION_COLUMNS, index=pd.Index([], name='URL'), dtype=object)
+    log = pd.read_csv(source, dtype=str)
+    columns = [column for column in log.columns if column.startswith('Annotation_')]
+    return log.drop_duplicates(subset='URL', keep='last').set_index('URL')[columns]
+
+
+def _assignment_keys(assignments, columns):
+    """Join the annotators of each assignment into one string, to compare assignments"""
+    values = assignments.reindex(columns=columns).fillna('').astype(str)
+    return pd.Series(['\x1f'.join(row) for row in values.itertuples(index=False)], index=values.index, dtype=object)
+
+
+def append_assignments(df, path=ASSIGNMENT_LOG_FILE, batch_file=READY_FOR_ANNOTATION_FILE):
+    """Append the annotators assigned to a new batch to the assignment log, see load_assignments
+
+    Only assignments that differ from the latest logged one of their article
+    are appended, so sampling the same batch again leaves the log as it is.
+    The first time, the batch in batch_file, which the new batch is about to
+    replace, is logged before it, with no date since it is not known when it
+    was assigned.
+
+    Args:
+        df (pd.DataFrame): Batch with URL and the annotator columns Annotation_1, Annotation_2, ...
+        path (str): Assignment log CSV file
+        batch_file (str): Current batch file, see config.READY_FOR_ANNOTATION_FILE
+    """
+    annotators = [column for column in df.columns if column.startswith('Annotation_')]
+    entries = []
+    if not os.path.exists(path) and batch_file and os.path.exists(batch_file):
+        previous = pd.read_csv(batch_file, dtype=str)
+        entries.append(previous.reindex(columns=['URL'] + annotators).assign(Assigned=None))
+    entries.append(df[['URL'] + annotators].astype({column: object for column in annotators})
+                   .assign(Assigned=date.today().isoformat()))
+    log = pd.concat(entries, ignore_index=True)
+
+    # Compare each assignment with the one before it: in this batch, else the latest logged one
+    keys = _assignment_keys(log, annotators)
+    previous_keys = keys.groupby(log['URL']).shift()
+    first = log.groupby('URL').cumcount() == 0
+    logged_keys = _assignment_keys(load_assignments(path, batch_file=None), annotators)
+    previous_keys[first] = log.loc[first, 'URL'].map(logged_keys)
+    log = log[keys != previous_keys]
+    if log.empty:
+        return
+
+    if os.path.exists(path):
+        log = log.reindex(columns=pd.read_csv(path, nrows=0).columns)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    log.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+
+
+def build_datasets():
+    """Build or refresh the raw, processed and annotated datasets from their source files"""
+    if raw_store.store_partitions() or raw_store.raw_files():
+        print(f"Raw dataset: {len(load_raw(columns=['URL']))} articles in {RAW_DATASET}")
+    if os.path.exists(READY_FOR_ANNOTATION_FILE):
+        print(f"Processed dataset: {len(load_processed())} rows in {PROCESSED_DATASET}")
+    if os.path.exists(ANNOTATED_DATA_FILE):
+        print(f"Annotated dataset: {len(load_annotated())} rows in {ANNOTATED_DATASET}")
@@ -0,0 +1,193 @@
+import gzip
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+from config import HTML_CACHE_DIR, HTML_CACHE_TTL_DAYS, HTML_CACHE_MAX_BYTES
+
+
+class CachedResponse:
+    """Minimal stand-in for requests.Response built from a cached page"""
+
+    status_code = 200
+    from_cache = True
+
+    def __init__(self, url, text):
+        self.url = url
+        self.text = text
+
+    @property
+    def content(self):
+        return self.text.encode('utf-8')
+
+
+class HTMLCache:
+    """Content-addressed, gzip-compressed on-disk cache of fetched pages
+
+    Page bodies are stored once per content hash under objects/, and a SQLite
+    index maps (url, fetch date) to the body. Entries older than the TTL are
+    ignored and evicted, and the least recently used entries are evicted once
+    the cache grows beyond its size limit.
+    """
+
+    def __init__(self, cache_dir=HTML_CACHE_DIR, ttl_days=HTML_CACHE_TTL_DAYS, max_bytes=HTML_CACHE_MAX_BYTES):
+        """
+        Args:
+            cache_dir (str): Cache directory
+            ttl_days (float, optional): Maximum entry age in days, None keeps entries forever
+            max_bytes (int, optional): Maximum compressed size of all cached pages
+        """
+        self.cache_dir = cache_dir
+        self.ttl_days = ttl_days
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(cache_dir, 'objects'), exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(cache_dir, 'index.sqlite'), check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT NOT NULL,
+                fetch_date TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                digest TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                PRIMARY KEY (url, fetch_date)
+            )''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS pages_last_access ON pages (last_access)')
+        self._db.commit()
+
+    def _object_path(self, digest):
+        return os.path.join(self.cache_dir, 'objects', digest[:2], f'{digest}.html.gz')
+
+    def _min_fetched_at(self):
+        return time.time() - self.ttl_days * 86400 if self.ttl_days is not None else 0.0
+
+    def get(self, url, ignore_ttl=False, fetched_after=None):
+        """Get the newest cached body of a URL
+
+        Args:
+            url (str): Page URL
+            ignore_ttl (bool): Also return entries older than the TTL
+            fetched_after (float, optional): Unix time before which entries are ignored,
+                for pages that may have changed since
+
+        Returns:
+            CachedResponse: Cached page, or None on a cache miss
+        """
+        min_fetched_at = 0.0 if ignore_ttl else self._min_fetched_at()
+        if fetched_after is not None:
+            min_fetched_at = max(min_fetched_at, fetched_after)
+        with self._lock:
+            row = self._db.execute(
+                'SELECT fetch_date, digest FROM pages WHERE url = ? AND fetched_at >= ? '
+                'ORDER BY fetched_at DESC LIMIT 1', (url, min_fetched_at)).fetchone()
+            if row is None:
+                return None
+            self._db.execute('UPDATE pages SET last_access = ? WHERE url = ? AND fetch_date = ?',
+                             (time.time(), url, row[0]))
+            self._db.commit()
+        try:
+            with gzip.open(self._object_path(row[1]), 'rt', encoding='utf-8') as f:
+                return CachedResponse(url, f.read())
+        except (OSError, EOFError):
+            return None  # Blob removed or truncated, treat as a miss
+
+    def put(self, url, text):
+        """Store a fetched page body under today's fetch date"""
+        data = text.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{threading.get_ident()}.tmp'
+            with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        now = time.time()
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)',
+                             (url, date.today().isoformat(), now, now, digest, os.path.getsize(path)))
+            self._db.commit()
+
+    def urls(self):
+        """List every cached URL"""
+        with self._lock:
+            return [row[0] for row in self._db.execute('SELECT DISTINCT url FROM pages')]
+
+    def total_bytes(self):
+        """Compressed size of all cached page bodies"""
+        with self._lock:
+            return self._db.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT digest, size FROM pages)').fetchone()[0]
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until the cache fits its size limit
+
+        Returns:
+            int: Number of evicted entries
+        """
+        evicted = 0
+        with self._lock:
+            if self.ttl_days is not None:
+                evicted += self._db.execute('DELETE FROM pages WHERE fetched_at < ?',
+                                            (self._min_fetched_at(),)).rowcount
+            if self.max_bytes is not None:
+                rows = self._db.execute(
+                    'SELECT url, fetch_date, digest, size FROM pages ORDER BY last_access DESC').fetchall()
+                seen = set()
+                total = 0
+                for url, fetch_date, digest, size in rows:
+                    if digest not in seen:
+                        seen.add(digest)
+                        total += size
+                    if total > self.max_bytes:
+                        self._db.execute('DELETE FROM pages WHERE url = ? AND fetch_date = ?', (url, fetch_date))
+                        evicted += 1
+            self._db.commit()
+            live = {row[0] for row in self._db.execute('SELECT DISTINCT digest FROM pages')}
+
+        # Remove bodies no entry refers to any more
+        objects_dir = os.path.join(self.cache_dir, 'objects')
+        for prefix in os.listdir(objects_dir):
+            for name in os.listdir(os.path.join(objects_dir, prefix)):
+                if name.endswith('.html.gz') and name[:-len('.html.gz')] not in live:
+                    os.remove(os.path.join(objects_dir, prefix, name))
+        return evicted
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_cache = None
+_offline = False
+
+
+def configure_cache(enabled=True, offline=False, **kwargs):
+    """Set up the shared page cache used by the scraper
+
+    Args:
+        enabled (bool): Use the cache at all
+        offline (bool): Only serve pages from the cache, never touch the network
+        **kwargs: Passed on to HTMLCache
+    """
+    global _cache, _offline
+    if _cache is not None:
+        _cache.close()
+    _cache = HTMLCache(**kwargs) if enabled or offline else None
+    _offline = offline
+    return _cache
+
+
+def get_cache():
+    """Return the shared cache, or None when caching is disabled"""
+    return _cache
+
+
+def is_offline():
+    """Check whether pages may only come from the cache"""
+    return _offline
@@ -0,0 +1,159 @@
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from config import HTTP_POOL_SIZE, HTTP_COMPRESSION
+
+# Connect time of the request currently running on each thread
+_thread_state = threading.local()
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    """HTTP connection that records how long the TCP connect took"""
+
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _thread_state.connect_time = getattr(_thread_state, 'connect_time', 0.0) + time.perf_counter() - start
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    """HTTPS connection that records how long the TCP connect and TLS handshake took"""
+
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _thread_state.connect_time = getattr(_thread_state, 'connect_time', 0.0) + time.perf_counter() - start
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """Keep-alive connection pool whose connections report their handshake time"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool
+        }
+
+
+class TimingStats:
+    """Thread-safe totals of per-request connect, TTFB and body timings"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.new_connections = 0
+            self.connect_time = 0.0
+            self.ttfb_time = 0.0
+            self.body_time = 0.0
+            self.bytes_received = 0
+
+    def record(self, timing):
+        with self._lock:
+            self.requests += 1
+            self.new_connections += 1 if timing['connect'] > 0 else 0
+            self.connect_time += timing['connect']
+            self.ttfb_time += timing['ttfb']
+            self.body_time += timing['body']
+            self.bytes_received += timing['bytes']
+
+    def summary(self):
+        """Return totals and per-request averages as a dict"""
+        with self._lock:
+            count = max(self.requests, 1)
+            return {
+                'requests': self.requests,
+                'new_connections': self.new_connections,
+                'connect_total': self.connect_time,
+                'ttfb_total': self.ttfb_time,
+                'body_total': self.body_time,
+                'connect_avg': self.connect_time / count,
+                'ttfb_avg': self.ttfb_time / count,
+                'body_avg': self.body_time / count,
+                'bytes_received': self.bytes_received
+            }
+
+    def print_summary(self):
+        """Print the timing breakdown of all requests so far"""
+        stats = self.summary()
+        if not stats['requests']:
+            return
+        print(f"\nHTTP requests: {stats['requests']} "
+              f"(new connections: {stats['new_connections']}, received: {stats['bytes_received'] / 1e6:.1f} MB)")
+        print(f"Connect: {stats['connect_total']:.2f}s total, {stats['connect_avg'] * 1000:.1f} ms avg")
+        print(f"TTFB:    {stats['ttfb_total']:.2f}s total, {stats['ttfb_avg'] * 1000:.1f} ms avg")
+        print(f"Body:    {stats['body_total']:.2f}s total, {stats['body_avg'] * 1000:.1f} ms avg")
+
+
+timing_stats = TimingStats()
+
+_session = None
+_session_lock = threading.RLock()
+
+
+def configure_session(pool_size=HTTP_POOL_SIZE, compression=HTTP_COMPRESSION):
+    """Create the shared keep-alive session used for all scraper traffic
+
+    Args:
+        pool_size (int): Number of connections kept alive per host
+        compression (bool): Ask the server for gzip/deflate encoded responses
+    """
+    global _session
+    session = requests.Session()
+    adapter = TimedHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['Accept-Encoding'] = 'gzip, deflate' if compression else 'identity'
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = session
+    return session
+
+
+def get_session():
+    """Return the shared session, creating it with the configured defaults"""
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                return configure_session()
+    return _session
+
+
+def get(url, **kwargs):
+    """GET a URL through the shared session and record its timing
+
+    Returns:
+        tuple: (response, timing) where timing holds connect, ttfb and body seconds
+    """
+    _thread_state.connect_time = 0.0
+    start = time.perf_counter()
+    response = get_session().get(url, stream=True, **kwargs)
+    headers_received = time.perf_counter()
+    content = response.content  # Reads the body and returns the connection to the pool
+    finished = time.perf_counter()
+
+    connect = _thread_state.connect_time
+    timing = {
+        'connect': connect,
+        'ttfb': headers_received - start - connect,
+        'body': finished - headers_received,
+        'bytes': len(content)
+    }
+    timing_stats.record(timing)
+    return response, timing
@@ -0,0 +1,226 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import ContextDecorator, contextmanager
+from datetime import datetime, timezone
+from config import METRICS_DIR, METRICS_FILE
+
+try:
+    import resource
+except ImportError:  # Not available on Windows, peak RSS is then not recorded
+    resource = None
+
+# Stage name: {'calls', 'seconds', 'rows', 'bytes_read', 'bytes_written', 'peak_rss_bytes'}
+_stats = {}
+_lock = threading.Lock()
+# Stages open in the current thread, innermost last
+_local = threading.local()
+
+STAT_FIELDS = ['calls', 'seconds', 'rows', 'bytes_read', 'bytes_written', 'peak_rss_bytes']
+
+# Prometheus metric of each stat, with its help text
+PROMETHEUS_METRICS = {
+    'calls': ('wsj_stage_calls', 'Calls of the stage in the last run'),
+    'seconds': ('wsj_stage_duration_seconds', 'Wall time spent in the stage in the last run, nested stages included'),
+    'rows': ('wsj_stage_rows', 'Rows processed by the stage in the last run'),
+    'bytes_read': ('wsj_stage_read_bytes', 'Bytes read by the stage in the last run'),
+    'bytes_written': ('wsj_stage_written_bytes', 'Bytes written by the stage in the last run'),
+    'peak_rss_bytes': ('wsj_stage_peak_rss_bytes', 'Peak resident memory of the process when the stage ended'),
+}
+
+
+def _peak_rss():
+    """Peak resident memory of this process so far, in bytes"""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KB on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+class stage(ContextDecorator):
+    """Record the wall time, calls, rows, bytes and peak memory of a pipeline stage
+
+    Works as a decorator of the function that runs the stage, or as a
+    context manager around a block. Times are inclusive: a stage that calls
+    another one also counts its time. Rows and bytes are added with count()
+    from inside the stage, or from the input and output files given here.
+
+    Args:
+        name (str): Stage name, e.g. 'fetch_page'
+        input (str, optional): File the stage reads, its size counts as bytes read
+        output (str, optional): File the stage writes, its size when the stage ends counts as bytes written
+    """
+
+    def __init__(self, name, input=None, output=None):
+        self.name = name
+        self.input = input
+        self.output = output
+        self._counts = None
+        self._start = None
+
+    def _recreate_cm(self):
+        # Every call of a decorated function gets its own timer, also when threads call it at once
+        return stage(self.name, self.input, self.output)
+
+    def __enter__(self):
+        self._counts = {'rows': 0, 'bytes_read': 0, 'bytes_written': 0}
+        if self.input and os.path.exists(self.input):
+            self._counts['bytes_read'] += os.path.getsize(self.input)
+        _stack().append(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self._start
+        _stack().remove(self)
+        if self.output and os.path.exists(self.output):
+            self._counts['bytes_written'] += os.path.getsize(self.output)
+        peak = _peak_rss()
+        with _lock:
+            stats = _stats.setdefault(self.name, dict.fromkeys(STAT_FIELDS, 0))
+            stats['calls'] += 1
+            stats['seconds'] += seconds
+            for field, value in self._counts.items():
+                stats[field] += value
+            stats['peak_rss_bytes'] = max(stats['peak_rss_bytes'], peak)
+        return False
+
+    def count(self, rows=0, read=0, written=0):
+        """Add processed rows and bytes read or written to this call of the stage"""
+        self._counts['rows'] += rows
+        self._counts['bytes_read'] += read
+        self._counts['bytes_written'] += written
+
+
+def count(rows=0, read=0, written=0):
+    """Add processed rows and bytes read or written to the innermost stage of this thread, if any"""
+    stack = _stack()
+    if stack:
+        stack[-1].count(rows, read, written)
+
+
+def snapshot():
+    """Get a copy of the stats of every stage recorded so far"""
+    with _lock:
+        return {name: dict(stats) for name, stats in _stats.items()}
+
+
+def reset():
+    """Forget the stats recorded so far"""
+    with _lock:
+        _stats.clear()
+
+
+def prometheus_text(stats, labels):
+    """Render stage stats in the Prometheus text exposition format
+
+    Args:
+        stats (dict): Stats per stage, see snapshot
+        labels (dict): Labels added to every sample, e.g. {'mode': 'scrape'}
+
+    Returns:
+        str: One gauge per stat with a sample per stage
+    """
+    lines = []
+    for field, (metric, help_text) in PROMETHEUS_METRICS.items():
+        lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} gauge']
+        for name, values in sorted(stats.items()):
+            sample_labels = dict(labels, stage=name)
+            label_text = ','.join(f'{key}="{_escape(value)}"' for key, value in sample_labels.items())
+            lines.append(f'{metric}{{{label_text}}} {values[field]:.6g}')
+    return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def emit(mode, status='ok', metrics_dir=METRICS_DIR, metrics_file=METRICS_FILE):
+    """Write the stats of this run as JSON lines and as a Prometheus text file
+
+    Every stage becomes one JSON line in metrics_file, which keeps the
+    history of all runs. The Prometheus file, metrics_<mode>.prom, holds the
+    last run of the mode, for a node exporter textfile collector pointed at
+    metrics_dir.
+
+    Args:
+        mode (str): CLI mode of the run
+        status (str): 'ok', or 'error' when the run failed
+        metrics_dir (str): Directory of the Prometheus files
+        metrics_file (str): JSON lines file
+
+    Returns:
+        dict: The stats of every stage
+    """
+    stats = snapshot()
+    finished = datetime.now(timezone.utc)
+    os.makedirs(metrics_dir, exist_ok=True)
+    os.makedirs(os.path.dirname(os.path.abspath(metrics_file)), exist_ok=True)
+    with open(metrics_file, 'a', encoding='utf-8') as f:
+        for name, values in sorted(stats.items()):
+            record = {'time': finished.isoformat(timespec='seconds'), 'pid': os.getpid(), 'mode': mode,
+                      'status': status, 'stage': name, **values}
+            f.write(json.dumps(record) + '\n')
+
+    text = prometheus_text(stats, {'mode': mode})
+    text += '# HELP wsj_run_timestamp_seconds End of the last run of the mode\n' \
+            '# TYPE wsj_run_timestamp_seconds gauge\n' \
+            f'wsj_run_timestamp_seconds{{mode="{mode}",status="{status}"}} {finished.timestamp():.0f}\n'
+    path = os.path.join(metrics_dir, f'metrics_{mode}.prom')
+    # The collector may read the file at any time, so it is replaced whole
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+    return stats
+
+
+@contextmanager
+def profiled(profiler, name, metrics_dir=METRICS_DIR):
+    """Profile a block with cProfile or pyinstrument and save the profile
+
+    cProfile profiles are written as .prof files (for pstats or snakeviz) and
+    their top functions printed. pyinstrument is an optional dependency, its
+    profiles are written as HTML.
+
+    Args:
+        profiler (str): 'cprofile' or 'pyinstrument'
+        name (str): Name of the profile file, e.g. the CLI mode
+        metrics_dir (str): Directory the profile is written to
+    """
+    os.makedirs(metrics_dir, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    if profiler == 'pyinstrument':
+        from pyinstrument import Profiler
+        profile = Profiler()
+        profile.start()
+        try:
+            yield
+        finally:
+            profile.stop()
+            path = os.path.join(metrics_dir, f'profile_{name}_{stamp}.html')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(profile.output_html())
+            print(f"\nProfile saved to {path}")
+    else:
+        import cProfile
+        import pstats
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            path = os.path.join(metrics_dir, f'profile_{name}_{stamp}.prof')
+            profile.dump_stats(path)
+            print(f"\nProfile saved to {path}, top functions by cumulative time:")
+            pstats.Stats(profile).sort_stats('cumulative').print_stats(20)
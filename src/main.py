@@ -1,56 +1,106 @@
-import argparse
 import os
-from scraper import scrape_wsj_archive
-from data_preprocessing import preprocess_data
-from agreement_analysis import calculate_agreement
+from contextlib import nullcontext
+import instrumentation
+from args_parser import build_parser
 from config import (
     PROCESSED_DATA_DIR,
     ANNOTATED_DATA_FILE,
     ANALYSIS_DIR,
     ANALYSIS_REPORT_FILE,
     RAW_DATA_DIR,
-    ANNOTATED_DATA_DIR
+    ANNOTATED_DATA_DIR,
+    PREDICTED_LABELS_DATASET,
+    LABEL_WORKERS
 )
 
 def main():
-    """Main function to handle different modes of operation"""
-    parser = argparse.ArgumentParser(description='WSJ Article Scraping and Annotation Tool')
-    parser.add_argument('--mode', choices=['scrape', 'preprocess', 'analyze'], required=True,
-                      help='Operation mode: scrape, preprocess, or analyze')
-    
-    # Arguments for scrape mode
-    parser.add_argument('--start-date', help='Start date for scraping (YYYY-MM-DD)')
-    parser.add_argument('--end-date', help='End date for scraping (YYYY-MM-DD)')
-    
-    # Arguments for preprocess mode
-    parser.add_argument('--samples', type=int, default=200,
-                      help='Number of samples to select (default: 200)')
-    
-    # Arguments for analyze mode
-    parser.add_argument('--output', help='Output file path for analysis results')
-    
+    """Main function to handle different modes of operation
+
+    Each mode imports its own modules when it runs, so a mode does not pay
+    for the dependencies of the others (requests and BeautifulSoup for
+    scraping, pandas for everything else) and --help imports none of them.
+
+    The time, rows, bytes and memory of each stage of the run are written to
+    the metrics files when it ends, also when it fails (see instrumentation.py).
+    """
+    parser = build_parser()
     args = parser.parse_args()
     
     # Create all necessary directories
     for directory in [RAW_DATA_DIR, PROCESSED_DATA_DIR, ANNOTATED_DATA_DIR, ANALYSIS_DIR]:
         os.makedirs(directory, exist_ok=True)
     
-    # Handle different modes
+    status = 'error'
+    try:
+        with instrumentation.profiled(args.profile, args.mode) if args.profile else nullcontext(), \
+                instrumentation.stage('run'):
+            run_mode(parser, args)
+        status = 'ok'
+    finally:
+        instrumentation.emit(args.mode, status)
+
+def run_mode(parser, args):
+    """Run the mode selected on the command line"""
     if args.mode == 'scrape':
         if not args.start_date or not args.end_date:
             parser.error("Scrape mode requires --start-date and --end-date")
-        scrape_wsj_archive(args.start_date, args.end_date)
+        from scraper import scrape_wsj_archive
+        scrape_wsj_archive(args.start_date, args.end_date, args.workers or 1, args.rps,
+                           output_format=args.format)
+        
+    elif args.mode == 'incremental':
+        from scraper import scrape_incremental
+        scrape_incremental(args.end_date, args.workers or 1, args.rps)
+        
+    elif args.mode == 'reparse':
+        from scraper import reparse_archive
+        reparse_archive(args.start_date, args.end_date, args.format)
+        
+    elif args.mode == 'dataset':
+        from dataset import build_datasets
+        build_datasets()
         
     elif args.mode == 'preprocess':
-        preprocess_data(args.samples)
+        from data_preprocessing import preprocess_data
+        preprocess_data(args.samples, args.start_date, args.end_date, args.categories, args.sampling,
+                        args.exclude_annotated, dict(args.quotas) if args.quotas else None)
         
     elif args.mode == 'analyze':
+        from agreement_analysis import calculate_agreement
         output_file = args.output if args.output else ANALYSIS_REPORT_FILE
         if not os.path.dirname(output_file):
             output_file = os.path.join(ANALYSIS_DIR, output_file)
         results = calculate_agreement(ANNOTATED_DATA_FILE, output_file)
         print("\nAgreement Analysis Results:")
         print(results.to_string(index=False))
+        
+    elif args.mode == 'trend':
+        from aggregates import update_aggregates, load_trend
+        update_aggregates()
+        trend = load_trend(args.frequency, args.categories, args.start_date, args.end_date,
+                           by_category=not args.all_categories)
+        trend['Date'] = trend['Date'].dt.strftime('%Y-%m-%d')
+        columns = ['Date'] + ([] if args.all_categories else ['Category']) + \
+            ['articles', 'positive', 'neutral', 'negative', 'net_sentiment', 'agreement']
+        print(f"\nSentiment trend ({args.frequency}):")
+        print(trend[columns].to_string(index=False, float_format='{:.3f}'.format))
+        
+    elif args.mode == 'label':
+        from sentiment_model import label_archive
+        label_archive(args.output or PREDICTED_LABELS_DATASET, args.start_date, args.end_date, args.categories,
+                      args.retrain, args.workers or LABEL_WORKERS)
+        
+    elif args.mode == 'pipeline':
+        from pipeline import run_pipeline
+        results = run_pipeline(args, args.stages, args.force)
+        failed = [name for name, (status, _) in results.items() if status == 'failed']
+        if failed:
+            raise RuntimeError(f"Pipeline stages failed: {', '.join(failed)}")
+        
+    elif args.mode == 'serve':
+        # FastAPI and uvicorn are only needed to serve the search API
+        import uvicorn
+        uvicorn.run('api:app', host=args.host, port=args.port)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,390 @@
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import config
+import instrumentation
+from config import (
+    RAW_DATA_DIR,
+    RAW_STORE_DIR,
+    RAW_DATASET,
+    ANNOTATED_DATA_FILE,
+    ANNOTATED_DATASET,
+    READY_FOR_ANNOTATION_FILE,
+    ASSIGNMENT_LOG_FILE,
+    PROCESSED_DATASET,
+    ANALYSIS_REPORT_FILE,
+    AGGREGATES_DIR,
+    PREDICTED_LABELS_DATASET,
+    SENTIMENT_MODEL_FILE,
+    SEARCH_INDEX_FILE,
+    LABEL_WORKERS,
+    PIPELINE_STATE_FILE,
+    PIPELINE_WORKERS
+)
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_HASH_BLOCK_SIZE = 1024 ** 2
+
+
+def raw_sources():
+    """List the raw store partitions and raw files, as raw_store does, without importing pandas"""
+    return sorted(glob.glob(os.path.join(RAW_STORE_DIR, "*.csv"))) + \
+        sorted(glob.glob(os.path.join(RAW_DATA_DIR, "wsj_US_econ_articles_*.csv")) +
+               glob.glob(os.path.join(RAW_DATA_DIR, "wsj_US_econ_articles_*.parquet")))
+
+
+class Stage:
+    """A stage of the pipeline and everything its result depends on
+
+    Args:
+        name (str): Stage name, as given to --stages
+        run (callable): Runs the stage, called with the parsed command line arguments
+        code (list): Modules of src whose source makes up the code version of the stage
+        inputs (callable, optional): Gets the files and directories the stage reads from the arguments
+        settings (list): Names of the config values the stage depends on
+        params (callable, optional): Gets the command line arguments the stage depends on, as a dict
+        outputs (list): Files and directories the stage writes
+        requires (callable, optional): Gets the inputs that have to exist from the arguments, the stage
+            is skipped when one is missing or there are none
+        deps (list): Stages that always run first, they are added when the stage is selected
+        after (list): Stages that run first only when they are selected too
+        cached (bool): Whether an unchanged stage may be skipped, False for stages with inputs
+            that cannot be fingerprinted, such as the web archive
+        default (bool): Whether the stage runs when no stages are selected
+    """
+
+    def __init__(self, name, run, code, inputs=None, settings=(), params=None, outputs=(), requires=None, deps=(),
+                 after=(), cached=True, default=True):
+        self.name = name
+        self.run = run
+        self.code = list(code)
+        self.inputs = inputs or (lambda args: [])
+        self.settings = list(settings)
+        self.params = params or (lambda args: {})
+        self.outputs = list(outputs)
+        self.requires = requires
+        self.deps = list(deps)
+        self.after = list(after)
+        self.cached = cached
+        self.default = default
+
+
+class FileHashes:
+    """SHA-256 content hashes of files, computed again only when a file's size or modification time changed
+
+    Args:
+        known (dict): Absolute path: [size, mtime_ns, hash] from an earlier run, updated in place
+    """
+
+    def __init__(self, known):
+        self.known = known
+        self._lock = threading.Lock()
+
+    def digest(self, path):
+        """Hash of a file, or of the paths and hashes of every file in a directory; None when it does not exist"""
+        if os.path.isdir(path):
+            digest = hashlib.sha256()
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    file_path = os.path.join(root, name)
+                    digest.update(f"{os.path.relpath(file_path, path)}:{self.digest(file_path)}\n".encode())
+            return digest.hexdigest()
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        key = os.path.abspath(path)
+        with self._lock:
+            entry = self.known.get(key)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+        with self._lock:
+            self.known[key] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def snapshot(self):
+        """Get a copy of the known hashes, to store them for the next run"""
+        with self._lock:
+            return dict(self.known)
+
+
+def fingerprint(stage, args, hashes):
+    """Fingerprint the input contents, config values, arguments and code version of a stage
+
+    Returns:
+        str: Hex digest that changes whenever anything the stage depends on changed
+    """
+    digest = hashlib.sha256()
+    described = {
+        'inputs': {os.path.relpath(path, config.BASE_DIR): hashes.digest(path) for path in stage.inputs(args)},
+        'settings': {name: getattr(config, name) for name in stage.settings},
+        'params': stage.params(args),
+        'code': {module: hashes.digest(os.path.join(SRC_DIR, f"{module}.py")) for module in stage.code},
+    }
+    digest.update(json.dumps(described, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def output_signature(paths):
+    """Sizes and modification times of the outputs of a stage, to notice outputs deleted or changed since it ran"""
+    signature = hashlib.sha256()
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    stat = os.stat(os.path.join(root, name))
+                    signature.update(f"{os.path.relpath(os.path.join(root, name), path)}:"
+                                     f"{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+        elif os.path.exists(path):
+            stat = os.stat(path)
+            signature.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+        else:
+            signature.update(f"{path}:missing\n".encode())
+    return signature.hexdigest()
+
+
+def _annotated_inputs(args):
+    return [ANNOTATED_DATA_FILE]
+
+
+def _raw_and_annotated_inputs(args):
+    return raw_sources() + [ANNOTATED_DATA_FILE]
+
+
+def _run_scrape(args):
+    from scraper import scrape_incremental
+    scrape_incremental(args.end_date, args.workers or 1, args.rps)
+
+
+def _run_raw_dataset(args):
+    import dataset
+    dataset.refresh_raw()
+
+
+def _run_annotated_dataset(args):
+    import dataset
+    dataset.load_annotated(columns=['URL'])
+
+
+def _run_preprocess(args):
+    from data_preprocessing import preprocess_data
+    preprocess_data(args.samples, args.start_date, args.end_date, args.categories, args.sampling,
+                    args.exclude_annotated, dict(args.quotas) if args.quotas else None)
+
+
+def _run_analyze(args):
+    from agreement_analysis import calculate_agreement
+    calculate_agreement(ANNOTATED_DATA_FILE, ANALYSIS_REPORT_FILE)
+
+
+def _run_trend(args):
+    from aggregates import update_aggregates
+    update_aggregates()
+
+
+def _run_label(args):
+    from sentiment_model import label_archive
+    label_archive(PREDICTED_LABELS_DATASET, args.start_date, args.end_date, args.categories, args.retrain,
+                  args.workers or LABEL_WORKERS)
+
+
+def _run_search(args):
+    from search_store import SearchStore
+    store = SearchStore()
+    try:
+        added = store.refresh()
+    finally:
+        # The last connection to close writes the WAL into the database, before the outputs are signed
+        store.close()
+    print(f"Added {added} articles to the search index")
+
+
+_DATASET_CODE = ['dataset', 'raw_store', 'instrumentation']
+# Written next to the report, see agreement_stats.disagreements_path (not imported here, it needs pandas)
+_ANALYSIS_DISAGREEMENTS_FILE = f"{os.path.splitext(ANALYSIS_REPORT_FILE)[0]}_disagreements.jsonl"
+_SAMPLE_PARAMS = ('samples', 'start_date', 'end_date', 'categories', 'sampling', 'exclude_annotated', 'quotas')
+
+STAGES = {stage.name: stage for stage in [
+    # The web archive cannot be fingerprinted, so the scrape always runs when it is selected
+    Stage('scrape', _run_scrape, [], cached=False, default=False),
+    Stage('raw_dataset', _run_raw_dataset, _DATASET_CODE, inputs=lambda args: raw_sources(),
+          outputs=[RAW_DATASET], requires=lambda args: raw_sources(), after=['scrape']),
+    Stage('annotated_dataset', _run_annotated_dataset, _DATASET_CODE, inputs=_annotated_inputs,
+          outputs=[ANNOTATED_DATASET], requires=_annotated_inputs),
+    Stage('preprocess', _run_preprocess, ['data_preprocessing', 'sampling'] + _DATASET_CODE,
+          inputs=lambda args: raw_sources() + ([ANNOTATED_DATA_FILE] if args.exclude_annotated else []),
+          settings=['RANDOM_SEED', 'ANNOTATORS', 'ANNOTATOR_WEIGHTS', 'ANNOTATORS_PER_ITEM', 'SAMPLING_STRATA'],
+          params=lambda args: {name: getattr(args, name) for name in _SAMPLE_PARAMS},
+          outputs=[READY_FOR_ANNOTATION_FILE, ASSIGNMENT_LOG_FILE, PROCESSED_DATASET],
+          requires=lambda args: raw_sources(), deps=['raw_dataset'], default=False),
+    # Annotator IDs come from the assignment log (the batch file until one is logged),
+    # so a new assignment is analyzed when both run
+    Stage('analyze', _run_analyze, ['agreement_analysis', 'agreement_metrics', 'agreement_stats'] + _DATASET_CODE,
+          inputs=lambda args: [ANNOTATED_DATA_FILE, ASSIGNMENT_LOG_FILE, READY_FOR_ANNOTATION_FILE],
+          settings=['RANDOM_SEED', 'BOOTSTRAP_RESAMPLES', 'BOOTSTRAP_CONFIDENCE'],
+          outputs=[ANALYSIS_REPORT_FILE, _ANALYSIS_DISAGREEMENTS_FILE], requires=_annotated_inputs,
+          deps=['annotated_dataset'], after=['preprocess']),
+    Stage('trend', _run_trend, ['aggregates'] + _DATASET_CODE, inputs=_annotated_inputs,
+          settings=['TREND_FREQUENCIES'], outputs=[AGGREGATES_DIR], requires=_annotated_inputs,
+          deps=['annotated_dataset']),
+    Stage('label', _run_label, ['sentiment_model'] + _DATASET_CODE, inputs=_raw_and_annotated_inputs,
+          settings=['SENTIMENT_HASH_BUCKETS', 'SENTIMENT_NGRAMS', 'SENTIMENT_SMOOTHING', 'RANDOM_SEED'],
+          params=lambda args: {name: getattr(args, name) for name in ('start_date', 'end_date', 'categories')},
+          outputs=[PREDICTED_LABELS_DATASET, SENTIMENT_MODEL_FILE], requires=_raw_and_annotated_inputs,
+          deps=['raw_dataset', 'annotated_dataset']),
+    Stage('search', _run_search, ['search_store', 'search_index'] + _DATASET_CODE, inputs=_raw_and_annotated_inputs,
+          outputs=[SEARCH_INDEX_FILE], requires=lambda args: raw_sources(),
+          deps=['raw_dataset', 'annotated_dataset']),
+]}
+
+# Stages run when none are selected. Scraping needs the network, and sampling replaces the batch
+# the annotators are working on whenever new raw data arrived, so both only run when asked for
+DEFAULT_STAGES = [name for name, stage in STAGES.items() if stage.default]
+
+
+def select_stages(names=None):
+    """Add the stages the selected ones depend on, keeping the order of STAGES"""
+    selected = set()
+    pending = list(names or DEFAULT_STAGES)
+    while pending:
+        name = pending.pop()
+        if name not in selected:
+            selected.add(name)
+            pending += STAGES[name].deps
+    return [name for name in STAGES if name in selected]
+
+
+def _load_state(path):
+    if not os.path.exists(path):
+        return {'stages': {}, 'files': {}}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save_state(state, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _missing(stage, args):
+    """Describe why a stage cannot run, None when its required inputs exist"""
+    if stage.requires is None:
+        return None
+    required = stage.requires(args)
+    if not required:
+        return "no input files"
+    missing = [path for path in required if not os.path.exists(path)]
+    return f"missing {', '.join(os.path.relpath(path, config.BASE_DIR) for path in missing)}" if missing else None
+
+
+def _execute(stage, args, previous, hashes, force):
+    """Run a stage unless its fingerprint and outputs are those of its last run
+
+    Args:
+        previous (dict): Record of the last successful run of the stage, None if there is none
+
+    Returns:
+        tuple: (status, detail, record), status is 'cached', 'ran' or 'skipped', record is
+            the new record of the stage when it ran
+    """
+    reason = _missing(stage, args)
+    if reason:
+        return 'skipped', reason, None
+    current = fingerprint(stage, args, hashes)
+    if stage.cached and not force and previous and previous['fingerprint'] == current and \
+            previous['outputs'] == output_signature(stage.outputs):
+        return 'cached', 'unchanged', None
+    print(f"\n[{stage.name}] running")
+    with instrumentation.stage(f'pipeline_{stage.name}'):
+        stage.run(args)
+    record = {'fingerprint': current, 'outputs': output_signature(stage.outputs),
+              'finished': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    return 'ran', '', record
+
+
+def run_pipeline(args, stages=None, force=False, workers=PIPELINE_WORKERS, state_file=PIPELINE_STATE_FILE):
+    """Run the pipeline stages, skipping those whose inputs, settings and code did not change
+
+    Each stage is fingerprinted from the content hashes of its input files,
+    the config values and arguments it uses, and the source of its modules.
+    A stage whose fingerprint matches its last successful run, and whose
+    outputs were not touched since, is not run again. Files are only hashed
+    again when their size or modification time changed, so a run with no
+    new data only stats the inputs.
+
+    Stages run as soon as the stages they depend on finished, independent
+    ones in parallel threads. The stages after a failed one are skipped.
+
+    Args:
+        args (argparse.Namespace): Command line arguments, passed on to the stages
+        stages (list, optional): Names of the stages to run, with the stages they depend on
+            (default: DEFAULT_STAGES)
+        force (bool): Run every selected stage even if it is unchanged
+        workers (int): Maximum number of stages running at once
+        state_file (str): JSON file with the fingerprints and file hashes of earlier runs
+
+    Returns:
+        dict: Stage name: (status, seconds), status is 'ran', 'cached', 'skipped' or 'failed'
+    """
+    names = select_stages(stages)
+    state = _load_state(state_file)
+    hashes = FileHashes(state['files'])
+    results = {}
+    pending = list(names)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while pending or running:
+            for name in list(pending):
+                stage = STAGES[name]
+                waits_for = [dep for dep in stage.deps + stage.after if dep in names]
+                failed = [dep for dep in stage.deps if results.get(dep, ('',))[0] in ('failed', 'skipped')]
+                if failed:
+                    results[name] = ('skipped', 0.0)
+                    print(f"[{name}] skipped, {', '.join(failed)} did not run")
+                    pending.remove(name)
+                elif all(dep in results for dep in waits_for):
+                    future = executor.submit(_execute, stage, args, state['stages'].get(name), hashes, force)
+                    running[future] = (name, time.perf_counter())
+                    pending.remove(name)
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, start = running.pop(future)
+                seconds = time.perf_counter() - start
+                try:
+                    status, detail, record = future.result()
+                except Exception:
+                    status, detail, record = 'failed', '', None
+                    print(f"[{name}] failed:")
+                    traceback.print_exc()
+                results[name] = (status, seconds)
+                if status == 'ran':
+                    print(f"[{name}] done in {seconds:.1f}s")
+                    state['stages'][name] = record
+                else:
+                    print(f"[{name}] {status}" + (f", {detail}" if detail else ''))
+                # Saved after every stage, so the stages that finished are not run again after a crash
+                _save_state({'stages': state['stages'], 'files': hashes.snapshot()}, state_file)
+
+    print(f"\n{'stage':<18} {'status':<8} {'seconds':>8}")
+    for name in names:
+        status, seconds = results[name]
+        print(f"{name:<18} {status:<8} {seconds:>8.2f}")
+    return results
@@ -0,0 +1,170 @@
+import threading
+import time
+from config import CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS
+
+
+class AdaptiveRateLimiter:
+    """Token-bucket request budget shared by all crawler workers
+
+    Every request takes one token, and tokens refill at the current rate. A
+    throttled response (429/503) halves the rate and pauses all workers for
+    the server's Retry-After, while a run of healthy responses raises the rate
+    again step by step, up to max_rate. By default max_rate is the starting
+    rate, so the limiter only slows down below the configured budget and
+    recovers up to it. Counters record requests, retries, throttled responses,
+    the time workers waited because of throttling (pauses and the slower pace
+    after backing off) and the time they waited for the normal pace.
+    """
+
+    def __init__(self, requests_per_second, min_rate=None, max_rate=None, burst=1, increase_after=20):
+        """
+        Args:
+            requests_per_second (float): Starting request rate, None or <= 0 disables the budget
+            min_rate (float, optional): Lowest rate to back off to, defaults to 1/16 of the start rate
+            max_rate (float, optional): Highest rate to speed up to, defaults to the start rate
+            burst (int): Maximum number of tokens that can be saved up
+            increase_after (int): Healthy responses in a row before the rate is raised
+        """
+        limited = requests_per_second is not None and requests_per_second > 0
+        self.rate = requests_per_second if limited else None
+        self.min_rate = (min_rate or requests_per_second / 16) if limited else None
+        self.max_rate = (max_rate or requests_per_second) if limited else None
+        self.burst = burst
+        self.increase_after = increase_after
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._healthy = 0
+        self._lock = threading.Lock()
+
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.throttled_time = 0.0
+        self.paced_time = 0.0
+
+    def acquire(self):
+        """Block until the caller is allowed to send its next request"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if self.rate is not None:
+                    self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                    self.throttled_time += delay
+                elif self.rate is None or self._tokens >= 1:
+                    if self.rate is not None:
+                        self._tokens -= 1
+                    self.requests += 1
+                    return
+                else:
+                    delay = (1 - self._tokens) / self.rate
+                    # The wait at max_rate is the normal pace, the rest is the slowdown after throttling
+                    paced = min(delay, (1 - self._tokens) / self.max_rate)
+                    self.paced_time += paced
+                    self.throttled_time += delay - paced
+            time.sleep(delay)
+
+    def on_success(self):
+        """Report a healthy response, speeding up after enough of them in a row"""
+        with self._lock:
+            self._healthy += 1
+            if self.rate is not None and self._healthy >= self.increase_after:
+                self.rate = min(self.max_rate, self.rate * 1.25)
+                self._healthy = 0
+
+    def on_throttle(self, retry_after=None):
+        """Report a 429/503 response, slowing down and pausing every worker
+
+        Args:
+            retry_after (float, optional): Seconds the server asked us to wait
+        """
+        with self._lock:
+            self.throttled += 1
+            self._healthy = 0
+            if self.rate is not None:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self._tokens = 0.0
+            pause = retry_after if retry_after is not None else (1 / self.rate if self.rate else 1.0)
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+
+    def on_retry(self):
+        """Count a retried request"""
+        with self._lock:
+            self.retries += 1
+
+    def stats(self):
+        """Return the limiter counters as a dict"""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'retries': self.retries,
+                'throttled': self.throttled,
+                'throttled_time': self.throttled_time,
+                'paced_time': self.paced_time,
+                'rate': self.rate
+            }
+
+    def print_summary(self):
+        stats = self.stats()
+        rate = f"{stats['rate']:.2f} req/s" if stats['rate'] else "unlimited"
+        print(f"\nRate limiter: {stats['requests']} requests, {stats['retries']} retries, "
+              f"{stats['throttled']} throttled responses, {stats['throttled_time']:.1f}s waiting on throttling and "
+              f"{stats['paced_time']:.1f}s on the normal pace across workers, final rate {rate}")
+
+
+class CircuitOpenError(Exception):
+    """Raised when requests are refused because the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Stops all requests for a cool-down period once errors persist
+
+    After failure_threshold consecutive failures the circuit opens and every
+    request fails fast. Once reset_timeout seconds have passed a single probe
+    request is let through: success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        """Check that a request may be sent
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+        """
+        with self._lock:
+            if self.state == 'closed':
+                return
+            if self.state == 'open' and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = 'half-open'
+            if self.state == 'half-open' and not self._probing:
+                self._probing = True
+                return
+            raise CircuitOpenError(f"Circuit open after {self.failures} consecutive failures")
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half-open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.opened += 1
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+                self._probing = False
@@ -0,0 +1,238 @@
+import glob
+import os
+import re
+import pandas as pd
+import instrumentation
+from config import RAW_DATA_DIR, RAW_STORE_DIR, RAW_COLUMNS, RAW_READ_CHUNK_SIZE
+
+# Column types used when scanning raw files, so every file yields the same schema. Other source
+# columns are read as text, except the numeric id column of the original archive export.
+RAW_DTYPES = {'id': 'Int64', 'Date': str, 'Page': 'Int32', 'Title': str, 'Category': str, 'URL': str}
+
+# Raw files are named wsj_US_econ_articles_<start>_<end>, with dates as YYYYMMDD or YYYY-MM-DD
+_RAW_FILE_RANGE = re.compile(r'_(\d{4}-?\d{2}-?\d{2})_(\d{4}-?\d{2}-?\d{2})\.(?:csv|parquet)$')
+_STORE_PARTITION = re.compile(r'^(\d{4}-\d{2})\.csv$')
+
+
+def raw_files():
+    """List the scraped raw article files (CSV files and Parquet directories) outside the store"""
+    return sorted(glob.glob(os.path.join(RAW_DATA_DIR, "wsj_US_econ_articles_*.csv")) +
+                  glob.glob(os.path.join(RAW_DATA_DIR, "wsj_US_econ_articles_*.parquet")))
+
+
+def store_partitions():
+    """List the monthly partitions of the raw article store, oldest first"""
+    return sorted(glob.glob(os.path.join(RAW_STORE_DIR, "*.csv")))
+
+
+@instrumentation.stage('read_raw_file')
+def read_raw_file(path, columns=None):
+    """Read a raw article CSV file or Parquet directory"""
+    if path.endswith('.parquet'):
+        df = pd.read_parquet(path, columns=columns)
+    else:
+        df = pd.read_csv(path, usecols=columns)
+        instrumentation.count(read=os.path.getsize(path))
+    instrumentation.count(rows=len(df))
+    return df
+
+
+def file_date_range(path):
+    """Get the range of article dates a raw file or store partition covers, from its name
+
+    Returns:
+        tuple: (first, last) pd.Timestamp, or (None, None) if the name does not tell
+    """
+    name = os.path.basename(path.rstrip(os.sep))
+    match = _RAW_FILE_RANGE.search(name)
+    if match:
+        return pd.Timestamp(match.group(1)), pd.Timestamp(match.group(2))
+    match = _STORE_PARTITION.match(name)
+    if match:
+        first = pd.Timestamp(f"{match.group(1)}-01")
+        return first, first + pd.offsets.MonthEnd(0)
+    return None, None
+
+
+def file_columns(path):
+    """Columns of a raw file, read from its header or Parquet schema"""
+    if path.endswith('.parquet'):
+        import pyarrow.dataset as ds
+        return [name for name in ds.dataset(path, format='parquet').schema.names
+                if not name.startswith('__index_level_')]
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def source_columns(paths):
+    """Columns of raw files in the order they first appear, with the raw columns always included
+
+    Raw files come before store partitions, so the layout of the archive
+    export (id, Date, ...) is kept.
+    """
+    layouts = sorted(paths, key=lambda path: path.startswith(RAW_STORE_DIR))
+    return list(dict.fromkeys([name for path in layouts for name in file_columns(path)] + RAW_COLUMNS))
+
+
+def _with_columns(df, columns, dtypes):
+    """Select columns in order, adding the ones a file does not have as empty"""
+    missing = [name for name in columns if name not in df.columns]
+    df = df.reindex(columns=columns)
+    return df.astype({name: dtypes[name] if dtypes[name] is not str else object for name in missing})
+
+
+def _read_chunks(path, columns, categories, chunksize):
+    """Read the given columns of a raw file in chunks with the raw column types"""
+    dtypes = {name: RAW_DTYPES.get(name, str) for name in columns}
+    if path.endswith('.parquet'):
+        # Parquet row groups are skipped on the category statistics before they are decoded
+        filters = [('Category', 'in', list(categories))] if categories is not None else None
+        present = [name for name in columns if name in file_columns(path)]
+        df = pd.read_parquet(path, columns=present, filters=filters)
+        yield _with_columns(df.astype({name: dtypes[name] for name in present}), columns, dtypes)
+        return
+    # Columns missing from older files are read as empty
+    reader = pd.read_csv(path, usecols=lambda name: name in columns, dtype=dtypes, chunksize=chunksize)
+    # Each chunk read is timed on its own, the time the caller spends between chunks is not the reader's
+    unread = os.path.getsize(path)
+    while True:
+        with instrumentation.stage('read_raw_chunk') as stage:
+            chunk = next(reader, None)
+            stage.count(rows=0 if chunk is None else len(chunk), read=unread)
+        if chunk is None:
+            return
+        unread = 0
+        yield _with_columns(chunk, columns, dtypes)
+
+
+def scan_raw_articles(start_date=None, end_date=None, categories=None, columns=None,
+                      chunksize=RAW_READ_CHUNK_SIZE):
+    """Lazily read articles from the raw store and every raw file, deduplicated by URL
+
+    Files whose name shows they lie outside the date range are never opened,
+    only the needed columns are parsed, and the remaining files are read in
+    chunks, so memory is bounded by the chunk size and the matching articles.
+    The store is read first, then the raw files oldest first, and the first
+    listing of each URL is kept.
+
+    Args:
+        start_date (str, optional): First article date to include (YYYY-MM-DD)
+        end_date (str, optional): Last article date to include (YYYY-MM-DD)
+        categories (list, optional): Categories to include, all when None
+        columns (list, optional): Columns to return. When None, every column of
+            the files read is returned, in the order they first appear, with
+            the raw columns always included and empty where a file lacks them
+        chunksize (int): Rows per chunk when reading CSV files
+
+    Yields:
+        pd.DataFrame: Chunks of matching articles not seen in an earlier chunk
+    """
+    start = pd.Timestamp(start_date) if start_date else None
+    end = pd.Timestamp(end_date) if end_date else None
+    paths = []
+    for path in store_partitions() + raw_files():
+        first, last = file_date_range(path)
+        if (start is not None and last is not None and last < start) or \
+                (end is not None and first is not None and first > end):
+            continue
+        paths.append(path)
+    if columns is None:
+        columns = source_columns(paths)
+
+    needed = ['URL'] + (['Date'] if start is not None or end is not None else []) + \
+        (['Category'] if categories is not None else [])
+    read_columns = list(dict.fromkeys(list(columns) + needed))
+
+    seen_urls = set()
+    for path in paths:
+        for chunk in _read_chunks(path, read_columns, categories, chunksize):
+            if categories is not None:
+                chunk = chunk[chunk['Category'].isin(categories)]
+            if start is not None or end is not None:
+                dates = pd.to_datetime(chunk['Date'], format='mixed', errors='coerce')
+                chunk = chunk[(dates >= start if start is not None else True) &
+                              (dates <= end if end is not None else True)]
+            chunk = chunk[~chunk['URL'].isin(seen_urls)].drop_duplicates(subset='URL', keep='first')
+            seen_urls.update(chunk['URL'])
+            if not chunk.empty:
+                yield chunk[list(columns)]
+
+
+def load_raw_articles(start_date=None, end_date=None, categories=None, columns=None):
+    """Load the matching articles of every raw file into one DataFrame, see scan_raw_articles"""
+    chunks = list(scan_raw_articles(start_date, end_date, categories, columns))
+    if not chunks:
+        return pd.DataFrame({name: pd.Series(dtype=RAW_DTYPES.get(name, object)) for name in columns or RAW_COLUMNS})
+    return pd.concat(chunks, ignore_index=True)
+
+
+def newest_raw_date():
+    """Find the newest article date stored across the store and all raw files
+
+    Returns:
+        pd.Timestamp: Newest article date, or None if there is no raw data yet
+    """
+    newest = None
+    partitions = store_partitions()
+    # Partitions are monthly, so only the newest one has to be read
+    for path in raw_files() + partitions[-1:]:
+        dates = pd.to_datetime(read_raw_file(path, ['Date'])['Date'], format='mixed', errors='coerce')
+        if dates.notna().any() and (newest is None or dates.max() > newest):
+            newest = dates.max()
+    return newest
+
+
+@instrumentation.stage('write_csv')
+def _write_partition(df, path):
+    tmp_path = f"{path}.tmp"
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    instrumentation.count(rows=len(df), written=os.path.getsize(path))
+
+
+def merge_into_store(df):
+    """Merge articles into the monthly partitioned raw store, deduplicated by URL
+
+    Articles whose URL is already stored are skipped, so the earliest listing
+    of an article is kept. Only the partitions that receive new rows are rewritten.
+    Columns besides the raw ones, such as the id of the archive export, are kept.
+
+    Args:
+        df (pd.DataFrame): Articles with the raw columns
+
+    Returns:
+        int: Number of new articles added to the store
+    """
+    os.makedirs(RAW_STORE_DIR, exist_ok=True)
+    stored_urls = set()
+    for path in store_partitions():
+        stored_urls.update(pd.read_csv(path, usecols=['URL'])['URL'])
+
+    df = df.reindex(columns=list(dict.fromkeys(list(df.columns) + RAW_COLUMNS)))
+    df = df[~df['URL'].isin(stored_urls)].drop_duplicates(subset='URL', keep='first')
+    if df.empty:
+        return 0
+
+    months = pd.to_datetime(df['Date'], format='mixed').dt.strftime('%Y-%m')
+    for month, rows in df.groupby(months, sort=True):
+        path = os.path.join(RAW_STORE_DIR, f"{month}.csv")
+        if os.path.exists(path):
+            rows = pd.concat([pd.read_csv(path), rows], ignore_index=True)
+        rows = rows.assign(_date=pd.to_datetime(rows['Date'], format='mixed'))
+        rows = rows.sort_values('_date', kind='stable').drop(columns='_date')
+        _write_partition(rows, path)
+    return len(df)
+
+
+def seed_store():
+    """Load every existing raw file into an empty store
+
+    Returns:
+        int: Number of articles added to the store
+    """
+    if store_partitions():
+        return 0
+    added = 0
+    for path in raw_files():
+        print(f"Adding {path} to the raw store")
+        added += merge_into_store(read_raw_file(path))
+    return added
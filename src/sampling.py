@@ -0,0 +1,190 @@
+import os
+import numpy as np
+import pandas as pd
+from config import ANNOTATED_DATA_FILE, RANDOM_SEED, SAMPLING_STRATA
+
+
+def annotated_urls(path=ANNOTATED_DATA_FILE):
+    """Get the URLs of articles that were already annotated
+
+    Returns:
+        set: Annotated URLs, empty when there is no annotated data yet
+    """
+    if not os.path.exists(path):
+        return set()
+    return set(pd.read_csv(path, usecols=['URL'])['URL'].dropna())
+
+
+def exclude_urls(chunks, urls):
+    """Drop the rows whose URL is in urls from a stream of chunks"""
+    for chunk in chunks:
+        yield chunk[~chunk['URL'].isin(urls)]
+
+
+def reservoir_sample(chunks, n, random_state=RANDOM_SEED):
+    """Draw a uniform random sample of n rows from a stream of chunks in a single pass
+
+    Every row gets a random key and the reservoir keeps the n rows with the
+    smallest keys seen so far, so memory stays at n rows plus one chunk however
+    long the stream is. Once the reservoir is full, only rows whose key beats
+    the current largest kept key are looked at.
+
+    Args:
+        chunks (iterable): DataFrame chunks, in a fixed order
+        n (int): Sample size
+        random_state (int): Seed, the same seed and stream always give the same sample
+
+    Returns:
+        pd.DataFrame: The sampled rows in random order, all rows when the stream is shorter than n
+    """
+    rng = np.random.default_rng(random_state)
+    reservoir = None
+    keys = np.empty(0)
+    for chunk in chunks:
+        chunk_keys = rng.random(len(chunk))
+        if len(keys) >= n:
+            candidates = chunk_keys < keys.max()
+            chunk, chunk_keys = chunk[candidates], chunk_keys[candidates]
+        if len(chunk) == 0:
+            continue
+        reservoir = chunk if reservoir is None else pd.concat([reservoir, chunk], ignore_index=True)
+        keys = np.concatenate([keys, chunk_keys])
+        if len(keys) > n:
+            keep = np.sort(np.argpartition(keys, n - 1)[:n])
+            reservoir, keys = reservoir.iloc[keep].reset_index(drop=True), keys[keep]
+
+    if reservoir is None:
+        return pd.DataFrame()
+    return reservoir.iloc[np.argsort(keys, kind='stable')].reset_index(drop=True)
+
+
+def stratum_labels(df, strata=SAMPLING_STRATA):
+    """Label each row with its stratum, e.g. '2024-03 | U.S. Markets' for strata Month and Category
+
+    'Month' is derived from the Date column, every other stratum is a column.
+    Labels are formatted once per distinct stratum, not once per row.
+    """
+    codes = np.zeros(len(df), dtype=np.int64)
+    levels = []
+    for name in strata:
+        if name == 'Month':
+            dates = pd.to_datetime(df['Date'], format='mixed')
+            values = dates.dt.year * 100 + dates.dt.month
+        else:
+            values = df[name].astype(object)
+        level_codes, uniques = pd.factorize(values)
+        # Missing values get code 0, so the combined code stays non-negative
+        codes = codes * (len(uniques) + 1) + level_codes + 1
+        levels.append((name, uniques))
+    combined, inverse = np.unique(codes, return_inverse=True)
+
+    labels = []
+    for code in combined:
+        parts = []
+        for name, uniques in reversed(levels):
+            code, index = divmod(code, len(uniques) + 1)
+            if index == 0:
+                parts.append('unknown')
+            elif name == 'Month':
+                parts.append(f"{int(uniques[index - 1]) // 100:04d}-{int(uniques[index - 1]) % 100:02d}")
+            else:
+                parts.append(str(uniques[index - 1]))
+        labels.append(' | '.join(reversed(parts)))
+    return np.array(labels, dtype=object)[inverse]
+
+
+def allocate_quotas(sizes, n):
+    """Split a sample size over strata in proportion to their sizes
+
+    Uses largest remainders, so the quotas add up to n (or to the total size
+    when that is smaller) and no stratum gets more rows than it has.
+
+    Args:
+        sizes (pd.Series): Number of rows per stratum
+        n (int): Sample size
+
+    Returns:
+        pd.Series: Quota per stratum
+    """
+    sizes = sizes[sizes > 0].sort_index()
+    n = min(n, int(sizes.sum()))
+    shares = sizes / sizes.sum() * n
+    quotas = np.floor(shares).astype(int)
+    remainders = (shares - quotas).sort_values(ascending=False, kind='stable')
+    quotas[remainders.index[:n - quotas.sum()]] += 1
+    return quotas
+
+
+def stratum_columns(strata=SAMPLING_STRATA):
+    """Columns stratum_labels reads for the given strata"""
+    return ['Date' if name == 'Month' else name for name in strata]
+
+
+def stratum_sizes(chunks, strata=SAMPLING_STRATA):
+    """Count the rows of each stratum in a stream of chunks
+
+    Returns:
+        pd.Series: Number of rows per stratum label
+    """
+    sizes = pd.Series(dtype=int)
+    for chunk in chunks:
+        if len(chunk):
+            counts = pd.Series(stratum_labels(chunk, strata)).value_counts()
+            sizes = sizes.add(counts, fill_value=0).astype(int)
+    return sizes
+
+
+def stratified_sample(scan, n, strata=SAMPLING_STRATA, quotas=None, random_state=RANDOM_SEED):
+    """Draw a stratified random sample from a stream of chunks
+
+    Without explicit quotas a first pass only counts the rows of each stratum,
+    reading just the stratum columns, and the sample size is split over the
+    strata in proportion to their sizes, see allocate_quotas. The sampling pass
+    then keeps one reservoir per stratum of the rows with the smallest random
+    keys, capped at that stratum's quota, so memory stays at the sample size
+    plus one chunk however many strata there are.
+
+    Args:
+        scan (callable): Takes a list of columns (None for all) and returns a fresh
+            stream of DataFrame chunks with at least those columns, in a fixed order
+        n (int): Sample size, used when quotas is None
+        strata (list): Stratum columns, 'Month' is derived from Date
+        quotas (dict, optional): Rows to draw per stratum, keyed by stratum tuple
+            such as ('2024-03', 'U.S. Markets'), or by label such as '2024-03 | U.S. Markets'
+        random_state (int): Seed, the same seed and stream always give the same sample
+
+    Returns:
+        pd.DataFrame: The sampled rows, in random order
+    """
+    if quotas is None:
+        quotas = allocate_quotas(stratum_sizes(scan(stratum_columns(strata)), strata), n)
+    else:
+        quotas = pd.Series({' | '.join(key) if isinstance(key, tuple) else str(key): count
+                            for key, count in quotas.items()}, dtype=int)
+    quotas = quotas[quotas > 0]
+
+    rng = np.random.default_rng(random_state)
+    reservoir = None
+    for chunk in scan(None):
+        if len(chunk) == 0:
+            continue
+        chunk = chunk.assign(_stratum=stratum_labels(chunk, strata), _key=rng.random(len(chunk)))
+        chunk = chunk[chunk['_stratum'].isin(quotas.index)]
+        if reservoir is not None:
+            # Rows can only get in if their stratum has room or their key beats its largest kept key
+            kept = reservoir.groupby('_stratum', sort=False)['_key'].agg(['size', 'max'])
+            thresholds = kept['max'].where(kept['size'] >= kept.index.map(quotas))
+            chunk = chunk[~(chunk['_key'] >= chunk['_stratum'].map(thresholds))]
+        if len(chunk) == 0:
+            continue
+        reservoir = chunk if reservoir is None else pd.concat([reservoir, chunk], ignore_index=True)
+
+        # Keep the rows with the smallest keys of each stratum
+        reservoir = reservoir.sort_values(['_stratum', '_key'], kind='stable')
+        caps = reservoir['_stratum'].map(quotas)
+        reservoir = reservoir[reservoir.groupby('_stratum', sort=False).cumcount() < caps].reset_index(drop=True)
+
+    if reservoir is None:
+        return pd.DataFrame()
+    sample = reservoir.sort_values('_key', kind='stable').drop(columns=['_stratum', '_key'])
+    return sample.reset_index(drop=True)
@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+from config import SCRAPE_JOURNAL_FILE
+
+
+class ScrapeJournal:
+    """Append-only JSONL journal of scraped archive pages
+
+    Every fetched (date, page) is written as soon as it is parsed, so an
+    interrupted scrape can resume where it stopped. Entries are one of:
+        {"date": ..., "page": ..., "status": "ok", "max_pages": ..., "total_titles": ..., "articles": [...]}
+        {"date": ..., "page": ..., "status": "failed", "url": ...}
+        {"date": ..., "status": "done"}
+    A day is done once a page without headlines was reached, and the scraper
+    only records that for days the archive no longer adds to. Later entries
+    for the same (date, page) replace earlier ones. Only page metadata and
+    file offsets are kept in memory, articles are read back from disk when
+    they are needed, so memory does not grow with the journal.
+    """
+
+    def __init__(self, path=SCRAPE_JOURNAL_FILE):
+        self.path = path
+        self.days = {}
+        self._lock = threading.Lock()
+        self._load()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, 'ab')
+        # A crash can leave a partial last line, start a fresh one so new entries stay valid
+        if self._file.tell() > 0 and not self._ends_with_newline():
+            self._file.write(b'\n')
+            self._file.flush()
+        self._reader = open(path, 'rb')
+
+    def _ends_with_newline(self):
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            offset = 0
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    entry = None  # Partial line from an interrupted write
+                if entry is not None:
+                    self._apply(entry, offset)
+                offset += len(line)
+
+    def _day(self, date_str):
+        return self.days.setdefault(date_str, {'pages': {}, 'failed': {}, 'done': False})
+
+    def _apply(self, entry, offset):
+        day = self._day(entry['date'])
+        if entry['status'] == 'ok':
+            day['pages'][entry['page']] = {
+                'ok': True,
+                'max_pages': entry.get('max_pages', 1),
+                'total_titles': entry['total_titles'],
+                'offset': offset
+            }
+            day['failed'].pop(entry['page'], None)
+        elif entry['status'] == 'failed':
+            day['failed'][entry['page']] = entry['url']
+        elif entry['status'] == 'done':
+            day['done'] = True
+
+    def _write(self, entry):
+        with self._lock:
+            self._apply(entry, self._file.tell())
+            self._file.write((json.dumps(entry, ensure_ascii=False) + '\n').encode('utf-8'))
+            self._file.flush()
+
+    def _read_articles(self, offset):
+        with self._lock:
+            self._reader.seek(offset)
+            return json.loads(self._reader.readline())['articles']
+
+    def record_page(self, date_str, page, total_titles, articles, max_pages=1):
+        """Record a successfully parsed page and its articles"""
+        self._write({'date': date_str, 'page': page, 'status': 'ok', 'max_pages': max_pages,
+                     'total_titles': total_titles, 'articles': articles})
+
+    def record_failure(self, date_str, page, url):
+        """Record a page that could not be fetched"""
+        self._write({'date': date_str, 'page': page, 'status': 'failed', 'url': url})
+
+    def record_done(self, date_str):
+        """Record that every page of a day has been scraped"""
+        self._write({'date': date_str, 'status': 'done'})
+
+    def is_done(self, date_str):
+        """Check whether a day was completely scraped"""
+        return date_str in self.days and self.days[date_str]['done']
+
+    def completed_pages(self, date_str):
+        """Get the journaled results of a day's successfully fetched pages, including their articles"""
+        if date_str not in self.days:
+            return {}
+        return {page: {'ok': True, 'max_pages': result['max_pages'], 'total_titles': result['total_titles'],
+                       'articles': self._read_articles(result['offset'])}
+                for page, result in self.days[date_str]['pages'].items()}
+
+    def next_page(self, date_str):
+        """Get the first page of a day that still has to be fetched"""
+        pages = self.days[date_str]['pages'] if date_str in self.days else {}
+        page = 1
+        while page in pages and pages[page]['total_titles']:
+            page += 1
+        return page
+
+    def day_articles(self, date_str):
+        """Get a day's articles in page order, up to the first missing page"""
+        pages = self.days[date_str]['pages'] if date_str in self.days else {}
+        articles = []
+        page = 1
+        while page in pages:
+            articles.extend(self._read_articles(pages[page]['offset']))
+            page += 1
+        return articles
+
+    def failed_urls(self, dates):
+        """Get the URLs that are still failing for the given dates"""
+        return [url for date_str in dates if date_str in self.days
+                for _, url in sorted(self.days[date_str]['failed'].items())]
+
+    def close(self):
+        self._file.close()
+        self._reader.close()
+
+    def discard(self):
+        """Close the journal and delete its file, once the scrape it records was written out"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -1,10 +1,34 @@
 import pandas as pd
 import requests
+import http_client
+import raw_store
+import html_cache
+import instrumentation
+import re
 from bs4 import BeautifulSoup
 import time
+import random
 from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
 import os
-from config import RAW_DATA_DIR
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from config import (
+    RAW_DATA_DIR,
+    WSJ_ARCHIVE_URL,
+    SCRAPER_WORKERS,
+    SCRAPER_REQUESTS_PER_SECOND,
+    SCRAPER_SERIAL_REQUESTS_PER_SECOND,
+    HTTP_POOL_SIZE,
+    SCRAPE_JOURNAL_FILE,
+    HTML_CACHE_ENABLED,
+    HTML_CACHE_SETTLE_DAYS,
+    RAW_OUTPUT_FORMAT,
+    RAW_STORE_DIR
+)
+from rate_limiter import AdaptiveRateLimiter, CircuitBreaker, CircuitOpenError
+from scrape_journal import ScrapeJournal
+from archive_parser import parse_archive_page, parse_soup
+from article_writer import ArticleWriter
 from tqdm import tqdm
 
 # Headers for requests
@@ -12,120 +36,411 @@ HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
 }
 
-def fetch_page(url, retries=5):
-    """Fetch a page with retry mechanism"""
+# Status codes that mean the server wants us to slow down
+THROTTLE_STATUS_CODES = (429, 503)
+
+def parse_retry_after(value):
+    """Parse a Retry-After header given in seconds or as an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(retry_at.tzinfo)).total_seconds())
+
+def settled_at(url):
+    """Get the time after which the archive page of a URL (or a YYYY/MM/DD date) no longer changes
+
+    A day's archive page keeps gaining articles while the day is running and
+    for a while after (late and updated articles), see config.HTML_CACHE_SETTLE_DAYS.
+
+    Returns:
+        float: Unix time, None for a URL without an archive date
+    """
+    match = re.search(r'(\d{4})/(\d{2})/(\d{2})', url)
+    if match is None:
+        return None
+    day = datetime(*map(int, match.groups()))
+    return (day + timedelta(days=1 + HTML_CACHE_SETTLE_DAYS)).timestamp()
+
+def is_settled(date_str):
+    """Check whether the archive no longer adds articles to a day (YYYY/MM/DD), see settled_at"""
+    return time.time() >= settled_at(date_str)
+
+@instrumentation.stage('fetch_page')
+def fetch_page(url, retries=5, limiter=None, breaker=None):
+    """Fetch a page with retry mechanism, serving it from the HTML cache when possible
+    
+    Online, a cached archive page is only served when it was fetched after
+    its day settled (see settled_at), so recent days are fetched again until
+    they are complete. Offline, every cached page is served.
+    
+    Throttling responses (429/503) slow down the shared limiter and honor
+    Retry-After, other 4xx responses are not retried, and network errors and
+    5xx responses are retried with jittered exponential backoff.
+    
+    Args:
+        url (str): Page URL
+        retries (int): Maximum number of attempts
+        limiter (AdaptiveRateLimiter, optional): Shared request budget, acquired before every attempt
+        breaker (CircuitBreaker, optional): Shared circuit breaker, fails fast while it is open
+    """
+    cache = html_cache.get_cache()
+    if cache is not None:
+        if html_cache.is_offline():
+            cached = cache.get(url, ignore_ttl=True)
+        else:
+            cached = cache.get(url, fetched_after=settled_at(url))
+        if cached is not None:
+            instrumentation.count(read=len(cached.text))
+            return cached
+        if html_cache.is_offline():
+            return None
+    
     for attempt in range(retries):
+        if attempt > 0 and limiter is not None:
+            limiter.on_retry()
+        if breaker is not None:
+            try:
+                breaker.before_request()
+            except CircuitOpenError as e:
+                print(f"Skipping {url}: {e}")
+                return None
+        if limiter is not None:
+            limiter.acquire()
+        
+        retry_after = None
+        throttled = False
         try:
-            response = requests.get(url, headers=HEADERS, timeout=10)
+            response, _ = http_client.get(url, headers=HEADERS, timeout=10)
+            instrumentation.count(read=len(response.content))
             if response.status_code == 200:
+                if limiter is not None:
+                    limiter.on_success()
+                if breaker is not None:
+                    breaker.record_success()
+                if cache is not None:
+                    cache.put(url, response.text)
                 return response
             print(f"Attempt {attempt + 1}: Failed to fetch {url}, status code: {response.status_code}")
+            
+            if response.status_code in THROTTLE_STATUS_CODES:
+                throttled = True
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                if limiter is not None:
+                    limiter.on_throttle(retry_after)
+            elif 400 <= response.status_code < 500:
+                # Client errors will not go away by retrying, but the server itself is healthy
+                if breaker is not None:
+                    breaker.record_success()
+                return None
         except requests.RequestException as e:
             print(f"Attempt {attempt + 1}: Request error - {e}")
         
+        if breaker is not None:
+            breaker.record_failure()
+        
         if attempt < retries - 1:
-            delay = 2 ** attempt
-            print(f"Waiting {delay} seconds before next attempt...")
+            if throttled and limiter is not None:
+                continue  # The limiter pauses every worker until Retry-After has passed
+            delay = retry_after if retry_after is not None else min(2 ** attempt, 30) * random.uniform(0.5, 1.0)
+            print(f"Waiting {delay:.1f} seconds before next attempt...")
             time.sleep(delay)
     return None
 
-def parse_article_data(soup, date_str):
-    """Parse article data from BeautifulSoup object
+@instrumentation.stage('parse_article_data')
+def parse_article_data(page, date_str, page_number=1):
+    """Parse article data from a parsed archive page
     
     Args:
-        soup: BeautifulSoup object
+        page: ArchivePage from archive_parser, or a BeautifulSoup object
         date_str: Date string in YYYY/MM/DD format
+        page_number: Archive page number the articles are listed on
     """
+    if isinstance(page, BeautifulSoup):
+        page = parse_soup(page)
+    
     articles = []
-    article_links = soup.select(".WSJTheme--headline--unZqjb45 a")
-    categories = soup.select(".WSJTheme--articleType--34Gt-vdG")
+    categories = page.categories
     
-    for i in range(len(article_links)):
-        title = article_links[i].get_text(strip=True)
-        article_url = article_links[i]["href"] if "href" in article_links[i].attrs else "Unknown"
-        category = categories[i].get_text(strip=True) if i < len(categories) else "Unknown"
+    for i, (title, href) in enumerate(page.headlines):
+        article_url = href if href is not None else "Unknown"
+        category = categories[i] if i < len(categories) else "Unknown"
         
         if category in ["U.S. Economy", "U.S. Markets"]:
             articles.append({
                 'Date': date_str,
+                'Page': page_number,
                 'Title': title,
                 'Category': category,
                 'URL': article_url
             })
     
+    instrumentation.count(rows=len(articles))
     return articles
 
-def scrape_date(date_str, page=1):
-    """Scrape articles for a specific date"""
+def archive_url(date_str, page):
+    """Build the archive URL for a date (YYYY/MM/DD) and page number"""
+    return WSJ_ARCHIVE_URL.format(date=date_str, page=page)
+
+def scrape_date(date_str, page=1, journal=None, limiter=None, breaker=None):
+    """Scrape articles for a specific date
+    
+    Args:
+        date_str (str): Date in YYYY/MM/DD format
+        page (int): First page to fetch, earlier pages were already scraped
+        journal (ScrapeJournal, optional): Records every page as soon as it is parsed
+        limiter (AdaptiveRateLimiter, optional): Request budget, replaces the fixed delay between pages
+        breaker (CircuitBreaker, optional): Stops requests while errors persist
+    """
     articles = []
     failed_urls = []
     max_pages = 1  # 初始化最大页数
+    first_page = None
     
-    # 首先获取最大页数
-    url = f"https://www.wsj.com/news/archive/{date_str}?page=1"
-    response = fetch_page(url)
-    if response:
-        soup = BeautifulSoup(response.text, "html.parser")
-        # 获取分页信息
-        pagination = soup.select(".WSJTheme--pagination--1jWoU_y9 a")
-        if pagination:
-            try:
-                max_pages = max(int(a.get_text()) for a in pagination if a.get_text().isdigit())
-            except ValueError:
-                max_pages = 1
+    # 首先获取最大页数, page 1 is parsed once and reused below
+    if page == 1:
+        response = fetch_page(archive_url(date_str, 1), limiter=limiter, breaker=breaker)
+        if response:
+            first_page = parse_archive_page(response.text)
+            # 获取分页信息
+            max_pages = first_page.max_pages
     
     # 使用tqdm创建页面爬取的进度条，设置自定义格式
     with tqdm(total=max_pages, desc=f"Day: {date_str}", 
              bar_format='{desc} | Page: {n_fmt} [{bar}] {percentage:3.0f}%',
              leave=False) as pbar:  # 添加leave=False参数
         while True:
-            url = f"https://www.wsj.com/news/archive/{date_str}?page={page}"
+            url = archive_url(date_str, page)
             
-            response = fetch_page(url)
-            if not response:
-                failed_urls.append(url)
-                break
+            if page == 1 and first_page is not None:
+                parsed = first_page
+            else:
+                response = fetch_page(url, limiter=limiter, breaker=breaker)
+                if not response:
+                    failed_urls.append(url)
+                    if journal:
+                        journal.record_failure(date_str, page, url)
+                    break
+                parsed = parse_archive_page(response.text)
             
-            soup = BeautifulSoup(response.text, "html.parser")
-            article_links = soup.select(".WSJTheme--headline--unZqjb45 a")
-            
-            if not article_links:
+            if not parsed.headlines:
+                # A day that may still gain articles is scraped again by the next run
+                if journal and is_settled(date_str):
+                    journal.record_done(date_str)
                 break
             
-            new_articles = parse_article_data(soup, date_str)
+            new_articles = parse_article_data(parsed, date_str, page)
             articles.extend(new_articles)
+            if journal:
+                journal.record_page(date_str, page, len(parsed.headlines), new_articles,
+                                    max_pages if page == 1 else 1)
             
             # 更新进度条描述，显示当前页面的文章数量
-            total_titles = len(article_links)
+            total_titles = len(parsed.headlines)
             saved_titles = len(new_articles)
             pbar.set_description(f"Day: {date_str} | Found: {saved_titles}/{total_titles} articles")
             
             page += 1
             pbar.update(1)  # 更新进度条
-            time.sleep(2)  # Random delay between pages
+            if limiter is None and not getattr(response, 'from_cache', False):
+                time.sleep(2)  # Random delay between pages
     
     return articles, failed_urls
 
-def scrape_wsj_archive(start_date, end_date):
+def scrape_archive_page(date_str, page, limiter=None, breaker=None):
+    """Fetch and parse a single archive page
+    
+    Returns:
+        dict: Page result with keys ok, max_pages, total_titles and articles
+    """
+    response = fetch_page(archive_url(date_str, page), limiter=limiter, breaker=breaker)
+    if not response:
+        return {'ok': False, 'max_pages': 1, 'total_titles': 0, 'articles': []}
+    
+    parsed = parse_archive_page(response.text)
+    return {
+        'ok': True,
+        'max_pages': parsed.max_pages if page == 1 else 1,
+        'total_titles': len(parsed.headlines),
+        'articles': parse_article_data(parsed, date_str, page)
+    }
+
+def crawl_serial(dates, journal=None, limiter=None, breaker=None):
+    """Scrape dates one at a time, yielding (date, articles, failed_urls) in date order
+    
+    Args:
+        dates (list): Dates in YYYY/MM/DD format
+        journal (ScrapeJournal, optional): Progress journal, finished pages are skipped
+        limiter (AdaptiveRateLimiter, optional): Request budget, replaces the fixed delay between pages
+        breaker (CircuitBreaker, optional): Stops requests while errors persist
+    """
+    for date_str in dates:
+        if journal is None:
+            articles, failed_urls = scrape_date(date_str, limiter=limiter, breaker=breaker)
+            yield date_str, articles, failed_urls
+        elif journal.is_done(date_str):
+            yield date_str, journal.day_articles(date_str), []
+        else:
+            _, failed_urls = scrape_date(date_str, journal.next_page(date_str), journal, limiter, breaker)
+            yield date_str, journal.day_articles(date_str), failed_urls
+
+def crawl_concurrent(dates, workers=SCRAPER_WORKERS, requests_per_second=SCRAPER_REQUESTS_PER_SECOND,
+                     journal=None, limiter=None, breaker=None):
+    """Scrape many days and pages at once, yielding (date, articles, failed_urls) in date order
+    
+    Pages are fetched by a bounded worker pool under a global requests-per-second
+    budget. Each day follows the same stopping rules as scrape_date: it ends at the
+    first page that fails or has no headlines, so the output matches the serial path.
+    
+    Args:
+        dates (list): Dates in YYYY/MM/DD format
+        workers (int): Maximum number of requests in flight
+        requests_per_second (float): Global request budget, None or 0 for no limit
+        journal (ScrapeJournal, optional): Progress journal, finished pages are skipped
+        limiter (AdaptiveRateLimiter, optional): Shared request budget, created from requests_per_second if None
+        breaker (CircuitBreaker, optional): Stops requests while errors persist
+    """
+    if limiter is None:
+        limiter = AdaptiveRateLimiter(requests_per_second)
+    window = max(2 * workers, 1)  # Days in flight at once, keeps memory bounded
+    days = {}
+    pending = {}
+    next_admit = 0
+    next_emit = 0
+    
+    def submit(executor, day_index, page):
+        future = executor.submit(scrape_archive_page, dates[day_index], page, limiter, breaker)
+        pending[future] = (day_index, page)
+        days[day_index]['submitted'] = max(days[day_index]['submitted'], page)
+    
+    def settle(executor, day_index):
+        # A day is finished once every page up to its first terminating page is known
+        day = days[day_index]
+        page = 1
+        while page in day['pages']:
+            result = day['pages'][page]
+            if not result['ok']:
+                day['failed_urls'].append(archive_url(dates[day_index], page))
+                day['done'] = True
+                return
+            if not result['total_titles']:
+                if journal and is_settled(dates[day_index]):
+                    journal.record_done(dates[day_index])
+                day['done'] = True
+                return
+            page += 1
+        # Every known page had headlines, probe beyond them like the serial loop does
+        if page > day['submitted']:
+            submit(executor, day_index, page)
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while next_emit < len(dates):
+            while next_admit < len(dates) and next_admit < next_emit + window:
+                date_str = dates[next_admit]
+                if journal and journal.is_done(date_str):
+                    pages = {1: {'ok': True, 'max_pages': 1, 'total_titles': 0, 'articles': []}}
+                    days[next_admit] = {'pages': pages, 'submitted': 1, 'failed_urls': [], 'done': True}
+                    days[next_admit]['articles'] = journal.day_articles(date_str)
+                    next_admit += 1
+                    continue
+                
+                pages = journal.completed_pages(date_str) if journal else {}
+                days[next_admit] = {'pages': pages, 'submitted': max(pages, default=0),
+                                    'failed_urls': [], 'done': False}
+                if 1 not in pages:
+                    submit(executor, next_admit, 1)
+                else:
+                    # Resume a partially scraped day from the pages missing in the journal
+                    for extra_page in range(2, pages[1]['max_pages'] + 1):
+                        if extra_page not in pages:
+                            submit(executor, next_admit, extra_page)
+                    settle(executor, next_admit)
+                next_admit += 1
+            
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                day_index, page = pending.pop(future)
+                if day_index not in days:
+                    continue
+                day = days[day_index]
+                result = future.result()
+                day['pages'][page] = result
+                if journal and result['ok'] and result['total_titles']:
+                    journal.record_page(dates[day_index], page, result['total_titles'],
+                                        result['articles'], result['max_pages'])
+                elif journal and not result['ok']:
+                    journal.record_failure(dates[day_index], page, archive_url(dates[day_index], page))
+                if page == 1 and result['ok'] and result['total_titles']:
+                    for extra_page in range(2, result['max_pages'] + 1):
+                        submit(executor, day_index, extra_page)
+                if not day['done']:
+                    settle(executor, day_index)
+            
+            while next_emit in days and days[next_emit]['done']:
+                day = days.pop(next_emit)
+                if 'articles' in day:
+                    yield dates[next_emit], day['articles'], []
+                    next_emit += 1
+                    continue
+                articles = []
+                for page in sorted(day['pages']):
+                    result = day['pages'][page]
+                    if not result['ok'] or not result['total_titles']:
+                        break
+                    articles.extend(result['articles'])
+                yield dates[next_emit], articles, day['failed_urls']
+                next_emit += 1
+            
+            # Pages beyond a finished day's last page are discarded
+            for future, (day_index, _) in list(pending.items()):
+                if day_index < next_emit and future.cancel():
+                    pending.pop(future)
+
+def scrape_wsj_archive(start_date, end_date, workers=1, requests_per_second=SCRAPER_REQUESTS_PER_SECOND,
+                       journal_file=SCRAPE_JOURNAL_FILE, offline=False, output_format=RAW_OUTPUT_FORMAT,
+                       output_file=None):
     """Scrape WSJ article archive
     
     Args:
         start_date (str): Start date in 'YYYY-MM-DD' format
         end_date (str): End date in 'YYYY-MM-DD' format
+        workers (int): Number of concurrent requests, 1 scrapes serially
+        requests_per_second (float): Global request budget for concurrent mode
+        journal_file (str, optional): Progress journal path, an interrupted run resumes from it
+        offline (bool): Only parse pages from the HTML cache, never touch the network
+        output_format (str): 'csv' or 'parquet'
+        output_file (str, optional): Output path, defaults to a file named after the date range
         
     Returns:
-        pd.DataFrame: DataFrame containing scraped article data with columns:
+        str: Path of the output file with columns:
             - Date: Article publication date
+            - Page: Archive page the article was listed on
             - Title: Article title
             - Category: Article category
             - URL: Article URL
+        or None if no articles were collected
             
     Note:
         Data is saved to data/raw/wsj_US_econ_articles_{start_date}_{end_date}.csv
+        (or a .parquet directory) in row batches while the crawl runs
         Only articles with categories "U.S. Economy" and "U.S. Markets" are saved
+        Pages are journaled as they are parsed, so a restart after an interruption
+        skips finished pages and only retries the failed ones. The journal is
+        deleted once the output is written, a later run of the same days gets
+        their settled pages from the HTML cache instead.
     """
-    all_articles = []
-    all_failed_urls = []
+    journal = ScrapeJournal(journal_file) if journal_file else None
+    cache = html_cache.configure_cache(enabled=HTML_CACHE_ENABLED, offline=offline)
+    
+    # All workers share one keep-alive session, sized so no request waits for a connection
+    http_client.configure_session(pool_size=max(HTTP_POOL_SIZE, workers))
+    http_client.timing_stats.reset()
     
     current_date = datetime.strptime(start_date, '%Y-%m-%d')
     end_date_obj = datetime.strptime(end_date, '%Y-%m-%d')
@@ -133,35 +448,50 @@ def scrape_wsj_archive(start_date, end_date):
     # 计算总天数用于进度条
     total_days = (end_date_obj - current_date).days + 1
     
-    # 使用tqdm创建进度条，设置自定义格式
-    with tqdm(total=total_days, desc="Total Progress", bar_format='{desc}: {n_fmt}/{total_fmt} Days [{bar}] {percentage:3.0f}%') as pbar:
-        while current_date <= end_date_obj:
-            formatted_date = current_date.strftime('%Y/%m/%d')
-            articles, failed_urls = scrape_date(formatted_date)
-            all_articles.extend(articles)
-            all_failed_urls.extend(failed_urls)
-            current_date += timedelta(days=1)
-            pbar.update(1)  # 更新进度条
+    dates = [(current_date + timedelta(days=i)).strftime('%Y/%m/%d') for i in range(total_days)]
+    breaker = CircuitBreaker()
+    if workers > 1:
+        limiter = AdaptiveRateLimiter(requests_per_second)
+        crawl = crawl_concurrent(dates, workers, requests_per_second, journal, limiter, breaker)
+    else:
+        limiter = AdaptiveRateLimiter(SCRAPER_SERIAL_REQUESTS_PER_SECOND)
+        crawl = crawl_serial(dates, journal, limiter, breaker)
     
-    if not all_articles:
-        print("Warning: No articles were collected!")
-        return None
+    # Create output file path with both start and end dates
+    start_date_str = current_date.strftime('%Y%m%d')
+    end_date_str = end_date_obj.strftime('%Y%m%d')
+    extension = 'parquet' if output_format == 'parquet' else 'csv'
+    if output_file is None:
+        output_file = os.path.join(RAW_DATA_DIR, f'wsj_US_econ_articles_{start_date_str}_{end_date_str}.{extension}')
+    
+    # Days arrive in date order, from the journal for pages of earlier interrupted runs
+    all_failed_urls = []
+    with ArticleWriter(output_file, output_format) as writer:
+        # 使用tqdm创建进度条，设置自定义格式
+        with tqdm(total=total_days, desc="Total Progress", bar_format='{desc}: {n_fmt}/{total_fmt} Days [{bar}] {percentage:3.0f}%') as pbar:
+            for _, articles, failed_urls in crawl:
+                writer.write(articles)
+                all_failed_urls.extend(failed_urls)
+                pbar.update(1)  # 更新进度条
     
-    # Convert to DataFrame and save
-    df = pd.DataFrame(all_articles)
+    http_client.timing_stats.print_summary()
+    limiter.print_summary()
+    if breaker.opened:
+        print(f"Circuit breaker opened {breaker.opened} times, rerun to retry the skipped pages")
+    if cache is not None and not offline:
+        cache.evict()
     
-    # Create output file path with both start and end dates
-    start_date_str = datetime.strptime(start_date, '%Y-%m-%d').strftime('%Y%m%d')
-    end_date_str = datetime.strptime(end_date, '%Y-%m-%d').strftime('%Y%m%d')
-    output_file = os.path.join(RAW_DATA_DIR, f'wsj_US_econ_articles_{start_date_str}_{end_date_str}.csv')
+    if journal is not None:
+        all_failed_urls = journal.failed_urls(dates)
+        journal.discard()
     
-    # Create directories if they don't exist
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    if not writer.rows_written:
+        # The writer left any earlier output in place
+        print("Warning: No articles were collected!")
+        return None
     
-    # Save to CSV
-    df.to_csv(output_file, index=False)
     print(f"\nData saved to {output_file}")
-    print(f"Total articles collected: {len(df)}")
+    print(f"Total articles collected: {writer.rows_written}")
     
     # Report failed URLs
     if all_failed_urls:
@@ -171,7 +501,66 @@ def scrape_wsj_archive(start_date, end_date):
     else:
         print("\nAll URLs were successfully scraped.")
     
-    return df
+    return output_file
+
+def reparse_archive(start_date=None, end_date=None, output_format=RAW_OUTPUT_FORMAT):
+    """Rebuild the raw CSV from cached archive pages only, without network access
+    
+    Args:
+        start_date (str, optional): Start date in 'YYYY-MM-DD' format, defaults to the oldest cached day
+        end_date (str, optional): End date in 'YYYY-MM-DD' format, defaults to the newest cached day
+        output_format (str): 'csv' or 'parquet'
+    """
+    if not start_date or not end_date:
+        cache = html_cache.configure_cache(offline=True)
+        cached_dates = sorted({match.group(1) for match in
+                               (re.search(r'(\d{4}/\d{2}/\d{2})', url) for url in cache.urls()) if match})
+        if not cached_dates:
+            print("Warning: The HTML cache is empty, nothing to reparse!")
+            return None
+        start_date = start_date or cached_dates[0].replace('/', '-')
+        end_date = end_date or cached_dates[-1].replace('/', '-')
+    
+    print(f"Reparsing cached pages from {start_date} to {end_date}...")
+    return scrape_wsj_archive(start_date, end_date, journal_file=None, offline=True, output_format=output_format)
+
+def scrape_incremental(end_date=None, workers=1, requests_per_second=SCRAPER_REQUESTS_PER_SECOND):
+    """Scrape only the days after the newest stored article and merge them into the raw store
+    
+    The last HTML_CACHE_SETTLE_DAYS stored days are scraped again, the archive may
+    have added articles to them since, and the store skips the ones it already has.
+    
+    Args:
+        end_date (str, optional): Last day to scrape in 'YYYY-MM-DD' format, defaults to yesterday
+        workers (int): Number of concurrent requests, 1 scrapes serially
+        requests_per_second (float): Global request budget for concurrent mode
+        
+    Returns:
+        int: Number of new articles added to the store
+    """
+    seeded = raw_store.seed_store()
+    if seeded:
+        print(f"Seeded the raw store with {seeded} existing articles")
+    
+    newest = raw_store.newest_raw_date()
+    if end_date is None:
+        end_date = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+    start_date = (newest - timedelta(days=HTML_CACHE_SETTLE_DAYS)).strftime('%Y-%m-%d') \
+        if newest is not None else end_date
+    if start_date > end_date:
+        print(f"Raw data is up to date (newest article: {newest:%Y-%m-%d})")
+        return 0
+    
+    print(f"Scraping new days from {start_date} to {end_date}...")
+    os.makedirs(RAW_STORE_DIR, exist_ok=True)
+    output_file = os.path.join(RAW_STORE_DIR, f'.incremental_{start_date}_{end_date}.csv')
+    if scrape_wsj_archive(start_date, end_date, workers, requests_per_second, output_file=output_file) is None:
+        return 0
+    
+    added = raw_store.merge_into_store(pd.read_csv(output_file))
+    os.remove(output_file)
+    print(f"Added {added} new articles to {RAW_STORE_DIR}")
+    return added
 
 def main(start_date=None, end_date=None):
     """Main function for scraping WSJ articles
@@ -186,9 +575,9 @@ def main(start_date=None, end_date=None):
         end_date = '2025-02-26'
     
     print(f"Starting scraping from {start_date} to {end_date}...")
-    df = scrape_wsj_archive(start_date, end_date)
+    output_file = scrape_wsj_archive(start_date, end_date)
     
-    if df is not None:
+    if output_file is not None:
         print("Scraping completed successfully.")
     else:
         print("Scraping failed to collect any articles.")
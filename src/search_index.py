@@ -0,0 +1,146 @@
+import re
+from functools import lru_cache
+import numpy as np
+
+SEARCH_COLUMNS = ['Title', 'Category', 'URL']
+
+# Tokens are runs of lowercase ASCII letters and digits, in the index and in queries alike
+_TOKEN_SEPARATOR = r'[^a-z0-9]+'
+
+
+def tokenize(text):
+    """Split a query into lowercase tokens"""
+    return [token for token in re.split(_TOKEN_SEPARATOR, str(text).lower()) if token]
+
+
+class HeadlineIndex:
+    """Inverted index over headline tokens with prefix search and sentiment filters
+
+    Postings are kept in compressed sparse row form: the vocabulary is sorted,
+    and the row ids of token i are rows[offsets[i]:offsets[i + 1]], sorted and
+    unique. All tokens starting with a prefix are neighbours in the sorted
+    vocabulary, so a prefix matches one contiguous slice of rows. Each query
+    term matches the rows with a token starting with it, and a row must match
+    every term.
+    """
+
+    def __init__(self, data, columns=SEARCH_COLUMNS, sentiment_columns=('annotation_1', 'annotation_2')):
+        """
+        Args:
+            data (pd.DataFrame): Rows to index, row ids are positions in data
+            columns (list): Text columns to index
+            sentiment_columns (tuple): Label columns for sentiment filters, a row
+                matches a sentiment if any of them has that label
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        self.n_rows = len(data)
+        tokens, parents = [], []
+        for column in columns:
+            if column not in data.columns:
+                continue
+            text = pa.array(data[column].astype('string').fillna(''), type=pa.large_string())
+            split = pc.split_pattern_regex(pc.utf8_lower(text), _TOKEN_SEPARATOR)
+            tokens.append(pc.list_flatten(split))
+            parents.append(pc.list_parent_indices(split).to_numpy())
+        tokens = pa.chunked_array(tokens, type=pa.large_string()).combine_chunks() if tokens else \
+            pa.array([], type=pa.large_string())
+        parents = np.concatenate(parents) if parents else np.empty(0, dtype=np.int64)
+
+        # Number the distinct tokens in sorted order
+        encoded = tokens.dictionary_encode()
+        dictionary = encoded.dictionary
+        order = pc.sort_indices(dictionary).to_numpy()
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        codes = rank[encoded.indices.to_numpy(zero_copy_only=False)]
+        vocabulary = dictionary.take(pa.array(order)).to_numpy(zero_copy_only=False).astype(object)
+
+        # Sort (token, row) pairs and drop repeats of a token within a row
+        pairs = np.sort(codes * max(self.n_rows, 1) + parents)
+        pairs = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))]
+        pair_codes = pairs // max(self.n_rows, 1)
+        self.rows = (pairs % max(self.n_rows, 1)).astype(np.int32)
+        self.offsets = np.searchsorted(pair_codes, np.arange(len(vocabulary) + 1))
+        # The empty token from leading or trailing separators is never searched
+        if len(vocabulary) and vocabulary[0] == '':
+            vocabulary, self.offsets = vocabulary[1:], self.offsets[1:]
+        self.vocabulary = vocabulary
+
+        # One row mask per label, a row has the label if any sentiment column has it
+        self.sentiments = {}
+        labels = [data[column].astype('float64').to_numpy() for column in sentiment_columns
+                  if column in data.columns]
+        if labels:
+            for label in np.unique(np.concatenate(labels)):
+                if not np.isnan(label):
+                    self.sentiments[int(label)] = np.logical_or.reduce([values == label for values in labels])
+        self._match = lru_cache(maxsize=64)(self._match_uncached)
+
+    def _prefix_rows(self, prefix):
+        """Get the sorted row ids with a token starting with prefix"""
+        low = np.searchsorted(self.vocabulary, prefix, side='left')
+        high = np.searchsorted(self.vocabulary, prefix + '\U0010ffff', side='left')
+        rows = self.rows[self.offsets[low]:self.offsets[high]]
+        if high - low <= 1:
+            return rows
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[rows] = True
+        return np.flatnonzero(mask)
+
+    def _intersect(self, a, b):
+        if len(a) > len(b):
+            a, b = b, a
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[b] = True
+        return a[mask[a]]
+
+    def _match_uncached(self, terms, sentiments):
+        matches = None
+        # Most selective terms first, so later intersections work on few rows
+        for rows in sorted((self._prefix_rows(term) for term in terms), key=len):
+            matches = rows if matches is None else self._intersect(matches, rows)
+            if len(matches) == 0:
+                return matches
+        if sentiments:
+            masks = [self.sentiments[label] for label in sentiments if label in self.sentiments]
+            if not masks:
+                return np.empty(0, dtype=np.int64)
+            mask = np.logical_or.reduce(masks)
+            matches = np.flatnonzero(mask) if matches is None else matches[mask[matches]]
+        return matches
+
+    def match(self, query='', sentiments=None):
+        """Get the sorted row ids matching a query
+
+        Args:
+            query (str): Search terms, each matched as a token prefix
+            sentiments (list, optional): Labels to filter on, e.g. [1, -1]
+
+        Returns:
+            np.ndarray: Matching row ids, or None if nothing is filtered (every row matches)
+        """
+        terms = tuple(sorted(set(tokenize(query))))
+        sentiments = tuple(sorted(set(sentiments))) if sentiments else ()
+        if not terms and not sentiments:
+            return None
+        return self._match(terms, sentiments)
+
+    def search(self, query='', sentiments=None, page=1, page_size=10):
+        """Get one page of the rows matching a query
+
+        Args:
+            query (str): Search terms, each matched as a token prefix
+            sentiments (list, optional): Labels to filter on, e.g. [1, -1]
+            page (int): Page number, starting at 1
+            page_size (int): Rows per page
+
+        Returns:
+            tuple: (row ids of the page, total number of matching rows)
+        """
+        matches = self.match(query, sentiments)
+        start = (page - 1) * page_size
+        if matches is None:
+            return np.arange(start, min(start + page_size, self.n_rows)), self.n_rows
+        return matches[start:start + page_size], len(matches)
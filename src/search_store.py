@@ -0,0 +1,242 @@
+import os
+import sqlite3
+import threading
+import pandas as pd
+import dataset
+import raw_store
+from search_index import tokenize
+from config import ANNOTATED_DATA_FILE, SEARCH_INDEX_FILE, SEARCH_PAGE_SIZE
+
+# Articles are keyed by URL. The full-text table indexes title, category and
+# URL of each article. New articles are added to it in bulk after each batch,
+# which is much faster than a row trigger, and corrections by a trigger.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    date TEXT,
+    title TEXT,
+    category TEXT,
+    annotation_1 INTEGER,
+    annotation_2 INTEGER
+);
+CREATE INDEX IF NOT EXISTS articles_date ON articles (date);
+CREATE INDEX IF NOT EXISTS articles_category_date ON articles (category, date);
+CREATE INDEX IF NOT EXISTS articles_annotation_1 ON articles (annotation_1) WHERE annotation_1 IS NOT NULL;
+CREATE INDEX IF NOT EXISTS articles_annotation_2 ON articles (annotation_2) WHERE annotation_2 IS NOT NULL;
+CREATE VIRTUAL TABLE IF NOT EXISTS headlines USING fts5 (
+    title, category, url, content='articles', content_rowid='id', prefix='2 3'
+);
+CREATE TRIGGER IF NOT EXISTS articles_update AFTER UPDATE OF title, category, url ON articles BEGIN
+    INSERT INTO headlines (headlines, rowid, title, category, url)
+        VALUES ('delete', old.id, old.title, old.category, old.url);
+    INSERT INTO headlines (rowid, title, category, url) VALUES (new.id, new.title, new.category, new.url);
+END;
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER,
+    size INTEGER
+);
+"""
+
+# Raw rows only change when a reparse corrected them, other conflicts leave the row alone
+_UPSERT_RAW = """
+INSERT INTO articles (url, date, title, category) VALUES (?, ?, ?, ?)
+ON CONFLICT (url) DO UPDATE SET date = excluded.date, title = excluded.title, category = excluded.category
+WHERE (articles.date, articles.title, articles.category) IS NOT (excluded.date, excluded.title, excluded.category)
+"""
+
+# Annotated articles missing from the raw data are added with what the annotated file knows
+_UPSERT_ANNOTATED = """
+INSERT INTO articles (url, date, title, category, annotation_1, annotation_2) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (url) DO UPDATE SET annotation_1 = excluded.annotation_1, annotation_2 = excluded.annotation_2
+"""
+
+_RESULT_COLUMNS = ['id', 'date', 'title', 'category', 'url', 'annotation_1', 'annotation_2']
+
+
+def _values(series):
+    """Convert a column to Python values for SQLite, missing values become None"""
+    return [None if pd.isna(value) else value for value in series.astype(object).tolist()]
+
+
+def _article_rows(df, columns=()):
+    dates = pd.to_datetime(df['Date'], format='mixed', errors='coerce').dt.strftime('%Y-%m-%d')
+    values = [_values(df['URL']), _values(dates), _values(df['Title']), _values(df['Category'])]
+    values += [[None if value is None else int(value) for value in _values(df[column])] for column in columns]
+    return list(zip(*values))
+
+
+class SearchStore:
+    """Persistent headline search index in a SQLite database with a full-text table
+
+    The index is filled from the raw and annotated datasets and refreshed
+    incrementally: only the months covered by raw files that changed since the
+    last refresh are read again, and only new or corrected articles are
+    written. Every thread gets its own connection, and the database runs in
+    WAL mode so searches keep working while a refresh writes.
+    """
+
+    def __init__(self, path=SEARCH_INDEX_FILE):
+        """
+        Args:
+            path (str): Database file, created with its tables when missing
+        """
+        self.path = path
+        self._local = threading.local()
+        self._refresh_lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        connection = sqlite3.connect(path)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(_SCHEMA)
+        connection.close()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path)
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        """Close the connection of the calling thread, which checkpoints the WAL into the database file"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def count(self):
+        """Get the number of indexed articles"""
+        return self._connection().execute('SELECT COUNT(*) FROM articles').fetchone()[0]
+
+    def _write(self, statement, rows):
+        """Upsert rows in one transaction and add the new articles to the full-text table"""
+        connection = self._connection()
+        with connection:
+            last_id = connection.execute('SELECT COALESCE(MAX(id), 0) FROM articles').fetchone()[0]
+            connection.executemany(statement, rows)
+            connection.execute('INSERT INTO headlines (rowid, title, category, url) '
+                               'SELECT id, title, category, url FROM articles WHERE id > ?', (last_id,))
+
+    def add_articles(self, df):
+        """Add raw articles, or correct the ones already indexed
+
+        Args:
+            df (pd.DataFrame): Articles with Date, Title, Category and URL columns
+        """
+        self._write(_UPSERT_RAW, _article_rows(df))
+
+    def set_annotations(self, df):
+        """Replace all annotations with those of an annotated data set
+
+        Args:
+            df (pd.DataFrame): Annotated articles with int labels in Annotation_1 and Annotation_2
+        """
+        self._connection().execute('UPDATE articles SET annotation_1 = NULL, annotation_2 = NULL '
+                                   'WHERE annotation_1 IS NOT NULL OR annotation_2 IS NOT NULL')
+        # Commits together with the cleared annotations, so searches never see them missing
+        self._write(_UPSERT_ANNOTATED, _article_rows(df, dataset.ANNOTATION_COLUMNS))
+
+    def _changed_sources(self, paths):
+        known = {path: (mtime_ns, size) for path, mtime_ns, size in
+                 self._connection().execute('SELECT path, mtime_ns, size FROM sources')}
+        changed = {}
+        for path in paths:
+            stat = os.stat(path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if known.get(os.path.abspath(path)) != signature:
+                changed[path] = signature
+        return changed
+
+    def _record_sources(self, changed):
+        connection = self._connection()
+        with connection:
+            connection.executemany('INSERT OR REPLACE INTO sources (path, mtime_ns, size) VALUES (?, ?, ?)',
+                                   [(os.path.abspath(path), *signature) for path, signature in changed.items()])
+
+    def refresh(self, annotated_path=ANNOTATED_DATA_FILE):
+        """Index the articles that arrived since the last refresh
+
+        Raw files that are new or changed are found by modification time and
+        size. The raw dataset is read for the months they cover (all months
+        when a file name does not tell its dates). The annotations are
+        replaced whenever the annotated file changed. Articles removed from
+        the raw files stay in the index.
+
+        Returns:
+            int: Number of articles added to the index
+        """
+        with self._refresh_lock:
+            before = self.count()
+            raw_sources = raw_store.store_partitions() + raw_store.raw_files()
+            changed = self._changed_sources(raw_sources)
+            if changed:
+                ranges = [raw_store.file_date_range(path) for path in changed]
+                start_date = end_date = None
+                if all(first is not None for first, _ in ranges):
+                    start_date = min(first for first, _ in ranges).strftime('%Y-%m-%d')
+                    end_date = max(last for _, last in ranges).strftime('%Y-%m-%d')
+                for batch in dataset.scan_raw(start_date, end_date, columns=['Date', 'Title', 'Category', 'URL']):
+                    self.add_articles(batch)
+                self._record_sources(changed)
+
+            if os.path.exists(annotated_path):
+                changed = self._changed_sources([annotated_path])
+                if changed:
+                    self.set_annotations(dataset.load_annotated(annotated_path))
+                    self._record_sources(changed)
+            return self.count() - before
+
+    def search(self, query='', sentiments=None, categories=None, start_date=None, end_date=None,
+               page=1, page_size=SEARCH_PAGE_SIZE):
+        """Get one page of the articles matching a query and filters, newest first
+
+        Args:
+            query (str): Search terms, each matched as a token prefix of title,
+                category or URL, empty to only filter
+            sentiments (list, optional): Labels to filter on, an article matches
+                if either annotation has one of them
+            categories (list, optional): Categories to include
+            start_date (str, optional): First date to include (YYYY-MM-DD)
+            end_date (str, optional): Last date to include (YYYY-MM-DD)
+            page (int): Page number, starting at 1
+            page_size (int): Articles per page
+
+        Returns:
+            tuple: (list of article dicts of the page, total number of matching articles)
+        """
+        conditions, params = [], []
+        terms = tokenize(query)
+        if terms:
+            # Tokens are plain letters and digits, so they are safe to quote as FTS5 prefix queries.
+            # As a subquery the full-text match runs once, not once per article of a filter's index range.
+            conditions.append('articles.id IN (SELECT rowid FROM headlines WHERE headlines MATCH ?)')
+            params.append(' AND '.join(f'"{term}"*' for term in terms))
+        if sentiments:
+            placeholders = ', '.join('?' * len(sentiments))
+            conditions.append(f'(articles.annotation_1 IN ({placeholders}) '
+                              f'OR articles.annotation_2 IN ({placeholders}))')
+            params += list(sentiments) * 2
+        if categories:
+            conditions.append(f"articles.category IN ({', '.join('?' * len(categories))})")
+            params += list(categories)
+        if start_date:
+            conditions.append('articles.date >= ?')
+            params.append(start_date)
+        if end_date:
+            conditions.append('articles.date <= ?')
+            params.append(end_date)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        connection = self._connection()
+        if terms and len(conditions) == 1:
+            # Without other filters the full-text table counts the matches on its own
+            total = connection.execute('SELECT COUNT(*) FROM headlines WHERE headlines MATCH ?', params).fetchone()[0]
+        else:
+            total = connection.execute(f'SELECT COUNT(*) FROM articles{where}', params).fetchone()[0]
+        columns = ', '.join(f'articles.{column}' for column in _RESULT_COLUMNS)
+        rows = connection.execute(f'SELECT {columns} FROM articles{where} '
+                                  'ORDER BY articles.date DESC, articles.id DESC LIMIT ? OFFSET ?',
+                                  params + [page_size, (page - 1) * page_size]).fetchall()
+        return [dict(zip(_RESULT_COLUMNS, row)) for row in rows], total
@@ -0,0 +1,434 @@
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import dataset
+from config import (
+    ANNOTATED_DATA_FILE,
+    RAW_DATASET,
+    SENTIMENT_MODEL_FILE,
+    PREDICTED_LABELS_DATASET,
+    SENTIMENT_HASH_BUCKETS,
+    SENTIMENT_NGRAMS,
+    SENTIMENT_SMOOTHING,
+    LABEL_WORKERS,
+    RANDOM_SEED
+)
+
+CLASSES = np.array([-1, 0, 1], dtype=np.int8)
+
+# Tokens are whitespace separated words with this punctuation trimmed from both ends
+TOKEN_PUNCTUATION = '.,:;!?"\'()[]{}$%&*/|‘’“”-–—…'
+
+# Odd 64-bit constant that mixes the hashes of consecutive tokens into an n-gram hash
+_NGRAM_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def hashed_features(titles, n_buckets=SENTIMENT_HASH_BUCKETS, ngrams=SENTIMENT_NGRAMS):
+    """Turn headlines into hashed word n-gram features
+
+    Headlines are lowercased, split on whitespace and trimmed of punctuation
+    by Arrow kernels, which is several times faster than a regex split. Each
+    distinct token is hashed once (pandas' hash_array, stable across runs and
+    machines), and the n-gram hashes are mixed from the token hashes with
+    vectorized integer arithmetic, so no Python code runs per token.
+
+    Args:
+        titles (pd.Series or list): Headlines
+        n_buckets (int): Number of hash buckets
+        ngrams (int): Longest n-gram, 1 for single words only
+
+    Returns:
+        tuple: (bucket of every feature, row of every feature), both int64 arrays
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    text = pa.array(pd.Series(titles).astype('string').fillna(''), type=pa.large_string())
+    split = pc.utf8_split_whitespace(pc.utf8_lower(text))
+    tokens = pc.utf8_trim(pc.list_flatten(split), characters=TOKEN_PUNCTUATION)
+    rows = pc.list_parent_indices(split).to_numpy()
+    # Tokens of punctuation only are empty after trimming
+    keep = pc.not_equal(tokens, '').to_numpy(zero_copy_only=False)
+    encoded = tokens.dictionary_encode()
+    vocabulary = encoded.dictionary.to_numpy(zero_copy_only=False).astype(object)
+    hashes = pd.util.hash_array(vocabulary)[encoded.indices.to_numpy(zero_copy_only=False)][keep]
+    rows = rows[keep]
+
+    features, feature_rows = [hashes], [rows]
+    gram = hashes
+    for n in range(2, ngrams + 1):
+        # The n-gram ending at token i, for tokens with n - 1 predecessors in the same headline
+        gram = gram[:-1] * _NGRAM_MULTIPLIER + hashes[n - 1:]
+        same_row = rows[:len(rows) - n + 1] == rows[n - 1:]
+        features.append(gram[same_row])
+        feature_rows.append(rows[n - 1:][same_row])
+    buckets = (np.concatenate(features) % np.uint64(n_buckets)).astype(np.int64)
+    return buckets, np.concatenate(feature_rows).astype(np.int64)
+
+
+class SentimentModel:
+    """Multinomial naive Bayes over hashed word n-grams
+
+    A linear model: the score of a class is its log prior plus the sum of its
+    log token probabilities over the features of a headline. Buckets never
+    seen in training weigh zero for every class, so unknown words do not move
+    the prediction.
+    """
+
+    def __init__(self, weights, bias, ngrams=SENTIMENT_NGRAMS):
+        """
+        Args:
+            weights (np.ndarray): (n_buckets, n_classes) log token probabilities
+            bias (np.ndarray): (n_classes,) log class priors
+            ngrams (int): Longest n-gram the weights were trained on
+        """
+        self.weights = weights
+        self.bias = bias
+        self.ngrams = ngrams
+
+    @classmethod
+    def fit(cls, titles, labels, n_buckets=SENTIMENT_HASH_BUCKETS, ngrams=SENTIMENT_NGRAMS,
+            smoothing=SENTIMENT_SMOOTHING):
+        """Train on labeled headlines
+
+        Args:
+            titles (pd.Series or list): Headlines, one per label
+            labels (np.ndarray): Labels -1, 0 or 1
+            n_buckets (int): Number of hash buckets
+            ngrams (int): Longest n-gram feature
+            smoothing (float): Additive smoothing of the token counts
+
+        Returns:
+            SentimentModel: The trained model
+        """
+        labels = np.asarray(labels)
+        class_index = np.searchsorted(CLASSES, labels)
+        buckets, rows = hashed_features(titles, n_buckets, ngrams)
+        counts = np.zeros((n_buckets, len(CLASSES)))
+        np.add.at(counts, (buckets, class_index[rows]), 1)
+
+        seen = counts.sum(axis=1) > 0
+        totals = counts.sum(axis=0) + smoothing * seen.sum()
+        weights = np.where(seen[:, None], np.log((counts + smoothing) / totals), 0).astype(np.float32)
+        priors = np.bincount(class_index, minlength=len(CLASSES)) + smoothing
+        return cls(weights, np.log(priors / priors.sum()).astype(np.float32), ngrams)
+
+    def decision_function(self, titles):
+        """Get the (n_titles, n_classes) class scores of headlines"""
+        buckets, rows = hashed_features(titles, len(self.weights), self.ngrams)
+        scores = np.empty((len(titles), len(CLASSES)), dtype=np.float64)
+        gathered = self.weights[buckets]
+        for i in range(len(CLASSES)):
+            scores[:, i] = np.bincount(rows, weights=gathered[:, i], minlength=len(titles))
+        return scores + self.bias
+
+    def predict(self, titles):
+        """Label headlines
+
+        Returns:
+            tuple: (labels as int8 array, probability of each label)
+        """
+        scores = self.decision_function(titles)
+        best = scores.argmax(axis=1)
+        # Softmax probability of the best class, shifted for numerical stability
+        shifted = np.exp(scores - scores[np.arange(len(best)), best][:, None])
+        return CLASSES[best], 1 / shifted.sum(axis=1)
+
+    def save(self, path=SENTIMENT_MODEL_FILE):
+        """Write the model to a single .npz file"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, weights=self.weights, bias=self.bias, ngrams=self.ngrams, classes=CLASSES)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=SENTIMENT_MODEL_FILE):
+        """Read a model written by save"""
+        with np.load(path) as artifact:
+            if not np.array_equal(artifact['classes'], CLASSES):
+                raise ValueError(f"Model {path} was trained for classes {artifact['classes'].tolist()}")
+            return cls(artifact['weights'], artifact['bias'], int(artifact['ngrams']))
+
+
+def training_data(annotated_path=ANNOTATED_DATA_FILE):
+    """Get one training example per annotation: every annotator's label counts
+
+    Returns:
+        tuple: (titles, labels, article index of each example)
+    """
+    df = dataset.load_annotated(annotated_path, columns=['Title'] + dataset.ANNOTATION_COLUMNS)
+    examples = df.melt(id_vars=['Title'], value_vars=dataset.ANNOTATION_COLUMNS, value_name='Label',
+                       ignore_index=False).dropna(subset=['Label'])
+    examples = examples[examples['Label'].isin(CLASSES)]
+    return examples['Title'].reset_index(drop=True), examples['Label'].to_numpy(np.int8), examples.index.to_numpy()
+
+
+def cross_validate(titles, labels, articles, folds=5, random_state=RANDOM_SEED):
+    """Estimate how often the model agrees with an annotator on unseen articles
+
+    Both annotations of an article are kept in the same fold.
+
+    Returns:
+        float: Share of held-out annotations the model predicts
+    """
+    rng = np.random.default_rng(random_state)
+    unique_articles = np.unique(articles)
+    fold_of = dict(zip(rng.permutation(unique_articles), np.arange(len(unique_articles)) % folds))
+    example_folds = np.array([fold_of[article] for article in articles])
+    correct = 0
+    for fold in range(folds):
+        test = example_folds == fold
+        model = SentimentModel.fit(titles[~test], labels[~test])
+        predicted, _ = model.predict(titles[test].reset_index(drop=True))
+        correct += (predicted == labels[test]).sum()
+    return correct / len(labels)
+
+
+def train_model(annotated_path=ANNOTATED_DATA_FILE, model_path=SENTIMENT_MODEL_FILE):
+    """Train the classifier on the annotated data, report its cross-validated accuracy and save it"""
+    titles, labels, articles = training_data(annotated_path)
+    accuracy = cross_validate(titles, labels, articles)
+    majority = np.bincount(np.searchsorted(CLASSES, labels)).max() / len(labels)
+    print(f"Trained on {len(labels)} annotations of {len(np.unique(articles))} headlines: "
+          f"{accuracy:.1%} cross-validated agreement with the annotators "
+          f"(always predicting the most common label: {majority:.1%})")
+    model = SentimentModel.fit(titles, labels)
+    model.save(model_path)
+    return model
+
+
+def load_model(annotated_path=ANNOTATED_DATA_FILE, model_path=SENTIMENT_MODEL_FILE, retrain=False):
+    """Load the saved classifier, training it first when it is missing or older than the annotated data"""
+    if retrain or not os.path.exists(model_path) or \
+            os.path.getmtime(model_path) < os.path.getmtime(annotated_path):
+        return train_model(annotated_path, model_path)
+    return SentimentModel.load(model_path)
+
+
+# Counts kept per Date and Category of the labeled articles
+LABEL_COUNT_COLUMNS = ['articles', 'positive', 'neutral', 'negative']
+
+
+def label_counts(batch):
+    """Count the articles and each predicted label per Date and Category of labeled articles"""
+    labels = batch['Predicted_Label']
+    counts = pd.DataFrame({
+        'Date': batch['Date'].dt.normalize(),
+        'Category': batch['Category'].astype(object).fillna('Unknown'),
+        'articles': 1,
+        'positive': (labels == 1).astype(int),
+        'neutral': (labels == 0).astype(int),
+        'negative': (labels == -1).astype(int)
+    })
+    return counts.groupby(['Date', 'Category'])[LABEL_COUNT_COLUMNS].sum()
+
+
+# Model of a labeling process, set up once per process by _init_worker
+_worker_model = None
+
+
+def _init_worker(weights_path, bias, ngrams):
+    """Load the model in a labeling process, memory-mapping the weights so all processes share one copy"""
+    global _worker_model
+    _worker_model = SentimentModel(np.load(weights_path, mmap_mode='r'), bias, ngrams)
+
+
+def _kept_predictions(previous, month, start_date, end_date, categories):
+    """Predictions of a month from an earlier run that lie outside the date range or categories being labeled"""
+    if previous is None or not os.path.exists(os.path.join(previous, f'Month={month}')):
+        return None
+    period = pd.Period(month, 'M')
+    df = dataset.read_dataset(previous, start_date=period.start_time.date().isoformat(),
+                              end_date=period.end_time.date().isoformat())
+    labeled = pd.Series(True, index=df.index)
+    if start_date:
+        labeled &= df['Date'] >= pd.Timestamp(start_date)
+    if end_date:
+        labeled &= df['Date'] <= pd.Timestamp(end_date)
+    if categories is not None:
+        labeled &= df['Category'].isin(categories)
+    return df[~labeled]
+
+
+def label_month(month, source, output, start_date=None, end_date=None, categories=None, model=None,
+                previous=None):
+    """Label the articles of one month of a dataset into the same month of the output dataset
+
+    Runs in a labeling process: the month is read from the source dataset and
+    written to the output dataset by the process itself, only its daily
+    counts are sent back. Predictions of the month from an earlier run that
+    lie outside the date range or categories are kept, after the new ones.
+
+    Args:
+        month (str): Month to label (YYYY-MM)
+        source (str): Dataset of the articles, written by dataset.write_dataset
+        output (str): Output dataset directory
+        start_date (str, optional): First article date to label (YYYY-MM-DD)
+        end_date (str, optional): Last article date to label (YYYY-MM-DD)
+        categories (list, optional): Categories to label, all when None
+        model (SentimentModel, optional): Model to use instead of the one of the labeling process
+        previous (str, optional): Output dataset of an earlier run
+
+    Returns:
+        pd.DataFrame: label_counts of the month, None when it has no articles to label
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    model = model or _worker_model
+    period = pd.Period(month, 'M')
+    first, last = period.start_time.date().isoformat(), period.end_time.date().isoformat()
+    start_date, end_date = max(first, start_date or first), min(last, end_date or last)
+    partition = os.path.join(output, f'Month={month}')
+    os.makedirs(partition, exist_ok=True)
+    # Row numbers of later months are higher, so reading the whole dataset keeps the months in order
+    first_row = period.ordinal << 32
+    counts, rows = [], 0
+    batches = dataset.scan_dataset(source, ['Date', 'Title', 'Category', 'URL'], start_date, end_date, categories)
+    for part, batch in enumerate(batches):
+        labels, confidence = model.predict(batch['Title'])
+        batch = batch.assign(Predicted_Label=labels, Confidence=confidence.astype(np.float32),
+                             _row=np.arange(first_row + rows, first_row + rows + len(batch)))
+        pq.write_table(pa.Table.from_pandas(batch, preserve_index=False),
+                       os.path.join(partition, f'part-{part:05d}.parquet'))
+        counts.append(label_counts(batch))
+        rows += len(batch)
+    kept = _kept_predictions(previous, month, start_date, end_date, categories)
+    if kept is not None and len(kept):
+        kept = kept.assign(_row=np.arange(first_row + rows, first_row + rows + len(kept)))
+        pq.write_table(pa.Table.from_pandas(kept, preserve_index=False),
+                       os.path.join(partition, f'part-{len(counts):05d}.parquet'))
+    elif not counts:
+        os.rmdir(partition)
+    if not counts:
+        return None
+    return pd.concat(counts)
+
+
+def label_dataset(model, source, output=PREDICTED_LABELS_DATASET, start_date=None, end_date=None, categories=None,
+                  workers=LABEL_WORKERS):
+    """Label the articles of a dataset month by month, in parallel processes
+
+    Each month partition of the source dataset is labeled by one process,
+    see label_month. The processes map the model weights from a shared file
+    and read and write the articles themselves, so no articles are pickled
+    between processes. The output dataset has the layout of
+    dataset.write_dataset. When every month is done, the labeled months
+    replace the ones of the output dataset, the other months are kept
+    (see dataset.replace_months). Without a date range or categories,
+    the whole output dataset is replaced.
+
+    Args:
+        model (SentimentModel): Trained model
+        source (str): Dataset of the articles, written by dataset.write_dataset
+        output (str): Output dataset directory
+        start_date (str, optional): First article date to label (YYYY-MM-DD)
+        end_date (str, optional): Last article date to label (YYYY-MM-DD)
+        categories (list, optional): Categories to label, all when None
+        workers (int): Maximum number of labeling processes, 1 labels in this process
+
+    Returns:
+        pd.DataFrame: label_counts of all labeled articles
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    months = dataset.dataset_months(source, start_date, end_date)
+    whole = not start_date and not end_date and categories is None
+    previous = output if os.path.exists(output) and not whole else None
+    tmp_output = f"{output}.tmp"
+    if os.path.exists(tmp_output):
+        shutil.rmtree(tmp_output)
+    os.makedirs(tmp_output)
+    tasks = [(month, source, tmp_output, start_date, end_date, categories, None, previous) for month in months]
+    workers = min(workers, len(months))
+    if workers <= 1:
+        results = [label_month(*task[:6], model=model, previous=previous) for task in tasks]
+    else:
+        with tempfile.TemporaryDirectory(prefix='sentiment_model_') as shared:
+            weights_path = os.path.join(shared, 'weights.npy')
+            np.save(weights_path, model.weights)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(weights_path, model.bias, model.ngrams)) as executor:
+                results = list(executor.map(label_month, *zip(*tasks)))
+    if previous is None:
+        dataset.swap_directory(tmp_output, output)
+    else:
+        # Months of the range the source no longer has are removed as well
+        replaced = sorted(set(months) | set(dataset.dataset_months(output, start_date, end_date)))
+        dataset.replace_months(tmp_output, output, replaced)
+
+    results = [counts for counts in results if counts is not None]
+    if not results:
+        return pd.DataFrame(columns=LABEL_COUNT_COLUMNS, dtype='int64',
+                            index=pd.MultiIndex.from_arrays([[], []], names=['Date', 'Category']))
+    # Batches of a month can split a day, the sum merges them
+    return pd.concat(results).groupby(level=['Date', 'Category']).sum().sort_index()
+
+
+def label_archive(output=PREDICTED_LABELS_DATASET, start_date=None, end_date=None, categories=None,
+                  retrain=False, workers=LABEL_WORKERS):
+    """Pre-label raw headlines with the baseline classifier
+
+    The raw dataset is split by month across labeling processes, see
+    label_dataset.
+
+    Args:
+        output (str): Output dataset directory
+        start_date (str, optional): First article date to label (YYYY-MM-DD)
+        end_date (str, optional): Last article date to label (YYYY-MM-DD)
+        categories (list, optional): Categories to label, all when None
+        retrain (bool): Train the model again even if it is up to date
+        workers (int): Maximum number of labeling processes
+
+    Returns:
+        int: Number of labeled headlines
+    """
+    model = load_model(retrain=retrain)
+    months = dataset.raw_months(start_date, end_date)
+    start = time.perf_counter()
+    counts = label_dataset(model, RAW_DATASET, output, start_date, end_date, categories, workers)
+    seconds = time.perf_counter() - start
+    total = int(counts['articles'].sum())
+    if total == 0:
+        print("No raw articles to label")
+        return 0
+    processes = max(min(workers, len(months)), 1)
+    shares = ', '.join(f"{counts[name].sum() / total:.1%} {name}" for name in ('positive', 'neutral', 'negative'))
+    print(f"Labeled {total} headlines of {len(months)} months with {processes} process{'es' if processes > 1 else ''} "
+          f"in {seconds:.1f}s ({total / seconds:,.0f} per second) into {output}: {shares}")
+    return total
+
+
+def load_predictions(columns=None, start_date=None, end_date=None, categories=None, path=PREDICTED_LABELS_DATASET):
+    """Load pre-labeled headlines written by label_archive, see dataset.read_dataset"""
+    return dataset.read_dataset(path, columns, start_date, end_date, categories)
+
+
+def join_predictions(df, path=PREDICTED_LABELS_DATASET):
+    """Add the pre-label of each article next to its annotations, matched by URL
+
+    Machine labels stay in their own dataset, so they never mix with the
+    annotations, and are joined in for views such as the app's. Only the
+    months of the articles' dates are read.
+
+    Args:
+        df (pd.DataFrame): Articles with URL and Date columns, e.g. from dataset.load_annotated
+        path (str): Dataset written by label_archive
+
+    Returns:
+        pd.DataFrame: df with Predicted (int8 label) and Confidence columns,
+            empty for articles that were not pre-labeled
+    """
+    predicted = pd.Series(pd.NA, index=df.index, dtype='Int8')
+    confidence = pd.Series(np.nan, index=df.index, dtype='float32')
+    dates = df['Date'].dropna()
+    if os.path.exists(path) and not dates.empty:
+        predictions = load_predictions(['URL', 'Predicted_Label', 'Confidence'], dates.min().date().isoformat(),
+                                       dates.max().date().isoformat(), path=path)
+        predictions = predictions.drop_duplicates('URL').set_index('URL').reindex(df['URL'])
+        predicted[:] = predictions['Predicted_Label'].astype('Int8').to_numpy()
+        confidence[:] = predictions['Confidence'].to_numpy(dtype='float32')
+    return df.assign(Predicted=predicted, Confidence=confidence)
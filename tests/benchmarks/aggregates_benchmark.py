@@ -0,0 +1,98 @@
+"""Benchmark the sentiment aggregates against grouping the annotated table for every chart
+
+Writes a synthetic annotated CSV file spread over several years, builds the
+aggregates from it, then edits and appends a batch of annotations and times
+the incremental update. The update is checked against a full rebuild. Trend
+reads from the aggregates are timed next to the per-chart groupby over the
+whole annotated table they replace.
+
+Usage:
+    python tests/benchmarks/aggregates_benchmark.py --rows 1000000 --changes 1000
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src"))
+
+import aggregates
+import dataset
+from agreement_benchmark import make_annotations
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def groupby_trend(df):
+    """Monthly net sentiment per category straight from the annotated articles"""
+    labels = df[['Annotation_1', 'Annotation_2']]
+    df = df.assign(Month=df['Date'].dt.to_period('M'), net=(labels == 1).sum(axis=1) - (labels == -1).sum(axis=1),
+                   labels=labels.notna().sum(axis=1))
+    return df.groupby(['Month', 'Category'], observed=True)[['net', 'labels']].sum()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sentiment aggregates benchmark')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--changes', type=int, default=1000, help='Annotations edited and added before the update')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='aggregates_benchmark_')
+    try:
+        rng = np.random.default_rng(523)
+        annotated = make_annotations(args.rows)
+        annotated['Date'] = pd.to_datetime('2015-01-01') + pd.to_timedelta(rng.integers(0, 3650, args.rows), unit='D')
+        annotated_path = os.path.join(directory, 'annotated.csv')
+        aggregates_dir = os.path.join(directory, 'aggregates')
+        annotated.to_csv(annotated_path, index=False)
+
+        # Rebuilding the typed dataset of an edited CSV file is shared with every other reader, timed apart
+        dataset_ms, _ = timed(lambda: dataset.load_annotated(annotated_path))
+        build_ms, _ = timed(lambda: aggregates.update_aggregates(annotated_path, aggregates_dir))
+        check_ms, _ = timed(lambda: aggregates.update_aggregates(annotated_path, aggregates_dir))
+        print(f"{args.rows} annotated articles: dataset built in {dataset_ms / 1000:.2f}s, "
+              f"aggregates built in {build_ms / 1000:.2f}s, up-to-date check {check_ms:.2f} ms")
+
+        # Edit some annotations and append new articles
+        edited = rng.choice(args.rows, args.changes // 2, replace=False)
+        annotated.loc[edited, 'Annotation_1'] = '-1'
+        new = make_annotations(args.changes - len(edited), seed=7).assign(Date=annotated['Date'].iloc[0])
+        new['URL'] = new['URL'] + '-new'
+        annotated = pd.concat([annotated, new], ignore_index=True)
+        annotated.to_csv(annotated_path, index=False)
+        dataset.load_annotated(annotated_path)
+        update_ms, _ = timed(lambda: aggregates.update_aggregates(annotated_path, aggregates_dir))
+        # The update reads the annotated dataset once, which any reader of it pays
+        load_ms, _ = timed(lambda: dataset.load_annotated(annotated_path, columns=['URL', 'Date', 'Category',
+                                                                                    'Annotation_1', 'Annotation_2']))
+        typed = dataset.load_annotated(annotated_path)
+        incremental = pd.read_parquet(os.path.join(aggregates_dir, 'daily.parquet'))
+        rebuilt = aggregates.daily_counts(typed).reset_index()
+        print(f"{args.changes} changed annotations: incremental update {update_ms / 1000:.2f}s "
+              f"(of which {load_ms / 1000:.2f}s reading the annotated dataset), "
+              f"{'matches' if incremental.equals(rebuilt) else 'DOES NOT MATCH'} a full rebuild")
+
+        groupby_ms, _ = timed(lambda: groupby_trend(typed))
+        print(f"{'trend':<34} {'periods':>8} {'read (ms)':>10}")
+        print(f"{'groupby over all articles':<34} {'monthly':>8} {groupby_ms:>10.1f}")
+        for frequency in aggregates.FREQUENCIES:
+            for by_category in (True, False):
+                read_ms, trend = timed(lambda: aggregates.load_trend(frequency, by_category=by_category,
+                                                                     directory=aggregates_dir))
+                label = f"aggregates, {'per category' if by_category else 'all categories'}"
+                print(f"{label:<34} {frequency:>8} {read_ms:>10.1f}  ({len(trend)} rows)")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Compare the vectorized agreement engine with the original iterrows loop
+
+Generates annotated data with mixed label formats ("1: positive", "-1", ...)
+at each size, times both implementations and checks that they produce
+byte-identical analysis_report.json output.
+
+Usage:
+    python tests/benchmarks/agreement_benchmark.py --sizes 1000 100000 1000000
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src"))
+
+from agreement_analysis import preprocess_annotations, compute_agreement
+
+LABEL_FORMATS = {
+    -1: ["-1", "-1: negative", "-1: negative read", "-1 negative"],
+    0: ["0", "0: neutral", "0: neutral read"],
+    1: ["1", "1: positive", "1: positive read"]
+}
+
+
+def make_annotations(n_rows, seed=523):
+    """Generate annotated rows where the second annotator agrees about 80% of the time"""
+    rng = np.random.default_rng(seed)
+    labels_1 = rng.integers(-1, 2, n_rows)
+    labels_2 = np.where(rng.random(n_rows) < 0.8, labels_1, rng.integers(-1, 2, n_rows))
+
+    def render(labels):
+        out = np.empty(n_rows, dtype=object)
+        for label, formats in LABEL_FORMATS.items():
+            mask = labels == label
+            out[mask] = np.array(formats, dtype=object)[rng.integers(0, len(formats), mask.sum())]
+        out[rng.random(n_rows) < 0.005] = None  # A few missing annotations
+        return out
+
+    ids = np.arange(n_rows)
+    return pd.DataFrame({
+        'ID': ids,
+        'Date': '2025-02-23',
+        'Title': pd.Series(ids).map('Headline number {}'.format),
+        'Category': np.where(rng.random(n_rows) < 0.5, 'U.S. Economy', 'U.S. Markets'),
+        'URL': pd.Series(ids).map('https://www.wsj.com/articles/{}'.format),
+        'Annotation_1': render(labels_1),
+        'Annotation_2': render(labels_2)
+    })
+
+
+def legacy_agreement(df):
+    """The original per-row implementation of calculate_agreement"""
+    def extract_number(text):
+        if pd.isna(text):
+            return np.nan
+        match = re.search(r'-?\d+', str(text))
+        return float(match.group()) if match else np.nan
+
+    df['Annotation_1_value'] = df['Annotation_1'].apply(extract_number)
+    df['Annotation_2_value'] = df['Annotation_2'].apply(extract_number)
+
+    agreement_count = total_count = disagreement_count = difference_count = 0
+    total_difference = 0
+    disagreements = []
+    freq_1 = df['Annotation_1_value'].value_counts().to_dict()
+    freq_2 = df['Annotation_2_value'].value_counts().to_dict()
+    for _, row in df.iterrows():
+        if pd.notna(row['Annotation_1_value']) and pd.notna(row['Annotation_2_value']):
+            total_count += 1
+            if row['Annotation_1_value'] == row['Annotation_2_value']:
+                agreement_count += 1
+            else:
+                disagreement_count += 1
+                total_difference += abs(row['Annotation_1_value'] - row['Annotation_2_value'])
+                difference_count += 1
+                disagreements.append({
+                    'Title': row['Title'],
+                    'Category': row['Category'],
+                    'URL': row['URL'],
+                    'Annotation_1': row['Annotation_1'],
+                    'Annotation_2': row['Annotation_2'],
+                    'Difference': abs(row['Annotation_1_value'] - row['Annotation_2_value'])
+                })
+    agreement_rate = (agreement_count / total_count * 100) if total_count > 0 else 0
+    avg_difference = (total_difference / difference_count) if difference_count > 0 else 0
+    return {
+        'agreement_rate': agreement_rate,
+        'total_rows': total_count,
+        'agreement_count': agreement_count,
+        'disagreement_count': disagreement_count,
+        'average_difference': avg_difference,
+        'annotation_frequencies': {'annotator_1': freq_1, 'annotator_2': freq_2},
+        'disagreements': disagreements
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Agreement engine benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'loop':>10} {'vectorized':>11} {'speedup':>8}  report")
+    for n_rows in args.sizes:
+        df = make_annotations(n_rows)
+
+        start = time.perf_counter()
+        expected = legacy_agreement(df.copy())
+        loop_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        report = compute_agreement(preprocess_annotations(df.copy()))
+        vectorized_time = time.perf_counter() - start
+
+        identical = (json.dumps(report, indent=4, ensure_ascii=False) ==
+                     json.dumps(expected, indent=4, ensure_ascii=False))
+        print(f"{n_rows:>10} {loop_time:>9.3f}s {vectorized_time:>10.3f}s {loop_time / vectorized_time:>7.0f}x  "
+              f"{'identical' if identical else 'DIFFERENT'}")
+        if not identical:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
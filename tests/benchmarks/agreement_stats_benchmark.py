@@ -0,0 +1,119 @@
+"""Compare incremental agreement statistics with a full recompute
+
+Builds the agreement statistics of a synthetic annotated corpus, then
+applies daily batches of annotation work (new rows, relabeled rows and a
+few deleted ones) and times folding each batch into the statistics against
+recomputing the report from all rows. The report built from the statistics
+and the disagreements file saved with them have to be exactly the ones of
+the full recompute, the benchmark exits with status 1 when they are not.
+
+Usage:
+    python tests/benchmarks/agreement_stats_benchmark.py --sizes 10000 100000 1000000 --batch 500
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, "..", "..", "src"))
+
+import corpus
+from agreement_analysis import preprocess_annotations, compute_agreement
+from agreement_metrics import compute_agreement_metrics
+from agreement_stats import AgreementStats, stats_path, disagreements_path
+
+ANNOTATORS = ['X1', 'X2', 'X3', 'X4']
+
+
+def make_batch(df, batch, rng):
+    """Apply a day of annotation work: new rows, relabeled rows and a few deleted ones"""
+    relabeled = rng.choice(len(df), batch // 2, replace=False)
+    df = df.copy()
+    df.loc[df.index[relabeled], 'Annotation_2'] = np.array(['-1', '0', '1'], dtype=object)[
+        rng.integers(0, 3, len(relabeled))]
+    df = df.drop(index=df.index[rng.choice(len(df), max(batch // 50, 1), replace=False)])
+    new = next(corpus.make_annotated(batch, seed=int(rng.integers(1 << 30))))
+    new['ID'] = np.arange(batch) + int(df['ID'].max()) + 1
+    return pd.concat([df, new], ignore_index=True)
+
+
+def annotator_ids(df):
+    """Assign annotator pairs by URL, as the assignment file does"""
+    codes = pd.util.hash_pandas_object(df['URL'], index=False).to_numpy() % len(ANNOTATORS)
+    first = np.array(ANNOTATORS, dtype=object)[codes]
+    second = np.array(ANNOTATORS, dtype=object)[(codes + 1) % len(ANNOTATORS)]
+    return pd.DataFrame({'Annotation_1': first, 'Annotation_2': second}, index=df.index)
+
+
+def full_report(df, ids):
+    """Full recompute: the report without the disagreements, and the disagreements by ID"""
+    report = compute_agreement(df)
+    report['chance_corrected'] = compute_agreement_metrics(df, ids)
+    disagreements = report.pop('disagreements')
+    keys = df.loc[df['Annotation_1_value'].notna() & df['Annotation_2_value'].notna()
+                  & (df['Annotation_1_value'] != df['Annotation_2_value']), 'ID'].tolist()
+    disagreements = [{'ID': key, **case} for key, case in sorted(zip(keys, disagreements), key=lambda item: item[0])]
+    return report, disagreements
+
+
+def canonical(report):
+    return json.loads(json.dumps(report, ensure_ascii=False))
+
+
+def read_disagreements(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Incremental agreement statistics benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--batch', type=int, default=500, help='Rows added and relabeled per day')
+    parser.add_argument('--days', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(corpus.SEED)
+    report_file = os.path.join(tempfile.mkdtemp(), 'analysis_report.json')
+    path, disagreements_file = stats_path(report_file), disagreements_path(report_file)
+    print(f"{'rows':>10} {'day':>4} {'full':>9} {'fold':>9} {'report':>9} {'speedup':>8}  result")
+    failed = False
+    for n_rows in args.sizes:
+        raw = pd.concat(corpus.make_annotated(n_rows), ignore_index=True)
+        df = preprocess_annotations(raw.copy())
+        stats = AgreementStats('annotated_data.csv')
+        stats.update(df, annotator_ids(df))
+        stats.save(path, disagreements_file)
+        for day in range(1, args.days + 1):
+            raw = make_batch(raw, args.batch, rng)
+            df = preprocess_annotations(raw.copy())
+            ids = annotator_ids(df)
+
+            start = time.perf_counter()
+            expected, expected_disagreements = full_report(df, ids)
+            full_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            stats = AgreementStats.load(path, 'annotated_data.csv', disagreements_file)
+            stats.update(df, ids)
+            stats.save(path, disagreements_file)
+            fold_time = time.perf_counter() - start
+            start = time.perf_counter()
+            report = stats.report()
+            report_time = time.perf_counter() - start
+
+            identical = canonical(report) == canonical(expected) and \
+                read_disagreements(disagreements_file) == canonical(expected_disagreements)
+            failed |= not identical
+            print(f"{n_rows:>10} {day:>4} {full_time:>8.3f}s {fold_time:>8.3f}s {report_time:>8.3f}s "
+                  f"{full_time / (fold_time + report_time):>7.1f}x  {'identical' if identical else 'DIFFERENT'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Load test the headline search API
+
+Sends a mix of /search and /filter requests from concurrent clients, each
+with its own keep-alive session, and reports p50/p99 latency and requests per
+second per route. By default it indexes a synthetic table of headlines into a
+temporary database and starts a local instance on it with refreshing turned
+off. Pass --url to test an instance that is already running instead.
+
+Usage:
+    python tests/benchmarks/api_benchmark.py --rows 100000 --clients 8 --duration 10
+    python tests/benchmarks/api_benchmark.py --url http://127.0.0.1:8000
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import requests
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCHMARK_DIR, "..", "..", "src")
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+from search_benchmark import make_headlines
+
+REQUESTS = [
+    ('/search', {'q': 'fed'}),
+    ('/search', {'q': 'inflation report'}),
+    ('/search', {'q': 'treasury yields', 'sentiment': [1]}),
+    ('/search', {'q': 'hous', 'category': 'U.S. Markets', 'start_date': '2024-06-01', 'end_date': '2024-08-31'}),
+    ('/search', {'q': 'powell cut', 'page': 3}),
+    ('/filter', {'sentiment': [-1], 'start_date': '2024-12-01'}),
+    ('/filter', {'category': 'U.S. Economy', 'start_date': '2024-03-01', 'end_date': '2024-03-31'})
+]
+
+
+def build_index(path, rows):
+    from search_store import SearchStore
+    data = make_headlines(rows).rename(columns={'annotation_1': 'Annotation_1', 'annotation_2': 'Annotation_2'})
+    store = SearchStore(path)
+    for start in range(0, rows, 100000):
+        store.add_articles(data.iloc[start:start + 100000])
+    # Like the real archive, only a small share of the articles is annotated
+    store.set_annotations(data.iloc[::50])
+
+
+def start_server(index_path, port):
+    env = dict(os.environ, WSJ_SEARCH_INDEX=index_path, WSJ_SEARCH_REFRESH_SECONDS='0')
+    server = subprocess.Popen([sys.executable, os.path.join(SRC_DIR, 'main.py'), '--mode', 'serve',
+                               '--port', str(port)], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}'
+    for _ in range(100):
+        try:
+            requests.get(f'{url}/filter', timeout=1)
+            return server, url
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError('Search API did not start')
+
+
+def run_client(url, deadline, offset, results):
+    session = requests.Session()
+    i = offset
+    while time.perf_counter() < deadline:
+        route, params = REQUESTS[i % len(REQUESTS)]
+        start = time.perf_counter()
+        response = session.get(url + route, params=params, timeout=30)
+        results.append((route, time.perf_counter() - start, response.status_code == 200))
+        i += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Search API load test')
+    parser.add_argument('--url', help='Base URL of a running instance, a local one is started when omitted')
+    parser.add_argument('--rows', type=int, default=100000, help='Synthetic headlines for the local instance')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds of load')
+    args = parser.parse_args()
+
+    directory = server = None
+    try:
+        url = args.url
+        if url is None:
+            directory = tempfile.mkdtemp(prefix='api_benchmark_')
+            index_path = os.path.join(directory, 'headlines.sqlite')
+            start = time.perf_counter()
+            build_index(index_path, args.rows)
+            print(f"{args.rows} headlines indexed in {time.perf_counter() - start:.1f}s")
+            server, url = start_server(index_path, args.port)
+
+        # One untimed pass warms up the connections and the page cache
+        for route, params in REQUESTS:
+            requests.get(url + route, params=params, timeout=30).raise_for_status()
+
+        results = []
+        deadline = time.perf_counter() + args.duration
+        clients = [threading.Thread(target=run_client, args=(url, deadline, i, results))
+                   for i in range(args.clients)]
+        start = time.perf_counter()
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        elapsed = time.perf_counter() - start
+
+        print(f"{args.clients} clients for {elapsed:.1f}s against {url}")
+        print(f"{'route':<8} {'requests':>9} {'errors':>7} {'p50 (ms)':>9} {'p99 (ms)':>9} {'req/s':>8}")
+        for route in sorted({route for route, _ in REQUESTS}) + ['all']:
+            timings = np.array([seconds for name, seconds, _ in results if route in ('all', name)]) * 1000
+            errors = sum(not ok for name, _, ok in results if route in ('all', name))
+            print(f"{route:<8} {len(timings):>9} {errors:>7} {np.percentile(timings, 50):>9.1f} "
+                  f"{np.percentile(timings, 99):>9.1f} {len(timings) / elapsed:>8.0f}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        if directory is not None:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Local stand-in for the WSJ archive used by the scraper benchmarks
+
+Serves recorded-style archive pages in the current WSJ markup from memory,
+with an optional per-response latency to mimic the real site.
+"""
+import html
+import random
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+CATEGORIES = ["U.S. Economy", "U.S. Markets", "Politics", "Tech", "World", "Opinion"]
+WORDS = ["Fed", "Stocks", "Rates", "Inflation", "Jobs", "Tariffs", "Housing", "Dollar",
+         "Rally", "Slump", "Growth", "Consumers", "Bonds", "Oil", "Earnings", "Recession"]
+
+
+def render_archive_page(headlines, max_pages):
+    """Render an archive page from (title, category, url) tuples"""
+    items = []
+    for title, category, url in headlines:
+        items.append(
+            '<article class="WSJTheme--story--XB4V2mLz">'
+            f'<div class="WSJTheme--articleType--34Gt-vdG">{html.escape(category)}</div>'
+            f'<h2 class="WSJTheme--headline--unZqjb45"><a href="{html.escape(url)}">{html.escape(title)}</a></h2>'
+            '<p class="WSJTheme--summary--lmOXEsbN">Summary text for the article.</p>'
+            '</article>'
+        )
+    pages = "".join(f'<a href="?page={i}">{i}</a>' for i in range(1, max_pages + 1))
+    return (
+        '<!DOCTYPE html><html><head><title>News Archive</title></head><body>'
+        '<main><ol class="WSJTheme--list--XB4V2mLz">' + "".join(items) + '</ol>'
+        f'<div class="WSJTheme--pagination--1jWoU_y9">{pages}<a href="#">Next Page</a></div>'
+        '</main></body></html>'
+    )
+
+
+def build_archive(start_date, days, pages_per_day=3, headlines_per_page=20, seed=523):
+    """Build an in-memory archive mapping (YYYY/MM/DD, page) to page HTML"""
+    rng = random.Random(seed)
+    archive = {}
+    start = datetime.strptime(start_date, '%Y-%m-%d')
+    for day in range(days):
+        date_str = (start + timedelta(days=day)).strftime('%Y/%m/%d')
+        max_pages = rng.randint(1, pages_per_day)
+        for page in range(1, max_pages + 1):
+            headlines = []
+            for i in range(headlines_per_page):
+                title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 9)))
+                slug = f"{day}-{page}-{i}-{rng.getrandbits(32):08x}"
+                headlines.append((title, rng.choice(CATEGORIES), f"https://www.wsj.com/articles/{slug}"))
+            archive[(date_str, page)] = render_archive_page(headlines, max_pages)
+    return archive
+
+
+class ArchiveServer:
+    """Threaded HTTP server serving an in-memory archive on localhost
+
+    With max_rps set, requests above that rate get a 429 with Retry-After,
+    like the real site does under load.
+    """
+
+    def __init__(self, archive, latency=0.05, max_rps=None, retry_after=1):
+        self.archive = archive
+        self.latency = latency
+        self.max_rps = max_rps
+        self.retry_after = retry_after
+        self.request_count = 0
+        self.throttled_count = 0
+        self._recent = []
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # Headers and body go out in separate writes, avoid delayed-ACK stalls on keep-alive
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def do_GET(self):
+                server.request_count += 1
+                if server.is_over_limit():
+                    server.throttled_count += 1
+                    self.send_response(429)
+                    self.send_header("Retry-After", str(server.retry_after))
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                time.sleep(server.latency)
+                parsed = urlparse(self.path)
+                date_str = parsed.path.rsplit("/archive/", 1)[-1]
+                page = int(parse_qs(parsed.query).get("page", ["1"])[0])
+                body = server.archive.get((date_str, page), render_archive_page([], 1)).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url_template = f"http://127.0.0.1:{self.httpd.server_address[1]}/news/archive/{{date}}?page={{page}}"
+
+    def is_over_limit(self):
+        """Check the request rate over the last second against max_rps"""
+        if self.max_rps is None:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            self._recent = [t for t in self._recent if now - t < 1.0]
+            if len(self._recent) >= self.max_rps:
+                return True
+            self._recent.append(now)
+            return False
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,172 @@
+"""Seeded generator of a synthetic WSJ corpus for the benchmarks
+
+Generates, from 1k to 10M rows, the three kinds of files the pipeline reads:
+
+- archive pages in the current WSJ markup, as the scraper downloads them
+- raw article CSV files, as the scraper writes them
+- annotated CSV files with the label formats annotators actually type,
+  such as "1: positive", "-1" and "0: neutral read"
+
+The same seed always gives the same corpus. Rows are generated in chunks,
+so writing 10M rows does not need them all in memory.
+
+Usage:
+    python tests/benchmarks/corpus.py --rows 1000000 --output /tmp/wsj_corpus
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src"))
+
+from archive_server import render_archive_page
+from config import RAW_COLUMNS
+
+SEED = 523
+CHUNK_SIZE = 1000000
+
+# Archive pages list other sections too, the scraper keeps these two
+KEPT_CATEGORIES = ['U.S. Economy', 'U.S. Markets']
+OTHER_CATEGORIES = ['Politics', 'Tech', 'World', 'Opinion']
+
+WORDS = np.array(("Fed inflation rates jobs report stocks markets treasury yields housing sales consumer spending "
+                  "tariffs trade deficit oil prices dollar rally slump earnings banks growth recession investors "
+                  "bonds wall street economy labor wages gdp china europe retail factories mortgage credit").split(),
+                 dtype=object)
+
+LABEL_FORMATS = {
+    -1: ["-1", "-1: negative", "-1: negative read", "-1 negative"],
+    0: ["0", "0: neutral", "0: neutral read"],
+    1: ["1", "1: positive", "1: positive read"]
+}
+
+
+def _chunks(n_rows, chunk_size=CHUNK_SIZE):
+    for start in range(0, n_rows, chunk_size):
+        yield start, min(chunk_size, n_rows - start)
+
+
+def _titles(rng, n_rows):
+    """Headlines of 5 to 10 words"""
+    picks = WORDS[rng.integers(0, len(WORDS), (n_rows, 10))]
+    lengths = rng.integers(5, 11, n_rows)
+    return [' '.join(row[:length]).capitalize() for row, length in zip(picks, lengths)]
+
+
+def make_articles(n_rows, seed=SEED, start_date='2015-01-01', days=3650, categories=KEPT_CATEGORIES):
+    """Generate articles, in chunks of at most CHUNK_SIZE rows sorted by date
+
+    Args:
+        n_rows (int): Number of articles
+        seed (int): Random seed
+        start_date (str): First article date (YYYY-MM-DD)
+        days (int): Number of days the articles are spread over
+        categories (list): Categories to draw from
+
+    Yields:
+        pd.DataFrame: Chunks with the raw columns Date, Page, Title, Category and URL
+    """
+    rng = np.random.default_rng(seed)
+    for start, size in _chunks(n_rows):
+        # Each chunk covers its share of the days, so the whole corpus is sorted by date
+        first_day = days * start // n_rows
+        last_day = max(days * (start + size) // n_rows, first_day + 1)
+        dates = pd.Timestamp(start_date) + pd.to_timedelta(np.sort(rng.integers(first_day, last_day, size)), unit='D')
+        ids = np.arange(start, start + size)
+        yield pd.DataFrame({
+            'Date': dates.strftime('%Y-%m-%d'),
+            'Page': rng.integers(1, 4, size),
+            'Title': _titles(rng, size),
+            'Category': np.array(categories, dtype=object)[rng.integers(0, len(categories), size)],
+            'URL': [f'https://www.wsj.com/articles/article-{i:08d}-{code:08x}'
+                    for i, code in zip(ids, rng.integers(0, 2 ** 32, size))]
+        })
+
+
+def archive_pages(n_rows, seed=SEED, headlines_per_page=50):
+    """Generate archive pages listing n_rows headlines in the current WSJ markup
+
+    A third of the headlines are from sections the scraper skips.
+
+    Yields:
+        tuple: (date as YYYY/MM/DD, page number, page HTML)
+    """
+    for chunk in make_articles(n_rows, seed, categories=KEPT_CATEGORIES * 2 + OTHER_CATEGORIES):
+        for start in range(0, len(chunk), headlines_per_page):
+            page = chunk.iloc[start:start + headlines_per_page]
+            headlines = list(zip(page['Title'], page['Category'], page['URL']))
+            yield page['Date'].iloc[0].replace('-', '/'), int(page['Page'].iloc[0]), render_archive_page(headlines, 3)
+
+
+def make_annotated(n_rows, seed=SEED, agreement=0.8, missing=0.005):
+    """Generate annotated articles in the format of the annotated CSV file
+
+    The labels are typed in the mixed formats of LABEL_FORMATS, the second
+    annotator agrees with the first about `agreement` of the time and a few
+    annotations are missing.
+
+    Yields:
+        pd.DataFrame: Chunks with ID, the raw columns but Page, Annotation_1 and Annotation_2
+    """
+    rng = np.random.default_rng(seed + 1)
+    for (start, size), articles in zip(_chunks(n_rows), make_articles(n_rows, seed)):
+        first = rng.integers(-1, 2, size)
+        second = np.where(rng.random(size) < agreement, first, rng.integers(-1, 2, size))
+        columns = {}
+        for name, labels in (('Annotation_1', first), ('Annotation_2', second)):
+            typed = np.empty(size, dtype=object)
+            for label, formats in LABEL_FORMATS.items():
+                mask = labels == label
+                typed[mask] = np.array(formats, dtype=object)[rng.integers(0, len(formats), mask.sum())]
+            typed[rng.random(size) < missing] = None
+            columns[name] = typed
+        yield articles.drop(columns=['Page']).assign(**columns).assign(
+            ID=np.arange(start + 1, start + size + 1))[['ID', 'Date', 'Title', 'Category', 'URL', 'Annotation_1',
+                                                        'Annotation_2']]
+
+
+def write_csv(chunks, path):
+    """Write generated chunks to one CSV file"""
+    for i, chunk in enumerate(chunks):
+        chunk.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+    return path
+
+
+def write_raw_csv(path, n_rows, seed=SEED):
+    """Write a raw article CSV file as the scraper does"""
+    return write_csv((chunk[RAW_COLUMNS] for chunk in make_articles(n_rows, seed)), path)
+
+
+def write_annotated_csv(path, n_rows, seed=SEED):
+    """Write an annotated CSV file with mixed label formats"""
+    return write_csv(make_annotated(n_rows, seed), path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Synthetic WSJ corpus generator')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--output', required=True, help='Directory to write the corpus to')
+    parser.add_argument('--pages', type=int, default=1000,
+                        help='Maximum number of archive pages to write, they take one file each')
+    args = parser.parse_args()
+
+    os.makedirs(os.path.join(args.output, 'archive'), exist_ok=True)
+    write_raw_csv(os.path.join(args.output, 'raw_articles.csv'), args.rows, args.seed)
+    write_annotated_csv(os.path.join(args.output, 'annotated_data.csv'), args.rows, args.seed)
+    pages = 0
+    for date_str, page, html in archive_pages(args.rows, args.seed):
+        if pages == args.pages:
+            break
+        path = os.path.join(args.output, 'archive', f"{date_str.replace('/', '-')}-{pages:06d}-p{page}.html")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(html)
+        pages += 1
+    print(f"Wrote {args.rows} raw and annotated articles and {pages} archive pages to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Compare loading annotated and raw data from CSV with the typed Parquet datasets
+
+Writes synthetic annotated and raw CSV files into a temporary directory,
+builds their datasets once, then times repeated loads and reports the
+in-memory size of the loaded frames. The CSV loads include the parsing the
+pipeline needs on top of read_csv (dates and annotation labels), so both
+sides return the same information.
+
+Usage:
+    python tests/benchmarks/dataset_benchmark.py --rows 1000000
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src"))
+
+import dataset
+from agreement_benchmark import make_annotations
+
+
+def best_of(function, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def load_annotated_csv(path):
+    df = pd.read_csv(path)
+    df['Date'] = pd.to_datetime(df['Date'], format='mixed')
+    for column in dataset.ANNOTATION_COLUMNS:
+        df[f'{column}_value'] = df[column].astype(str).str.extract(r'(-?\d+)', expand=False).astype(float)
+    return df
+
+
+def load_raw_csv(path):
+    df = pd.read_csv(path)
+    df['Date'] = pd.to_datetime(df['Date'], format='mixed')
+    return df
+
+
+def report(name, csv_result, parquet_result):
+    (csv_time, csv_df), (parquet_time, parquet_df) = csv_result, parquet_result
+    csv_mb = csv_df.memory_usage(deep=True).sum() / 1e6
+    parquet_mb = parquet_df.memory_usage(deep=True).sum() / 1e6
+    print(f"{name:<10} csv {csv_time:6.2f}s {csv_mb:8.1f} MB | dataset {parquet_time:6.2f}s {parquet_mb:8.1f} MB | "
+          f"{csv_time / parquet_time:4.1f}x faster, {csv_mb / parquet_mb:4.1f}x less memory")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Dataset layer benchmark')
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='dataset_benchmark_')
+    try:
+        rng = np.random.default_rng(523)
+        dates = pd.DatetimeIndex(np.sort(rng.choice(pd.date_range('2021-01-01', '2024-12-31'), args.rows)))
+
+        annotated = make_annotations(args.rows)
+        annotated['Date'] = dates.strftime('%Y-%m-%d')
+        annotated_csv = os.path.join(directory, 'annotated.csv')
+        annotated.to_csv(annotated_csv, index=False)
+
+        raw = annotated[['Date', 'Title', 'Category', 'URL']].assign(
+            Date=dates.strftime('%Y/%m/%d'), Page=rng.integers(1, 6, args.rows))
+        raw_csv = os.path.join(directory, 'raw.csv')
+        raw.to_csv(raw_csv, index=False)
+
+        annotated_path = os.path.join(directory, 'annotated.parquet')
+        dataset.write_dataset(dataset.apply_schema(dataset.split_annotations(annotated), dataset.ANNOTATED_SCHEMA),
+                              annotated_path)
+        raw_path = os.path.join(directory, 'raw.parquet')
+        dataset.write_dataset(dataset.apply_schema(raw, dataset.RAW_SCHEMA), raw_path)
+
+        print(f"{args.rows} rows, best of 3 loads")
+        report('annotated', best_of(lambda: load_annotated_csv(annotated_csv)),
+               best_of(lambda: dataset.read_dataset(annotated_path)))
+        report('raw', best_of(lambda: load_raw_csv(raw_csv)), best_of(lambda: dataset.read_dataset(raw_path)))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
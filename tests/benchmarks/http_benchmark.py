@@ -0,0 +1,48 @@
+"""Compare one-off requests.get calls with the pooled keep-alive session
+
+Usage:
+    python tests/benchmarks/http_benchmark.py --requests 200
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+import http_client
+from archive_server import ArchiveServer, build_archive
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pooled session vs per-request connections')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.0, help='Simulated server latency in seconds')
+    args = parser.parse_args()
+
+    archive = build_archive('2025-02-01', 10)
+    pages = list(archive)
+    with ArchiveServer(archive, latency=args.latency) as server:
+        urls = [server.url_template.format(date=date_str, page=page)
+                for date_str, page in (pages[i % len(pages)] for i in range(args.requests))]
+
+        start = time.perf_counter()
+        for url in urls:
+            requests.get(url, timeout=10).text
+        plain_time = time.perf_counter() - start
+        print(f"requests.get per call: {plain_time:.2f}s ({args.requests / plain_time:.0f} req/s)")
+
+        http_client.configure_session(pool_size=1)
+        http_client.timing_stats.reset()
+        start = time.perf_counter()
+        for url in urls:
+            http_client.get(url, timeout=10)
+        pooled_time = time.perf_counter() - start
+        print(f"Pooled session:        {pooled_time:.2f}s ({args.requests / pooled_time:.0f} req/s)")
+        http_client.timing_stats.print_summary()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Benchmark month-sharded labeling across processes
+
+Writes a synthetic raw dataset spread over several years, then labels it
+with an increasing number of labeling processes and reports the throughput,
+speedup and parallel efficiency of each. The speedup can only grow up to
+the number of cores of the machine, which is printed first. The daily
+counts of every run are checked against the single-process run.
+
+Usage:
+    python tests/benchmarks/labeling_benchmark.py --rows 2000000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src"))
+
+import dataset
+import sentiment_model
+from search_benchmark import make_headlines
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Month-sharded labeling benchmark')
+    parser.add_argument('--rows', type=int, default=2000000)
+    parser.add_argument('--years', type=int, default=4, help='Years the synthetic articles are spread over')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='labeling_benchmark_')
+    try:
+        rng = np.random.default_rng(523)
+        training = make_headlines(400, seed=7)
+        model = sentiment_model.SentimentModel.fit(training['Title'], training['annotation_1'].to_numpy())
+        raw = make_headlines(args.rows)[['Date', 'Title', 'Category', 'URL']]
+        raw['Date'] = pd.Timestamp('2021-01-01') + pd.to_timedelta(rng.integers(0, 365 * args.years, args.rows),
+                                                                   unit='D')
+        source = os.path.join(directory, 'raw.parquet')
+        dataset.write_dataset(dataset.apply_schema(raw.sort_values('Date', kind='stable'), dataset.RAW_SCHEMA),
+                              source)
+        months = dataset.dataset_months(source)
+        print(f"{args.rows} headlines in {len(months)} months, {os.cpu_count()} cores")
+
+        print(f"{'processes':>9} {'seconds':>8} {'headlines/s':>12} {'speedup':>8} {'efficiency':>10}")
+        baseline = None
+        for workers in args.workers:
+            output = os.path.join(directory, f'predicted_{workers}.parquet')
+            start = time.perf_counter()
+            counts = sentiment_model.label_dataset(model, source, output, workers=workers)
+            seconds = time.perf_counter() - start
+            if baseline is None:
+                baseline, expected = seconds, counts
+            same = counts.equals(expected)
+            print(f"{workers:>9} {seconds:>8.2f} {args.rows / seconds:>12,.0f} {baseline / seconds:>7.2f}x "
+                  f"{baseline / seconds / workers:>10.0%}{'' if same else '  COUNTS DIFFER'}")
+            shutil.rmtree(output)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
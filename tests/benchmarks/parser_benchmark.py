@@ -0,0 +1,88 @@
+"""Micro-benchmark of the archive page parser backends
+
+Times the original page-1 flow (two html.parser trees plus separate selects)
+against every installed backend over saved archive HTML, and checks that all
+backends extract the same articles.
+
+Usage:
+    python tests/benchmarks/parser_benchmark.py --pages 300
+    python tests/benchmarks/parser_benchmark.py --html-dir path/to/saved/pages
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bs4 import BeautifulSoup
+from archive_server import build_archive
+import archive_parser
+from scraper import parse_article_data
+
+
+def legacy_parse(html, date_str):
+    """The page-1 flow before pluggable backends: one tree for pagination, one for articles"""
+    soup = BeautifulSoup(html, "html.parser")
+    pagination = soup.select(".WSJTheme--pagination--1jWoU_y9 a")
+    max_pages = max([int(a.get_text()) for a in pagination if a.get_text().isdigit()] or [1])
+    soup = BeautifulSoup(html, "html.parser")
+    links = soup.select(".WSJTheme--headline--unZqjb45 a")
+    categories = soup.select(".WSJTheme--articleType--34Gt-vdG")
+    articles = []
+    for i in range(len(links)):
+        category = categories[i].get_text(strip=True) if i < len(categories) else "Unknown"
+        if category in ["U.S. Economy", "U.S. Markets"]:
+            articles.append({
+                'Date': date_str,
+                'Page': 1,
+                'Title': links[i].get_text(strip=True),
+                'Category': category,
+                'URL': links[i]["href"] if "href" in links[i].attrs else "Unknown"
+            })
+    return max_pages, articles
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Archive parser backend benchmark')
+    parser.add_argument('--pages', type=int, default=300, help='Number of generated pages')
+    parser.add_argument('--html-dir', help='Directory of saved archive pages (*.html) to use instead')
+    args = parser.parse_args()
+
+    if args.html_dir:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(args.html_dir, '*.html'))):
+            with open(path, encoding='utf-8') as f:
+                pages.append(f.read())
+    else:
+        pages = list(build_archive('2024-01-01', args.pages, pages_per_day=1).values())
+    total_mb = sum(len(page) for page in pages) / 1e6
+    print(f"Pages: {len(pages)} ({total_mb:.1f} MB)")
+
+    start = time.perf_counter()
+    expected = [legacy_parse(page, '2024/01/01') for page in pages]
+    legacy_time = time.perf_counter() - start
+    print(f"{'legacy bs4 x2':<14} {legacy_time:7.3f}s  {len(pages) / legacy_time:8.0f} pages/s")
+
+    failed = False
+    for backend in archive_parser.available_backends():
+        parse = archive_parser.get_parser(backend)
+        start = time.perf_counter()
+        results = []
+        for page in pages:
+            parsed = parse(page)
+            results.append((parsed.max_pages, parse_article_data(parsed, '2024/01/01')))
+        elapsed = time.perf_counter() - start
+        matches = results == expected
+        failed = failed or not matches
+        print(f"{backend:<14} {elapsed:7.3f}s  {len(pages) / elapsed:8.0f} pages/s  "
+              f"{legacy_time / elapsed:5.1f}x  {'ok' if matches else 'MISMATCH'}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
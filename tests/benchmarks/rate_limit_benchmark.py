@@ -0,0 +1,54 @@
+"""Run the concurrent crawl against a stand-in server that throttles with 429s
+
+Shows how the adaptive limiter reacts: throttled responses, retries, time spent
+waiting and the rate it settles at, compared with the server's real limit.
+
+Usage:
+    python tests/benchmarks/rate_limit_benchmark.py --days 20 --server-rps 10 --rps 40
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from archive_server import ArchiveServer, build_archive
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Adaptive rate limiter benchmark')
+    parser.add_argument('--start-date', default='2025-02-01')
+    parser.add_argument('--days', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rps', type=float, default=40.0, help='Starting crawl rate')
+    parser.add_argument('--server-rps', type=float, default=10.0, help='Rate above which the server returns 429')
+    args = parser.parse_args()
+
+    archive = build_archive(args.start_date, args.days)
+    with ArchiveServer(archive, latency=0.01, max_rps=args.server_rps) as server:
+        os.environ["WSJ_ARCHIVE_URL"] = server.url_template
+        import scraper
+        from rate_limiter import AdaptiveRateLimiter, CircuitBreaker
+
+        start = datetime.strptime(args.start_date, '%Y-%m-%d')
+        dates = [(start + timedelta(days=i)).strftime('%Y/%m/%d') for i in range(args.days)]
+        limiter = AdaptiveRateLimiter(args.rps)
+        breaker = CircuitBreaker()
+
+        start_time = time.perf_counter()
+        failed = []
+        for _, _, failed_urls in scraper.crawl_concurrent(dates, args.workers, args.rps, None, limiter, breaker):
+            failed.extend(failed_urls)
+        elapsed = time.perf_counter() - start_time
+
+        print(f"\nCrawled {args.days} days in {elapsed:.1f}s, {len(failed)} failed pages")
+        print(f"Server: {server.request_count} requests, {server.throttled_count} answered with 429")
+        limiter.print_summary()
+        print(f"Circuit breaker state: {breaker.state}, opened {breaker.opened} times")
+
+
+if __name__ == "__main__":
+    main()
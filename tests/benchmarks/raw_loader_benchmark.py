@@ -0,0 +1,101 @@
+"""Benchmark loading a one-month sample out of a multi-year raw archive
+
+Writes one raw file per year (CSV, plus the last year as a Parquet directory)
+with overlapping URLs between neighbouring files into a temporary raw data
+directory, then compares parsing every file in full with the scanning
+loader, which skips files outside the date range and reads only the needed
+columns. The loaded articles are checked against a full read filtered in pandas.
+
+Usage:
+    python tests/benchmarks/raw_loader_benchmark.py --years 4 --rows-per-year 300000
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src"))
+
+import raw_store
+from article_writer import ArticleWriter
+
+
+def write_archive(raw_dir, years, rows_per_year, seed=523):
+    """Write one raw file per year, repeating the last days of each year in the next file"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for offset, year in enumerate(range(2025 - years, 2025)):
+        days = pd.date_range(f'{year}-01-01', f'{year}-12-31')
+        dates = np.sort(rng.choice(days, rows_per_year))
+        ids = np.arange(rows_per_year) + offset * rows_per_year
+        frames.append(pd.DataFrame({
+            'Date': pd.DatetimeIndex(dates).strftime('%Y/%m/%d'),
+            'Page': rng.integers(1, 6, rows_per_year),
+            'Title': [f'Headline {i} about the economy and markets' for i in ids],
+            'Category': np.where(rng.random(rows_per_year) < 0.5, 'U.S. Economy', 'U.S. Markets'),
+            'URL': [f'https://www.wsj.com/economy/article-{i}' for i in ids]
+        }))
+
+    paths = []
+    for index, frame in enumerate(frames):
+        # Files overlap like crawls whose date ranges were re-run
+        if index > 0:
+            frame = pd.concat([frames[index - 1].tail(1000), frame], ignore_index=True)
+        first, last = frame['Date'].iloc[0].replace('/', ''), frame['Date'].iloc[-1].replace('/', '')
+        if index == len(frames) - 1:
+            path = os.path.join(raw_dir, f'wsj_US_econ_articles_{first}_{last}.parquet')
+            with ArticleWriter(path, batch_size=100000) as writer:
+                writer.write(frame.to_dict('records'))
+        else:
+            path = os.path.join(raw_dir, f'wsj_US_econ_articles_{first}_{last}.csv')
+            frame.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Raw loader benchmark')
+    parser.add_argument('--years', type=int, default=4)
+    parser.add_argument('--rows-per-year', type=int, default=300000)
+    parser.add_argument('--month', default='2023-03', help='Month to load (YYYY-MM)')
+    args = parser.parse_args()
+
+    raw_dir = tempfile.mkdtemp(prefix='raw_loader_benchmark_')
+    raw_store.RAW_DATA_DIR = raw_dir
+    raw_store.RAW_STORE_DIR = os.path.join(raw_dir, 'store')
+    try:
+        paths = write_archive(raw_dir, args.years, args.rows_per_year)
+        start_date = f'{args.month}-01'
+        end_date = (pd.Timestamp(start_date) + pd.offsets.MonthEnd(0)).strftime('%Y-%m-%d')
+        categories = ['U.S. Markets']
+
+        start = time.perf_counter()
+        full = pd.concat([raw_store.read_raw_file(path) for path in paths], ignore_index=True)
+        full = full.drop_duplicates(subset='URL', keep='first')
+        dates = pd.to_datetime(full['Date'], format='mixed')
+        expected = full[(dates >= start_date) & (dates <= end_date) & full['Category'].isin(categories)]
+        full_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        scanned = raw_store.load_raw_articles(start_date, end_date, categories)
+        scan_time = time.perf_counter() - start
+
+        matches = (scanned['URL'].tolist() == expected['URL'].tolist() and
+                   scanned['Date'].tolist() == expected['Date'].tolist())
+        print(f"{args.years} yearly files, {len(full)} unique articles, {len(expected)} in {args.month} ({categories[0]})")
+        print(f"full read + filter: {full_time:.2f}s")
+        print(f"scanning loader:    {scan_time:.2f}s ({full_time / scan_time:.1f}x), "
+              f"{'same articles' if matches else 'DIFFERENT articles'}")
+        if not matches:
+            sys.exit(1)
+    finally:
+        shutil.rmtree(raw_dir)
+
+
+if __name__ == "__main__":
+    main()
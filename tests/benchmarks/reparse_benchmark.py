@@ -0,0 +1,52 @@
+"""Time an offline reparse of cached archive pages
+
+Fills a temporary HTML cache with recorded-style archive pages and rebuilds
+the articles from it without network access, as --mode reparse does.
+
+Usage:
+    python tests/benchmarks/reparse_benchmark.py --days 420
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from archive_server import build_archive, render_archive_page
+import html_cache
+import scraper
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline reparse benchmark')
+    parser.add_argument('--start-date', default='2024-01-01')
+    parser.add_argument('--days', type=int, default=420)
+    args = parser.parse_args()
+
+    archive = build_archive(args.start_date, args.days)
+    start = datetime.strptime(args.start_date, '%Y-%m-%d')
+    dates = [(start + timedelta(days=i)).strftime('%Y/%m/%d') for i in range(args.days)]
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = html_cache.configure_cache(offline=True, cache_dir=cache_dir)
+        for date_str in dates:
+            page = 1
+            while (date_str, page) in archive:
+                cache.put(scraper.archive_url(date_str, page), archive[(date_str, page)])
+                page += 1
+            cache.put(scraper.archive_url(date_str, page), render_archive_page([], 1))
+        print(f"Cached {len(cache.urls())} pages, {cache.total_bytes() / 1e6:.1f} MB compressed")
+
+        start_time = time.perf_counter()
+        articles = [article for _, day_articles, _ in scraper.crawl_serial(dates) for article in day_articles]
+        elapsed = time.perf_counter() - start_time
+        print(f"Reparsed {args.days} days in {elapsed:.2f}s ({len(articles)} articles)")
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Benchmark the streaming samplers against loading the whole archive
+
+Generates a synthetic archive chunk by chunk (never held in memory as a
+whole by the streaming samplers) and reports time and peak memory of
+reservoir and stratified sampling, next to concatenating every chunk and
+calling DataFrame.sample. Each sampler runs in its own process so peak RSS
+is comparable, and runs twice to check that the same seed gives the same sample.
+
+Usage:
+    python tests/benchmarks/sampling_benchmark.py --rows 5000000 --samples 200
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src"))
+
+import sampling
+from config import RANDOM_SEED
+
+
+def archive_chunks(rows, chunk_size=100000, seed=523):
+    """Yield a synthetic multi-year archive in date order"""
+    rng = np.random.default_rng(seed)
+    days = pd.date_range('2015-01-01', '2024-12-31')
+    positions = np.linspace(0, len(days) - 1, rows).astype(int)
+    for start in range(0, rows, chunk_size):
+        ids = np.arange(start, min(rows, start + chunk_size))
+        yield pd.DataFrame({
+            'Date': days[positions[ids]],
+            'Title': pd.Series(ids).map('Headline {}'.format).to_numpy(),
+            'Category': np.where(rng.random(len(ids)) < 0.7, 'U.S. Economy', 'U.S. Markets'),
+            'URL': pd.Series(ids).map('https://www.wsj.com/articles/{}'.format).to_numpy()
+        })
+
+
+SAMPLERS = {
+    'full': lambda rows, n: pd.concat(archive_chunks(rows), ignore_index=True).sample(n=n, random_state=RANDOM_SEED),
+    'reservoir': lambda rows, n: sampling.reservoir_sample(archive_chunks(rows), n),
+    'stratified': lambda rows, n: sampling.stratified_sample(lambda columns: archive_chunks(rows), n)
+}
+
+
+def run_sampler(name, rows, n):
+    """Run one sampler twice in this process and print its measurements"""
+    start = time.perf_counter()
+    sample = SAMPLERS[name](rows, n)
+    elapsed = time.perf_counter() - start
+    same = sample['URL'].tolist() == SAMPLERS[name](rows, n)['URL'].tolist()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    label = 'concat + DataFrame.sample' if name == 'full' else name
+    print(f"{label:<26} {elapsed:6.2f}s  peak RSS {peak:7.0f} MB  {len(sample)} rows, "
+          f"{'deterministic' if same else 'NOT deterministic'}", flush=True)
+    return same
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sampling benchmark')
+    parser.add_argument('--rows', type=int, default=5000000)
+    parser.add_argument('--samples', type=int, default=200)
+    parser.add_argument('--sampler', choices=list(SAMPLERS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.sampler:
+        sys.exit(0 if run_sampler(args.sampler, args.rows, args.samples) else 1)
+
+    print(f"{args.rows} rows, {args.samples} samples")
+    for name in SAMPLERS:
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--sampler', name,
+                        '--rows', str(args.rows), '--samples', str(args.samples)], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Compare the serial and concurrent archive crawls against a local stand-in server
+
+Usage:
+    python tests/benchmarks/scraper_benchmark.py --days 5 --workers 8 --rps 50
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from archive_server import ArchiveServer, build_archive
+
+
+def collect(crawl):
+    """Flatten a crawl generator into the rows the scraper writes to CSV"""
+    rows = []
+    failed = []
+    for _, articles, failed_urls in crawl:
+        rows.extend(articles)
+        failed.extend(failed_urls)
+    return rows, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serial vs concurrent crawl benchmark')
+    parser.add_argument('--start-date', default='2025-02-01')
+    parser.add_argument('--days', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rps', type=float, default=50.0)
+    parser.add_argument('--latency', type=float, default=0.05, help='Simulated server latency in seconds')
+    parser.add_argument('--skip-serial', action='store_true', help='Only time the concurrent crawl')
+    args = parser.parse_args()
+
+    archive = build_archive(args.start_date, args.days)
+    with ArchiveServer(archive, latency=args.latency) as server:
+        os.environ["WSJ_ARCHIVE_URL"] = server.url_template
+        import scraper
+
+        start = datetime.strptime(args.start_date, '%Y-%m-%d')
+        dates = [(start + timedelta(days=i)).strftime('%Y/%m/%d') for i in range(args.days)]
+        print(f"Archive: {args.days} days, {len(archive)} pages")
+
+        start_time = time.perf_counter()
+        concurrent_rows, concurrent_failed = collect(scraper.crawl_concurrent(dates, args.workers, args.rps))
+        concurrent_time = time.perf_counter() - start_time
+        print(f"Concurrent: {concurrent_time:.2f}s, {len(concurrent_rows)} articles, {server.request_count} requests")
+
+        if args.skip_serial:
+            return
+
+        server.request_count = 0
+        start_time = time.perf_counter()
+        serial_rows, serial_failed = collect(scraper.crawl_serial(dates))
+        serial_time = time.perf_counter() - start_time
+        print(f"Serial:     {serial_time:.2f}s, {len(serial_rows)} articles, {server.request_count} requests")
+
+        print(f"Speedup: {serial_time / concurrent_time:.1f}x")
+        if serial_rows != concurrent_rows or serial_failed != concurrent_failed:
+            print("ERROR: concurrent crawl output differs from the serial crawl")
+            sys.exit(1)
+        print("Concurrent output matches the serial output.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Benchmark the headline search index against the data browser's full-table scan
+
+Builds a synthetic table of headlines with annotations, times building the
+inverted index, then measures the latency of typical as-you-type queries
+(one page of row ids each) next to the original
+astype(str).str.lower().str.contains scan over every column. Results are
+checked against a plain Python token-prefix search on a smaller table.
+
+Usage:
+    python tests/benchmarks/search_benchmark.py --rows 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src"))
+
+from search_index import HeadlineIndex, tokenize
+
+WORDS = ("fed inflation rates jobs report stocks markets treasury yields housing sales consumer spending "
+         "growth recession tariffs china oil prices wall street earnings banks labor wages gdp dollar "
+         "economy powell cut hike slows rises falls record investors bond mortgage retail").split()
+
+QUERIES = [
+    ('f', None), ('fed', None), ('fed rate', None), ('inflation report', None), ('u.s. mark', None),
+    ('treasury yields', [1]), ('', [-1]), ('housing sales', [0, 1]), ('zzz', None)
+]
+
+
+def make_headlines(n_rows, seed=523):
+    rng = np.random.default_rng(seed)
+    words = np.array(WORDS, dtype=object)
+    picks = words[rng.integers(0, len(words), (n_rows, 7))]
+    titles = pd.Series([' '.join(row).capitalize() for row in picks])
+    slugs = pd.Series(['-'.join(row[:4]) for row in picks])
+    return pd.DataFrame({
+        'Date': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 400, n_rows), unit='D'),
+        'Title': titles,
+        'Category': np.where(rng.random(n_rows) < 0.5, 'U.S. Economy', 'U.S. Markets'),
+        'URL': 'https://www.wsj.com/economy/' + slugs + '-' + pd.Series(rng.integers(0, 2 ** 32, n_rows)).map('{:08x}'.format),
+        'annotation_1': rng.integers(-1, 2, n_rows).astype('int8'),
+        'annotation_2': rng.integers(-1, 2, n_rows).astype('int8')
+    })
+
+
+def naive_search(data, query, sentiments):
+    terms = tokenize(query)
+    matches = []
+    for row in data.itertuples(index=False):
+        tokens = set(tokenize(f"{row.Title} {row.Category} {row.URL}"))
+        if all(any(token.startswith(term) for token in tokens) for term in terms) and \
+                (not sentiments or row.annotation_1 in sentiments or row.annotation_2 in sentiments):
+            matches.append(row.URL)
+    return matches
+
+
+def scan_search(data, query):
+    """The data browser's original search over every column"""
+    mask = data.apply(lambda col: col.astype(str).str.lower().str.contains(query.lower(), na=False))
+    return data[mask.any(axis=1)].iloc[:10]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headline search benchmark')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    small = make_headlines(3000)
+    small_index = HeadlineIndex(small)
+    for query, sentiments in QUERIES:
+        found = small['URL'].iloc[small_index.match(query, sentiments) if query or sentiments else slice(None)]
+        if found.tolist() != naive_search(small, query, sentiments):
+            print(f"Mismatch for query {query!r} {sentiments}")
+            sys.exit(1)
+    print("Index results match a plain token-prefix search")
+
+    data = make_headlines(args.rows)
+    start = time.perf_counter()
+    index = HeadlineIndex(data)
+    print(f"{args.rows} headlines, index built in {time.perf_counter() - start:.2f}s "
+          f"({len(index.vocabulary)} tokens, {index.rows.nbytes / 1e6:.0f} MB of postings)")
+
+    print(f"{'query':<22} {'filter':<8} {'matches':>8} {'index (ms)':>11} {'cached (ms)':>12}")
+    for query, sentiments in QUERIES:
+        timings = []
+        for _ in range(args.repeat):
+            index._match.cache_clear()
+            start = time.perf_counter()
+            ids, total = index.search(query, sentiments, page=1, page_size=10)
+            timings.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        index.search(query, sentiments, page=2, page_size=10)
+        cached = (time.perf_counter() - start) * 1000
+        print(f"{query!r:<22} {str(sentiments or ''):<8} {total:>8} {np.median(timings):>11.2f} {cached:>12.3f}")
+
+    start = time.perf_counter()
+    scan_search(data, 'fed rate')
+    print(f"full-table scan for 'fed rate': {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Benchmark the baseline sentiment classifier on a large synthetic archive
+
+Trains on the annotated data (or on synthetic labels when there is none),
+times saving and loading the model artifact, then labels synthetic headlines
+in batches and reports headlines per second on one core. A plain per-headline
+Python loop over the same model gives the reference throughput and checks
+the vectorized predictions.
+
+Usage:
+    python tests/benchmarks/sentiment_benchmark.py --rows 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src"))
+
+import sentiment_model
+from config import ANNOTATED_DATA_FILE, RAW_READ_CHUNK_SIZE
+from search_benchmark import make_headlines
+
+
+def loop_predict(model, titles):
+    """Label headlines one at a time with a Python loop over their tokens"""
+    n_buckets = np.uint64(len(model.weights))
+    labels = []
+    for title in titles:
+        tokens = [token.strip(sentiment_model.TOKEN_PUNCTUATION) for token in str(title).lower().split()]
+        tokens = [token for token in tokens if token]
+        hashes = pd.util.hash_array(np.array(tokens, dtype=object)) if tokens else np.empty(0, dtype=np.uint64)
+        scores = model.bias.astype(np.float64).copy()
+        gram = hashes
+        for n in range(1, model.ngrams + 1):
+            if n > 1:
+                gram = gram[:-1] * sentiment_model._NGRAM_MULTIPLIER + hashes[n - 1:]
+            for value in gram:
+                scores += model.weights[int(value % n_buckets)]
+        labels.append(sentiment_model.CLASSES[scores.argmax()])
+    return np.array(labels)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sentiment classifier benchmark')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--loop-rows', type=int, default=5000, help='Headlines labeled by the Python loop')
+    args = parser.parse_args()
+
+    if os.path.exists(ANNOTATED_DATA_FILE):
+        titles, labels, _ = sentiment_model.training_data()
+    else:
+        synthetic = make_headlines(400, seed=7)
+        titles, labels = synthetic['Title'], synthetic['annotation_1'].to_numpy()
+    start = time.perf_counter()
+    model = sentiment_model.SentimentModel.fit(titles, labels)
+    print(f"Trained on {len(labels)} annotations in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    path = os.path.join(tempfile.mkdtemp(prefix='sentiment_benchmark_'), 'model.npz')
+    model.save(path)
+    start = time.perf_counter()
+    model = sentiment_model.SentimentModel.load(path)
+    print(f"Model artifact: {os.path.getsize(path) / 1e6:.1f} MB, loaded in {(time.perf_counter() - start) * 1000:.1f} ms")
+    os.remove(path)
+    os.rmdir(os.path.dirname(path))
+
+    headlines = make_headlines(args.rows)['Title']
+    start = time.perf_counter()
+    predicted = [model.predict(headlines.iloc[i:i + RAW_READ_CHUNK_SIZE])[0]
+                 for i in range(0, args.rows, RAW_READ_CHUNK_SIZE)]
+    vectorized = time.perf_counter() - start
+    predicted = np.concatenate(predicted)
+
+    sample = headlines.iloc[:args.loop_rows]
+    start = time.perf_counter()
+    expected = loop_predict(model, sample)
+    loop = time.perf_counter() - start
+    same = np.array_equal(predicted[:args.loop_rows], expected)
+    print(f"vectorized batches of {RAW_READ_CHUNK_SIZE}: {args.rows / vectorized:>11,.0f} headlines/s "
+          f"({args.rows} in {vectorized:.2f}s)")
+    print(f"per-headline Python loop:  {args.loop_rows / loop:>11,.0f} headlines/s, "
+          f"{'same labels' if same else 'DIFFERENT LABELS'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Benchmark the startup of the command line entry point
+
+Runs src/main.py --help and imports the modules of each mode under
+`python -X importtime`, and reports the import time of each and which heavy
+dependencies they pull in. Interpreter startup (site and what it imports)
+is left out of the import times, any Python command pays it.
+
+Exits with status 1 when --help takes longer than --max-ms to import, or
+when --help or a mode imports a heavy dependency it does not use, so it can
+run as a regression check, e.g. in CI or before a release.
+
+Usage:
+    python tests/benchmarks/startup_benchmark.py --runs 5 --max-ms 30
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src")
+
+HEAVY_MODULES = ['pandas', 'numpy', 'pyarrow', 'requests', 'bs4', 'tqdm', 'fastapi', 'uvicorn']
+
+# pandas imports numpy, and pyarrow when it is installed
+PANDAS = {'pandas', 'numpy', 'pyarrow'}
+
+# Module each mode imports when it runs, and the heavy dependencies it may pull in
+MODE_MODULES = {
+    'scrape, incremental, reparse': ('scraper', PANDAS | {'requests', 'bs4', 'tqdm'}),
+    'dataset': ('dataset', PANDAS),
+    'preprocess': ('data_preprocessing', PANDAS),
+    'analyze': ('agreement_analysis', PANDAS),
+    'trend': ('aggregates', PANDAS),
+    'label': ('sentiment_model', PANDAS),
+    # Stages import their modules when they run, so a run with every stage cached stays fast
+    'pipeline': ('pipeline', set()),
+}
+
+
+def import_times(args):
+    """Run Python with -X importtime and get the cumulative import time of each module in microseconds"""
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + args, cwd=SRC_DIR, capture_output=True,
+                            text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, name = line.split('|')
+            if cumulative.strip().isdigit():
+                # Top-level imports are not indented
+                times[name.rstrip()] = int(cumulative)
+    return times
+
+
+def summarize(times):
+    """Import time in ms of the top-level imports, without interpreter startup, and the heavy modules imported"""
+    own = sum(cumulative for name, cumulative in times.items()
+              if not name.startswith('  ') and name.strip() not in ('site', 'encodings', 'encodings.utf_8'))
+    heavy = sorted({name.strip().split('.')[0] for name in times} & set(HEAVY_MODULES))
+    return own / 1000, heavy
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Command line startup benchmark')
+    parser.add_argument('--runs', type=int, default=5, help='Runs of each command, the median is reported')
+    parser.add_argument('--max-ms', type=float, default=30, help='Import time budget of main.py --help')
+    args = parser.parse_args()
+
+    failures = []
+    walls, imports = [], []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        times = import_times(['main.py', '--help'])
+        walls.append((time.perf_counter() - start) * 1000)
+        ms, heavy = summarize(times)
+        imports.append(ms)
+    help_ms = statistics.median(imports)
+    print(f"{'command':<44} {'imports (ms)':>12} {'wall (ms)':>10}  heavy modules")
+    print(f"{'main.py --help':<44} {help_ms:>12.1f} {statistics.median(walls):>10.1f}  {', '.join(heavy) or '-'}")
+    if help_ms > args.max_ms:
+        failures.append(f"main.py --help imports in {help_ms:.1f} ms, over the {args.max_ms:.0f} ms budget")
+    if heavy:
+        failures.append(f"main.py --help imports {', '.join(heavy)}")
+
+    for mode, (module, allowed) in MODE_MODULES.items():
+        results = [summarize(import_times(['-c', f'import {module}'])) for _ in range(args.runs)]
+        ms, heavy = statistics.median(result[0] for result in results), results[0][1]
+        print(f"{'--mode ' + mode + ' (' + module + ')':<44} {ms:>12.1f} {'':>10}  {', '.join(heavy) or '-'}")
+        unexpected = sorted(set(heavy) - allowed)
+        if unexpected:
+            failures.append(f"--mode {mode} imports {', '.join(unexpected)}")
+
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""End-to-end benchmark suite over a synthetic WSJ corpus
+
+Times the main paths of the pipeline on corpora from corpus.py:
+
+- parse_article_data: archive pages parsed into articles, as the scraper does
+- assign_annotators: annotators assigned to sampled articles
+- calculate_agreement: the analyze mode, from an edited annotated CSV file
+- search_index: the app's headline index built over the annotated articles
+- search: the app's keyword and sentiment searches on that index
+- trend: the app's sentiment aggregates built and read per day, week and month
+
+Each case and size runs in a fresh process, which records the median of
+--repeat runs (more for fast cases, see MIN_CASE_SECONDS) and the peak memory the case adds on top of its inputs. On
+Linux the peak is reset before the case runs, elsewhere it is the peak of
+the whole process.
+
+Results are compared with a stored baseline, and the suite exits with
+status 1 when a case got slower or needs more memory than the baseline
+allows. Throughput is only checked for sizes whose baseline run took at
+least MIN_GATED_SECONDS, shorter runs vary too much between processes.
+Baselines depend on the machine, record one with --update-baseline on the
+machine that runs the check.
+
+Usage:
+    python tests/benchmarks/suite.py
+    python tests/benchmarks/suite.py --sizes 1000000 10000000 --cases search_index search trend
+    python tests/benchmarks/suite.py --update-baseline
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, "..", "..", "src"))
+
+import numpy as np
+import pandas as pd
+
+import corpus
+
+BASELINE_FILE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+# Fast cases run until they took this long, so their median time is not noise
+MIN_CASE_SECONDS = 0.5
+MAX_RUNS = 100
+
+# Runs shorter than this are dominated by timer, cache and scheduling noise, their throughput is not checked
+MIN_GATED_SECONDS = 0.05
+
+# Memory growth below this is noise from the allocator and imports, not a regression
+MEMORY_SLACK_MB = 16
+
+SEARCH_QUERIES = [('fed', None), ('stocks rally', None), ('inflation', [1]), ('tre', [-1, 0]), ('', [1]),
+                  ('wall street economy', None), ('gdp', [0]), ('mortgage credit', [-1])]
+
+
+def setup_parse(rows, directory):
+    from archive_parser import parse_archive_page
+    from scraper import parse_article_data
+
+    pages = list(corpus.archive_pages(rows))
+
+    def run():
+        for date_str, page, html in pages:
+            parse_article_data(parse_archive_page(html), date_str, page)
+    return run, rows
+
+
+def setup_assign(rows, directory):
+    from data_preprocessing import assign_annotators
+
+    articles = pd.concat(corpus.make_articles(rows), ignore_index=True)
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            assign_annotators(articles.copy())
+    return run, rows
+
+
+def setup_agreement(rows, directory):
+    from agreement_analysis import calculate_agreement
+
+    path = corpus.write_annotated_csv(os.path.join(directory, 'annotated_data.csv'), rows)
+    report = os.path.join(directory, 'analysis_report.json')
+
+    def run():
+        # The typed dataset is rebuilt from the CSV file as after an annotation edit
+        shutil.rmtree(os.path.join(directory, 'annotated_data.parquet'), ignore_errors=True)
+        with contextlib.redirect_stdout(io.StringIO()):
+            calculate_agreement(path, report)
+    return run, rows
+
+
+def _app_data(rows, directory):
+    """The annotated table as the app loads it"""
+    import dataset
+
+    path = corpus.write_annotated_csv(os.path.join(directory, 'annotated_data.csv'), rows)
+    df = dataset.load_annotated(path).rename(columns={'Annotation_1': 'annotation_1', 'Annotation_2': 'annotation_2'})
+    df['annotation_1'] = df['annotation_1'].fillna(0).astype('int8')
+    df['annotation_2'] = df['annotation_2'].fillna(0).astype('int8')
+    return path, df
+
+
+def setup_search_index(rows, directory):
+    from search_index import HeadlineIndex
+
+    _, data = _app_data(rows, directory)
+    return lambda: HeadlineIndex(data), rows
+
+
+def setup_search(rows, directory):
+    from search_index import HeadlineIndex
+
+    _, data = _app_data(rows, directory)
+    index = HeadlineIndex(data)
+
+    def run():
+        # Each run starts with an empty query cache, the second page of a query is served from it as in the app
+        index._match.cache_clear()
+        for query, sentiments in SEARCH_QUERIES:
+            for page in (1, 2):
+                index.search(query, sentiments, page=page, page_size=10)
+    return run, 2 * len(SEARCH_QUERIES)
+
+
+def setup_trend(rows, directory):
+    import aggregates
+
+    path, _ = _app_data(rows, directory)
+    aggregates_dir = os.path.join(directory, 'aggregates')
+
+    def run():
+        shutil.rmtree(aggregates_dir, ignore_errors=True)
+        aggregates.update_aggregates(path, aggregates_dir)
+        for frequency in aggregates.FREQUENCIES:
+            aggregates.load_trend(frequency, directory=aggregates_dir)
+    return run, rows
+
+
+# Case name: (setup, unit of the throughput)
+CASES = {
+    'parse_article_data': (setup_parse, 'headlines'),
+    'assign_annotators': (setup_assign, 'rows'),
+    'calculate_agreement': (setup_agreement, 'rows'),
+    'search_index': (setup_search_index, 'rows'),
+    'search': (setup_search, 'queries'),
+    'trend': (setup_trend, 'rows'),
+}
+
+
+def _memory_mb(field):
+    """VmRSS or VmHWM (peak) of this process in MB, None when /proc is not available"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+
+
+def _reset_peak_memory():
+    """Reset the peak memory of this process to its current memory, Linux only"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def run_case(name, rows, repeat):
+    """Set up and time one case in this process
+
+    Returns:
+        dict: seconds (median run), best_seconds, throughput (units per second of
+            the median run) and peak_mb (peak memory over the memory after setup)
+    """
+    setup, _ = CASES[name]
+    directory = tempfile.mkdtemp(prefix=f'suite_{name}_')
+    try:
+        run, units = setup(rows, directory)
+        before = _memory_mb('VmRSS') if _reset_peak_memory() else 0
+        timings = []
+        while len(timings) < repeat or (sum(timings) < MIN_CASE_SECONDS and len(timings) < MAX_RUNS):
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+        median = float(np.median(timings))
+        peak = _memory_mb('VmHWM')
+        if peak is None:
+            # ru_maxrss is in KB on Linux and in bytes on macOS
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 ** 2 if sys.platform == 'darwin' else 1024)
+        return {'seconds': round(median, 6), 'best_seconds': round(min(timings), 6),
+                'throughput': round(units / median, 1), 'peak_mb': round(max(peak - before, 0), 1)}
+    finally:
+        shutil.rmtree(directory)
+
+
+def run_in_child(name, rows, repeat):
+    """Run a case in a fresh process, so it starts with no memory or caches of other cases"""
+    result = subprocess.run([sys.executable, __file__, '--child', name, str(rows), '--repeat', str(repeat)],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{name} at {rows} rows failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def compare(result, expected, tolerance):
+    """Describe the regressions of a result against its baseline, empty when there are none"""
+    problems = []
+    if expected['seconds'] >= MIN_GATED_SECONDS and result['throughput'] < expected['throughput'] * (1 - tolerance):
+        problems.append(f"throughput {result['throughput']:,.0f}/s, baseline {expected['throughput']:,.0f}/s")
+    if result['peak_mb'] > expected['peak_mb'] * (1 + tolerance) + MEMORY_SLACK_MB:
+        problems.append(f"peak memory {result['peak_mb']:.0f} MB, baseline {expected['peak_mb']:.0f} MB")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end benchmark suite')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Corpus sizes in rows')
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--repeat', type=int, default=5, help='Runs of each case, the median one counts')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed throughput loss and memory growth against the baseline (default: 0.25)')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--update-baseline', action='store_true', help='Store the results as the new baseline')
+    parser.add_argument('--child', nargs=2, metavar=('CASE', 'ROWS'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_case(args.child[0], int(args.child[1]), args.repeat)))
+        return
+
+    baseline = {'results': {}}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results, regressions = {}, []
+    print(f"{'case':<20} {'rows':>10} {'seconds':>9} {'throughput':>18} {'peak MB':>8} {'vs baseline':>12}")
+    for name in args.cases:
+        unit = CASES[name][1]
+        for rows in args.sizes:
+            result = run_in_child(name, rows, args.repeat)
+            results.setdefault(name, {})[str(rows)] = result
+            expected = baseline['results'].get(name, {}).get(str(rows))
+            change = f"{result['throughput'] / expected['throughput'] - 1:+.0%}" if expected else '-'
+            if expected and expected['seconds'] < MIN_GATED_SECONDS:
+                change = f"({change})"
+            print(f"{name:<20} {rows:>10} {result['seconds']:>9.3f} {result['throughput']:>10,.0f} {unit + '/s':<7} "
+                  f"{result['peak_mb']:>8.0f} {change:>12}")
+            if expected:
+                regressions += [f"{name} at {rows} rows: {problem}"
+                                for problem in compare(result, expected, args.tolerance)]
+
+    if args.update_baseline:
+        for name, sizes in results.items():
+            baseline['results'].setdefault(name, {}).update(sizes)
+        baseline['machine'] = f"{platform.machine()}, {os.cpu_count()} cores, Python {platform.python_version()}, " \
+                              f"numpy {np.__version__}, pandas {pd.__version__}"
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Incremental sentiment aggregates"""
+import os
+
+import numpy as np
+import pandas as pd
+
+import aggregates
+from agreement_benchmark import make_annotations
+
+
+def annotated_data(n_rows, seed=523):
+    rng = np.random.default_rng(seed)
+    df = make_annotations(n_rows, seed)
+    df['Date'] = pd.to_datetime('2023-01-01') + pd.to_timedelta(rng.integers(0, 730, n_rows), unit='D')
+    return df
+
+
+def read_tables(directory):
+    return {frequency: pd.read_parquet(os.path.join(directory, f'{frequency}.parquet'))
+            for frequency in aggregates.FREQUENCIES}
+
+
+def test_update_equals_a_rebuild(tmp_path):
+    annotated_path = str(tmp_path / 'annotated.csv')
+    incremental_dir = str(tmp_path / 'incremental')
+    annotated = annotated_data(3000)
+    annotated.to_csv(annotated_path, index=False)
+    assert aggregates.update_aggregates(annotated_path, incremental_dir)
+    assert not aggregates.update_aggregates(annotated_path, incremental_dir)
+
+    # Edit, remove and add articles, one of them on a day that had none
+    annotated.loc[annotated.index[:100], 'Annotation_1'] = '-1'
+    annotated.loc[annotated.index[100:150], 'Category'] = 'U.S. Markets'
+    annotated = annotated.drop(index=annotated.index[150:200])
+    new = annotated_data(100, seed=7)
+    new['URL'] = new['URL'] + '-new'
+    new.loc[new.index[0], 'Date'] = pd.Timestamp('2030-01-01')
+    annotated = pd.concat([annotated, new], ignore_index=True)
+    annotated.to_csv(annotated_path, index=False)
+    assert aggregates.update_aggregates(annotated_path, incremental_dir)
+
+    rebuilt_dir = str(tmp_path / 'rebuilt')
+    aggregates.update_aggregates(annotated_path, rebuilt_dir)
+    incremental, rebuilt = read_tables(incremental_dir), read_tables(rebuilt_dir)
+    for frequency in aggregates.FREQUENCIES:
+        pd.testing.assert_frame_equal(incremental[frequency], rebuilt[frequency])
+    assert incremental['daily']['Date'].max() == pd.Timestamp('2030-01-01')
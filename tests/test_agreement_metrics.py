@@ -0,0 +1,60 @@
+"""Chance-corrected agreement metrics against reference implementations"""
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import corpus
+from agreement_analysis import preprocess_annotations
+from agreement_metrics import agreement_metrics, build_label_matrix
+from agreement_stats_benchmark import ANNOTATORS, annotator_ids
+
+
+def annotations(missing):
+    df = preprocess_annotations(pd.concat(corpus.make_annotated(3000, missing=missing), ignore_index=True))
+    return df, annotator_ids(df)
+
+
+def ratings(df, ids):
+    """Annotators x items label table, NaN where an annotator did not rate an item"""
+    table = np.full((len(ANNOTATORS), len(df)), np.nan)
+    for column in ['Annotation_1', 'Annotation_2']:
+        raters = ids[column].map(ANNOTATORS.index).to_numpy()
+        table[raters, np.arange(len(df))] = df[f'{column}_value'].to_numpy(dtype=float)
+    return table
+
+
+@pytest.mark.parametrize('missing', [0, 0.05])
+def test_cohen_kappa_matches_sklearn(missing):
+    metrics = pytest.importorskip('sklearn.metrics')
+    df, ids = annotations(missing)
+    values = agreement_metrics(build_label_matrix(df, ids))
+    table = ratings(df, ids)
+    pairs = 0
+    for a, b in combinations(range(len(ANNOTATORS)), 2):
+        shared = ~np.isnan(table[a]) & ~np.isnan(table[b])
+        if shared.any():
+            expected = metrics.cohen_kappa_score(table[a, shared], table[b, shared])
+            assert values[f'cohen_kappa:{ANNOTATORS[a]}-{ANNOTATORS[b]}'] == pytest.approx(expected)
+            pairs += 1
+    assert pairs == len([name for name in values if name.startswith('cohen_kappa:')])
+
+
+def test_fleiss_kappa_matches_statsmodels():
+    inter_rater = pytest.importorskip('statsmodels.stats.inter_rater')
+    df, ids = annotations(0)
+    values = agreement_metrics(build_label_matrix(df, ids))
+    counts, _ = inter_rater.aggregate_raters(df[['Annotation_1_value', 'Annotation_2_value']].to_numpy())
+    assert values['fleiss_kappa'] == pytest.approx(inter_rater.fleiss_kappa(counts))
+
+
+@pytest.mark.parametrize('missing', [0, 0.05])
+@pytest.mark.parametrize('level', ['nominal', 'ordinal'])
+def test_krippendorff_alpha_matches_krippendorff(missing, level):
+    krippendorff = pytest.importorskip('krippendorff')
+    df, ids = annotations(missing)
+    values = agreement_metrics(build_label_matrix(df, ids))
+    expected = krippendorff.alpha(reliability_data=ratings(df, ids), level_of_measurement=level,
+                                  value_domain=[-1, 0, 1])
+    assert values[f'krippendorff_alpha_{level}'] == pytest.approx(expected)
@@ -0,0 +1,47 @@
+"""Incremental agreement statistics"""
+import numpy as np
+import pandas as pd
+
+import corpus
+from agreement_analysis import preprocess_annotations
+from agreement_stats import AgreementStats, disagreements_path, input_signatures, stats_path
+from agreement_stats_benchmark import annotator_ids, canonical, full_report, make_batch, read_disagreements
+
+
+def test_folded_batches_equal_a_full_recompute(tmp_path):
+    rng = np.random.default_rng(corpus.SEED)
+    report_file = str(tmp_path / 'analysis_report.json')
+    path, disagreements_file = stats_path(report_file), disagreements_path(report_file)
+    raw = pd.concat(corpus.make_annotated(3000), ignore_index=True)
+    df = preprocess_annotations(raw.copy())
+    stats = AgreementStats('annotated_data.csv')
+    stats.update(df, annotator_ids(df))
+    stats.save(path, disagreements_file)
+
+    for _ in range(3):
+        # New, relabeled and deleted rows
+        raw = make_batch(raw, 200, rng)
+        df = preprocess_annotations(raw.copy())
+        ids = annotator_ids(df)
+        stats = AgreementStats.load(path, 'annotated_data.csv', disagreements_file)
+        stats.update(df, ids)
+        stats.save(path, disagreements_file)
+
+        expected, expected_disagreements = full_report(df, ids)
+        assert canonical(stats.report()) == canonical(expected)
+        assert read_disagreements(disagreements_file) == canonical(expected_disagreements)
+
+
+def test_unchanged_inputs_are_detected(tmp_path):
+    annotated = corpus.write_annotated_csv(str(tmp_path / 'annotated_data.csv'), 100)
+    report_file = str(tmp_path / 'analysis_report.json')
+    path, disagreements_file = stats_path(report_file), disagreements_path(report_file)
+    df = preprocess_annotations(pd.read_csv(annotated))
+    stats = AgreementStats(annotated)
+    stats.update(df, annotator_ids(df))
+    stats.save(path, disagreements_file, input_signatures([annotated]))
+
+    assert AgreementStats.load(path, annotated, disagreements_file).inputs_unchanged([annotated])
+    with open(annotated, 'a', encoding='utf-8') as f:
+        f.write('101,2024-03-01,New headline,U.S. Markets,https://www.wsj.com/articles/new,1,1\n')
+    assert not AgreementStats.load(path, annotated, disagreements_file).inputs_unchanged([annotated])
@@ -0,0 +1,31 @@
+"""Archive page parser backends"""
+import pytest
+
+import archive_parser
+import corpus
+from archive_parser import ArchivePage
+from archive_server import build_archive
+from parser_benchmark import legacy_parse
+from scraper import parse_article_data
+
+BACKENDS = archive_parser.available_backends()
+
+
+@pytest.fixture(scope='module')
+def pages():
+    return list(build_archive('2024-01-01', 40, pages_per_day=3).values()) + \
+        [html for _, _, html in corpus.archive_pages(1000)]
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_backends_match_the_original_parse(backend, pages):
+    parse = archive_parser.get_parser(backend)
+    for html in pages:
+        parsed = parse(html)
+        assert (parsed.max_pages, parse_article_data(parsed, '2024/01/01')) == legacy_parse(html, '2024/01/01')
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('html', ['', ' \n\t', '<!-- empty -->'])
+def test_empty_body_gives_empty_page(backend, html):
+    assert archive_parser.get_parser(backend)(html) == ArchivePage([], [], 1)
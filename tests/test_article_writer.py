@@ -0,0 +1,56 @@
+"""Replacing scraped article output"""
+import os
+
+import pandas as pd
+import pytest
+
+from article_writer import ArticleWriter
+
+
+def articles(count, prefix='old'):
+    return [{'Date': '2024/03/01', 'Page': 1, 'Title': f'{prefix} {i}', 'Category': 'U.S. Economy',
+             'URL': f'https://www.wsj.com/articles/{prefix}-{i}'} for i in range(count)]
+
+
+def read(path):
+    return pd.read_parquet(path) if path.endswith('.parquet') else pd.read_csv(path)
+
+
+@pytest.fixture(params=['csv', 'parquet'])
+def output(request, tmp_path):
+    path = str(tmp_path / f'articles.{request.param}')
+    with ArticleWriter(path, batch_size=2) as writer:
+        writer.write(articles(7))
+    return path
+
+
+def test_rewrite_replaces_the_whole_output(output):
+    with ArticleWriter(output, batch_size=2) as writer:
+        writer.write(articles(3, 'new'))
+        # Readers see the old output until the new one is complete
+        assert len(read(output)) == 7
+    assert read(output)['Title'].tolist() == ['new 0', 'new 1', 'new 2']
+    assert os.listdir(os.path.dirname(output)) == [os.path.basename(output)]
+
+
+def test_empty_rewrite_keeps_the_output(output):
+    with ArticleWriter(output) as writer:
+        writer.write([])
+    assert len(read(output)) == 7
+    assert os.listdir(os.path.dirname(output)) == [os.path.basename(output)]
+
+
+def test_failed_rewrite_keeps_the_output(output):
+    with pytest.raises(RuntimeError):
+        with ArticleWriter(output, batch_size=2) as writer:
+            writer.write(articles(5, 'new'))
+            raise RuntimeError('crawl failed')
+    assert len(read(output)) == 7
+    assert os.listdir(os.path.dirname(output)) == [os.path.basename(output)]
+
+
+def test_empty_new_output_is_not_created(tmp_path):
+    path = str(tmp_path / 'articles.csv')
+    with ArticleWriter(path) as writer:
+        writer.write([])
+    assert not os.path.exists(path)
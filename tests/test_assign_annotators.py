@@ -0,0 +1,35 @@
+"""Load-balanced annotator assignment"""
+import pandas as pd
+import pytest
+
+from config import ANNOTATORS
+from data_preprocessing import assign_annotators
+
+
+def legacy_assign(n_rows):
+    """The assignment before the heap: sort every annotator by weighted load for each row"""
+    assignments_count = {person: 0 for person in ANNOTATORS}
+    assigned_people_list = []
+    for _ in range(n_rows):
+        sorted_people = sorted(
+            ANNOTATORS,
+            key=lambda person: assignments_count[person] if person != 'X1' else assignments_count[person] / 1.7
+        )
+        assigned_people = [sorted_people[0], sorted_people[1]]
+        assigned_people_list.append(assigned_people)
+        assignments_count[assigned_people[0]] += 1
+        assignments_count[assigned_people[1]] += 1
+    return [assigned[0] for assigned in assigned_people_list], [assigned[1] for assigned in assigned_people_list]
+
+
+@pytest.mark.parametrize('n_rows', [0, 1, 7, 200, 5000])
+def test_heap_matches_the_sorted_assignment(n_rows):
+    df = assign_annotators(pd.DataFrame({'URL': [f'https://www.wsj.com/articles/{i}' for i in range(n_rows)]}))
+    first, second = legacy_assign(n_rows)
+    assert df['Annotation_1'].tolist() == first
+    assert df['Annotation_2'].tolist() == second
+
+
+def test_more_annotators_per_item_than_annotators():
+    with pytest.raises(ValueError):
+        assign_annotators(pd.DataFrame({'URL': ['a']}), annotators=['X1', 'X2'], per_item=3)
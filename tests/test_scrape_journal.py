@@ -0,0 +1,83 @@
+"""Resuming an interrupted scrape from its journal"""
+import os
+
+import pandas as pd
+import pytest
+
+import scraper
+from rate_limiter import AdaptiveRateLimiter
+from archive_server import ArchiveServer, build_archive
+from scrape_journal import ScrapeJournal
+
+START_DATE, END_DATE, DAYS = '2024-03-01', '2024-03-06', 6
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def archive(monkeypatch):
+    """Serve a synthetic archive and record the pages the scraper fetches, with the HTML cache off"""
+    with ArchiveServer(build_archive(START_DATE, DAYS), latency=0) as server:
+        monkeypatch.setattr(scraper, 'WSJ_ARCHIVE_URL', server.url_template)
+        monkeypatch.setattr(scraper, 'HTML_CACHE_ENABLED', False)
+        monkeypatch.setattr(scraper, 'SCRAPER_SERIAL_REQUESTS_PER_SECOND', None)
+        fetch_page = scraper.fetch_page
+
+        def fetch(url, *args, **kwargs):
+            if fetch.interrupt_after is not None and len(fetch.urls) >= fetch.interrupt_after:
+                raise Interrupted(url)
+            fetch.urls.append(url)
+            return fetch_page(url, *args, **kwargs)
+
+        fetch.urls = []
+        fetch.interrupt_after = None
+        monkeypatch.setattr(scraper, 'fetch_page', fetch)
+        yield fetch
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_resume_fetches_only_missing_pages(archive, tmp_path, workers):
+    fetch = archive
+    journal_file = str(tmp_path / 'journal.jsonl')
+
+    complete_file = str(tmp_path / 'complete.csv')
+    scraper.scrape_wsj_archive(START_DATE, END_DATE, workers, None, journal_file=journal_file,
+                               output_file=complete_file)
+    all_pages = list(fetch.urls)
+    assert not os.path.exists(journal_file)
+
+    # Killed after a third of the pages, the journal holds the pages parsed until then
+    fetch.urls = []
+    fetch.interrupt_after = len(all_pages) // 3
+    output_file = str(tmp_path / 'resumed.csv')
+    with pytest.raises(Interrupted):
+        scraper.scrape_wsj_archive(START_DATE, END_DATE, workers, None, journal_file=journal_file,
+                                   output_file=output_file)
+    journal = ScrapeJournal(journal_file)
+    done = {date_str for date_str in journal.days if journal.is_done(date_str)}
+    journaled = {scraper.archive_url(date_str, page) for date_str, day in journal.days.items() for page in day['pages']}
+    journal.close()
+    assert journaled
+
+    fetch.urls = []
+    fetch.interrupt_after = None
+    scraper.scrape_wsj_archive(START_DATE, END_DATE, workers, None, journal_file=journal_file,
+                               output_file=output_file)
+    missing = [url for url in all_pages if url not in journaled and not any(f'/{day}?' in url for day in done)]
+    assert sorted(fetch.urls) == sorted(missing)
+    pd.testing.assert_frame_equal(pd.read_csv(output_file), pd.read_csv(complete_file))
+    assert not os.path.exists(journal_file)
+
+
+def test_unsettled_day_is_not_done(archive, tmp_path, monkeypatch):
+    # Every day is still inside the settle window
+    monkeypatch.setattr(scraper, 'is_settled', lambda date_str: False)
+    journal_file = str(tmp_path / 'journal.jsonl')
+    journal = ScrapeJournal(journal_file)
+    dates = [f'2024/03/0{day}' for day in range(1, DAYS + 1)]
+    for _ in scraper.crawl_serial(dates, journal, AdaptiveRateLimiter(None)):
+        pass
+    assert journal.days and not any(journal.is_done(date_str) for date_str in dates)
+    journal.close()